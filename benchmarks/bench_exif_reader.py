@@ -0,0 +1,63 @@
+"""内置 APP1 解析器 vs Pillow/exifread 的吞吐对比（files/sec）
+
+用法：
+    python benchmarks/bench_exif_reader.py [照片目录] [--n 2000] [--repeat 3]
+不给目录时在临时目录生成 n 张带 EXIF 的小 JPG（需要 Pillow）。
+"""
+import argparse, random, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from focal_stats_jpg import SUPPORTED_EXTS, parse_with_pillow_exifread, parse_photo  # noqa: E402
+
+
+def make_corpus(root: Path, n: int):
+    from PIL import Image
+    from PIL.TiffImagePlugin import IFDRational
+    rnd = random.Random(0)
+    im = Image.new("RGB", (16, 16), (128, 128, 128))
+    for i in range(n):
+        exif = Image.Exif()
+        exif[0x0110] = rnd.choice(["ILCE-7M4", "ILCE-6400", "X-T5", "EOS R7"])
+        sub = exif.get_ifd(0x8769)
+        sub[0x920A] = IFDRational(rnd.choice([16, 24, 35, 50, 85]), 1)
+        sub[0x829A] = IFDRational(1, rnd.choice([60, 125, 250, 1000]))
+        sub[0x829D] = IFDRational(28, 10)
+        sub[0x8827] = rnd.choice([100, 400, 1600])
+        sub[0x9003] = "2024:05:01 12:00:00"
+        sub[0xA434] = "FE 24-70mm F2.8 GM"
+        im.save(root / f"IMG_{i:05d}.jpg", exif=exif)
+
+
+def bench(fn, paths, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in paths:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return len(paths) / best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="EXIF 解析后端吞吐对比")
+    ap.add_argument("folder", nargs="?", help="照片目录（缺省则生成临时样本）")
+    ap.add_argument("--n", type=int, default=2000, help="生成样本张数")
+    ap.add_argument("--repeat", type=int, default=3, help="重复次数，取最好成绩")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(args.folder) if args.folder else Path(tmp)
+        if not args.folder:
+            make_corpus(root, args.n)
+        paths = [p for p in root.rglob("*") if p.suffix.lower() in SUPPORTED_EXTS]
+        same = sum(parse_photo(p) == parse_with_pillow_exifread(p) for p in paths)
+        old = bench(parse_with_pillow_exifread, paths, args.repeat)
+        new = bench(parse_photo, paths, args.repeat)
+    print(f"文件数：{len(paths)}（结果一致 {same}/{len(paths)}）")
+    print(f"Pillow + exifread : {old:10.0f} files/sec")
+    print(f"内置 APP1 解析    : {new:10.0f} files/sec  (x{new / old:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""启动开销基准：命令行导入、单次运行、进程池子进程的导入，界面到窗口显示的时间
+
+用法：
+    python benchmarks/bench_import.py [--repeat 5] [--out 结果.json] [--check]
+每项在全新的解释器里测（取最好成绩），同时用 -X importtime 记录导入了哪些模块。
+--check 时按预算检查：命令行与子进程不得导入 matplotlib / PySide6，子进程也不得导入界面脚本；
+窗口显示时 matplotlib 尚未导入；各项耗时不超过 BUDGET_MS。结果 JSON 与 bench_pipeline --compare 兼容。
+"""
+import argparse, json, os, platform, re, subprocess, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from corpus import make_corpus  # noqa: E402
+from bench_pipeline import _commit  # noqa: E402
+
+CORPUS_N = 200     # 超过 PARALLEL_MIN_FILES，-j 2 时会真的起进程池
+GUI = ("matplotlib", "PySide6")
+BUDGET_MS = {"import.cli": 300, "worker.import": 500, "ui.show": 1500}
+FORBIDDEN = {
+    "import.cli": GUI,
+    "cli.run": GUI,
+    "worker.import": GUI + ("photo_meta_ui", "numpy"),
+    "ui.show": ("matplotlib",),
+}
+
+_IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+\d+ \|( *)(\S+)")
+
+# 界面：从解释器启动到窗口 show() 返回；打印耗时与此时是否已导入 matplotlib
+UI_SNIPPET = """
+import sys, time
+t0 = time.perf_counter()
+from PySide6.QtWidgets import QApplication
+app = QApplication([])
+import photo_meta_ui
+w = photo_meta_ui.MainWindow()
+w.show()
+print(time.perf_counter() - t0, "matplotlib" in sys.modules)
+"""
+
+# 子进程：父进程运行中才打开 PYTHONPROFILEIMPORTTIME，只有进程池里的子进程会输出导入记录
+WORKER_SNIPPET = """
+import os, runpy, sys
+sys.argv = ["focal_stats_jpg.py", sys.argv[1], "--no-exiftool", "--no-cache", "-j", "2", "--csv", sys.argv[2]]
+os.environ["PYTHONPROFILEIMPORTTIME"] = "1"
+runpy.run_path("focal_stats_jpg.py", run_name="__main__")
+"""
+
+
+def imported(stderr):
+    """-X importtime 输出里的模块名（只取顶层包名）"""
+    return {m.group(2).split(".")[0] for m in map(_IMPORT_LINE.match, stderr.splitlines()) if m}
+
+
+def worker_import_ms(stderr):
+    """子进程导入记录里各顶层导入的累计耗时之和（按进程平均），单位 ms"""
+    total = procs = 0
+    for line in stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if m and len(m.group(2)) == 1:   # 缩进一格 = 该进程的顶层导入
+            total += int(m.group(1))
+        if line.startswith("import time: self [us]"):
+            procs += 1
+    return total / 1000.0 / max(1, procs), procs
+
+
+def _run(args, env=None, timeout=300):
+    t0 = time.perf_counter()
+    p = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, env=env, timeout=timeout)
+    dt = time.perf_counter() - t0
+    if p.returncode != 0:
+        raise RuntimeError(f"{args[:3]} 失败（{p.returncode}）：\n{p.stderr[-2000:]}")
+    return dt, p
+
+
+def run_suite(corpus, repeat):
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    results, modules = {}, {}
+    csv = os.path.join(tempfile.gettempdir(), "photo_meta_bench_import.csv")   # 不在仓库里留下 CSV
+
+    def record(name, seconds, mods, **extra):
+        res = results.setdefault(name, {"seconds": float("inf")})
+        res["seconds"] = round(min(res["seconds"], seconds), 6)
+        res.update(extra)
+        modules[name] = mods
+        print(f"{name:<16} {res['seconds'] * 1000:10.1f} ms", file=sys.stderr)
+
+    for _ in range(repeat):
+        dt, p = _run(["-X", "importtime", "-c", "import time; t = time.perf_counter(); import focal_stats_jpg; "
+                      "print(time.perf_counter() - t)"], env)
+        record("import.cli", float(p.stdout.split()[-1]), imported(p.stderr))
+        dt, p = _run(["-X", "importtime", "focal_stats_jpg.py", str(corpus), "--no-exiftool", "--no-cache",
+                      "--csv", csv], env)
+        record("cli.run", dt, imported(p.stderr))
+        dt, p = _run(["-c", WORKER_SNIPPET, str(corpus), csv], env)
+        ms, procs = worker_import_ms(p.stderr)
+        record("worker.import", ms / 1000.0, imported(p.stderr), workers=procs)
+        dt, p = _run(["-X", "importtime", "-c", UI_SNIPPET], env)
+        shown, mpl = p.stdout.split()[-2:]
+        record("ui.show", float(shown), imported(p.stderr) | ({"matplotlib"} if mpl == "True" else set()))
+    return results, modules
+
+
+def check(results, modules):
+    """按预算检查，返回问题列表"""
+    problems = []
+    for name, bad in FORBIDDEN.items():
+        hit = sorted(set(bad) & modules.get(name, set()))
+        if hit:
+            problems.append(f"{name}: 导入了 {', '.join(hit)}")
+    for name, budget in BUDGET_MS.items():
+        ms = results[name]["seconds"] * 1000
+        if ms > budget:
+            problems.append(f"{name}: {ms:.0f} ms 超出预算 {budget} ms")
+    if not results["worker.import"].get("workers"):
+        problems.append("worker.import: 没有子进程的导入记录（进程池未启动？）")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="启动开销基准")
+    ap.add_argument("--repeat", type=int, default=5, help="重复次数，取最好成绩")
+    ap.add_argument("--corpus", default=None, help="小照片库目录（默认在临时目录下生成并复用）")
+    ap.add_argument("--out", default=None, help="结果 JSON 路径（缺省打印到标准输出）")
+    ap.add_argument("--check", action="store_true", help="超出预算或导入了不该导入的模块时以非零状态退出")
+    args = ap.parse_args()
+
+    corpus = Path(args.corpus or Path(tempfile.gettempdir()) / f"photo_meta_bench_{CORPUS_N}_0")
+    make_corpus(corpus, CORPUS_N, 0)
+    results, modules = run_suite(corpus, args.repeat)
+    doc = {
+        "meta": {"commit": _commit(), "n": CORPUS_N, "python": platform.python_version(),
+                 "platform": platform.platform(), "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    text = json.dumps(doc, ensure_ascii=False, indent=1)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.check:
+        problems = check(results, modules)
+        for p in problems:
+            print(f"[budget] {p}", file=sys.stderr)
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""全流程基准：遍历、各解析后端、gather（冷/热缓存）、列式数据集、分箱、界面无关的聚合延迟
+
+用法：
+    python benchmarks/bench_pipeline.py [--n 1k|100k|1M] [--corpus 目录] [--jobs 4] [--out 结果.json]
+    python benchmarks/bench_pipeline.py --compare 旧结果.json 新结果.json
+合成照片库见 corpus.py（默认生成在临时目录下并复用）。结果为 JSON：每个阶段的耗时（取最好成绩）
+与吞吐，附 git 提交号，便于跨提交对比；--compare 打印两份结果的逐项比值。
+"""
+import argparse, json, logging, os, platform, random, subprocess, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from corpus import make_corpus, parse_n  # noqa: E402
+from focal_stats_jpg import (  # noqa: E402
+    Extractor, gather_rows, has_exiftool, iter_photo_files, parse_photo, parse_with_pillow_exifread,
+)
+from exif_cache import ExifCache  # noqa: E402
+from dataset import HistogramCube, PhotoDataset, histogram  # noqa: E402
+from report import mode_values, plot_spec  # noqa: E402
+
+SAMPLE = 5000      # 慢后端（Pillow/exifread、exiftool）只测这么多文件
+QUERIES = 200      # 聚合延迟：随机选择集的查询次数
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Bench:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, fn, items=None, repeat=None):
+        """fn 跑 repeat 次取最好成绩；items 为处理的条目数（用于算吞吐）。返回最后一次的结果"""
+        best, out = float("inf"), None
+        for _ in range(repeat or self.repeat):
+            t0 = time.perf_counter()
+            out = fn()
+            best = min(best, time.perf_counter() - t0)
+        res = {"seconds": round(best, 6)}
+        if items:
+            res["items"] = items
+            res["per_sec"] = round(items / best, 1) if best else None
+        self.results[name] = res
+        rate = f"  {res['per_sec']:>12,.0f} /s" if items else ""
+        print(f"{name:<28} {best:10.4f} s{rate}", file=sys.stderr)
+        return out
+
+
+def run_suite(root, jobs, repeat, sample):
+    b = Bench(repeat)
+    files = b.run("walk", lambda: list(iter_photo_files(root)))
+    paths = [p for p, _, _ in files]
+    some = random.Random(0).sample(paths, min(sample, len(paths)))
+
+    b.run("extract.native", lambda: [parse_photo(p) for p in paths], len(paths), repeat=1)
+    b.run("extract.pillow_exifread", lambda: [parse_with_pillow_exifread(p) for p in some], len(some), repeat=1)
+    if jobs > 1:
+        def parallel():
+            with Extractor(use_exiftool=False, jobs=jobs) as ex:
+                return list(ex.parse_files(paths))
+        b.run(f"extract.native.jobs{jobs}", parallel, len(paths), repeat=1)
+    if has_exiftool():
+        def exiftool():
+            with Extractor(use_exiftool=True, jobs=jobs) as ex:
+                return [x for batch in ex.extract(some) for x in batch]
+        b.run("extract.exiftool", exiftool, len(some), repeat=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with ExifCache(Path(tmp) / "cache.sqlite") as cache:
+            b.run("gather.cold_cache", lambda: gather_rows(root, use_exiftool=False, cache=cache, jobs=jobs),
+                  len(paths), repeat=1)
+            rows = b.run("gather.warm_cache", lambda: gather_rows(root, use_exiftool=False, cache=cache, jobs=jobs),
+                         len(paths))
+
+    ds = b.run("dataset.build", lambda: PhotoDataset.from_rows(rows), len(rows))
+    b.results["dataset.build"]["bytes"] = ds.nbytes()
+    b.run("histogram.focal35", lambda: histogram(ds.focal_35mm, 5), len(ds))
+
+    # 界面无关的刷新延迟：建立直方图立方体（换模式/箱宽时）+ 按选择集查询（改选择时）
+    vals, bw = mode_values(ds, 0, 5.0)
+    cube = b.run("aggregate.cube_build", lambda: HistogramCube(ds, vals, bw, ds.sanity_mask()), len(ds))
+    rnd = random.Random(1)
+    selections = [(set(rnd.sample(ds.models, max(1, len(ds.models) // 2))),
+                   set(rnd.sample(ds.lenses, max(1, len(ds.lenses) // 2)))) for _ in range(QUERIES)]
+    def queries():
+        for cams, lenses in selections:
+            xs, ys, _ = cube.query(ds.pair_selection(cams, lenses))
+            plot_spec(0, xs, ys, bw)
+    b.run("aggregate.query", queries, QUERIES)
+
+    # 拍摄时间区间：按月累计索引，每次查询是两行相减
+    tcube = b.run("aggregate.time_cube_build", lambda: HistogramCube(ds, vals, bw, ds.sanity_mask(), by_month=True),
+                  len(ds))
+    rng = ds.month_range()
+    if rng is not None:
+        windows = [sorted(rnd.randint(*rng) for _ in range(2)) for _ in range(QUERIES)]
+        def time_queries():
+            for (cams, lenses), months in zip(selections, windows):
+                tcube.query(ds.pair_selection(cams, lenses), months)
+        b.run("aggregate.time_query", time_queries, QUERIES)
+    return b.results
+
+
+def compare(old_path, new_path):
+    old = json.loads(Path(old_path).read_text(encoding="utf-8"))
+    new = json.loads(Path(new_path).read_text(encoding="utf-8"))
+    print(f"{'stage':<28} {'old s':>10} {'new s':>10} {'new/old':>8}   ({old['meta'].get('commit')} -> "
+          f"{new['meta'].get('commit')}, n={old['meta']['n']} / {new['meta']['n']})")
+    for name, r in new["results"].items():
+        o = old["results"].get(name)
+        if o is None:
+            print(f"{name:<28} {'-':>10} {r['seconds']:>10.4f}")
+            continue
+        ratio = r["seconds"] / o["seconds"] if o["seconds"] else float("nan")
+        print(f"{name:<28} {o['seconds']:>10.4f} {r['seconds']:>10.4f} {ratio:>8.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="全流程基准")
+    ap.add_argument("--n", default="1k", help="照片张数：1k / 100k / 1M 或整数")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--corpus", default=None, help="合成照片库目录（默认在临时目录下，按张数/种子复用）")
+    ap.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--repeat", type=int, default=3, help="快阶段的重复次数，取最好成绩")
+    ap.add_argument("--sample", type=int, default=SAMPLE, help="慢后端抽样的文件数")
+    ap.add_argument("--out", default=None, help="结果 JSON 路径（缺省打印到标准输出）")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两份结果后退出")
+    args = ap.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    logging.disable(logging.WARNING)   # exifread 对损坏文件的告警会刷屏
+    n = parse_n(args.n)
+    root = Path(args.corpus or Path(tempfile.gettempdir()) / f"photo_meta_bench_{n}_{args.seed}")
+    t0 = time.perf_counter()
+    make_corpus(root, n, args.seed)
+    print(f"照片库：{root}（{n} 张，准备 {time.perf_counter() - t0:.1f}s）", file=sys.stderr)
+
+    results = run_suite(root, args.jobs, args.repeat, args.sample)
+    doc = {
+        "meta": {"commit": _commit(), "n": n, "seed": args.seed, "jobs": args.jobs,
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "exiftool": has_exiftool(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    text = json.dumps(doc, ensure_ascii=False, indent=1)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""网络盘延迟下的纯 Python 解析吞吐：逐个读 vs 文件头预读（prefetch.py）
+
+用法：
+    python benchmarks/bench_prefetch.py [--n 2000] [--latency-ms 2] [--depth 8 32 64] [--out 结果.json]
+不需要真的网络盘：LatencyFiles 把解析用到的 open() 换成打开一次、每次 read 各先等 latency 的包装，
+模拟 SMB/NFS 的往返（sleep 释放 GIL，和真实的网络等待一样能被并发掩盖）。
+只测单进程（进程池子进程里的 open 换不掉）；结果与逐个读逐条比对。结果 JSON 与 bench_pipeline --compare 兼容。
+"""
+import argparse, json, logging, os, platform, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from corpus import make_corpus, parse_n  # noqa: E402
+from bench_pipeline import Bench, _commit  # noqa: E402
+import exif_native, exif_parse, prefetch  # noqa: E402
+from focal_stats_jpg import Extractor, iter_photo_files  # noqa: E402
+
+CORPUS_N = "1k"
+
+
+class _SlowFile:
+    def __init__(self, f, latency):
+        self._f, self._latency = f, latency
+
+    def read(self, *args):
+        time.sleep(self._latency)
+        return self._f.read(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+
+class LatencyFiles:
+    """期间解析相关模块里的 open() 打开时、每次 read 时各等 latency 秒"""
+    MODULES = (exif_native, exif_parse, prefetch)
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def __enter__(self):
+        latency = self.latency
+
+        def slow_open(path, *args, **kw):
+            time.sleep(latency)
+            return _SlowFile(open(path, *args, **kw), latency)
+
+        for m in self.MODULES:
+            m.open = slow_open
+        return self
+
+    def __exit__(self, *exc):
+        for m in self.MODULES:
+            del m.open
+
+
+def parse_all(paths, depth):
+    with Extractor(use_exiftool=False, jobs=1, prefetch=depth) as ex:
+        return list(ex.parse_files(paths))
+
+
+def run_suite(paths, latency, depths, repeat):
+    b = Bench(repeat)
+    expect = b.run("local.serial", lambda: parse_all(paths, 0), items=len(paths))
+    got = b.run(f"local.prefetch.{max(depths)}", lambda: parse_all(paths, max(depths)), items=len(paths))
+    mismatches = sum(a != e for a, e in zip(got, expect))
+    with LatencyFiles(latency):
+        got = b.run("latency.serial", lambda: parse_all(paths, 0), items=len(paths), repeat=1)
+        mismatches += sum(a != e for a, e in zip(got, expect))
+        for d in depths:
+            got = b.run(f"latency.prefetch.{d}", lambda: parse_all(paths, d), items=len(paths))
+            b.results[f"latency.prefetch.{d}"]["max_buffer_bytes"] = d * exif_native.HEAD_BYTES
+            mismatches += sum(a != e for a, e in zip(got, expect))
+    return b.results, mismatches
+
+
+def main():
+    ap = argparse.ArgumentParser(description="网络盘延迟下的文件头预读基准")
+    ap.add_argument("--n", default=CORPUS_N, help="照片张数：1k / 100k 或整数")
+    ap.add_argument("--corpus", default=None, help="合成照片库目录（默认在临时目录下，按张数复用）")
+    ap.add_argument("--latency-ms", type=float, default=2.0, help="模拟的往返延迟（毫秒），默认 2")
+    ap.add_argument("--depth", type=int, nargs="+", default=[8, 32, 64], help="要测的预读深度")
+    ap.add_argument("--repeat", type=int, default=3, help="重复次数，取最好成绩（逐个读只跑一次）")
+    ap.add_argument("--out", default=None, help="结果 JSON 路径（缺省打印到标准输出）")
+    args = ap.parse_args()
+
+    logging.disable(logging.WARNING)   # exifread 对损坏文件的告警会刷屏
+    n = parse_n(args.n)
+    root = Path(args.corpus or Path(tempfile.gettempdir()) / f"photo_meta_bench_{n}_0")
+    make_corpus(root, n, 0)
+    paths = [p for p, _, _ in iter_photo_files(root)]
+    results, mismatches = run_suite(paths, args.latency_ms / 1000.0, args.depth, args.repeat)
+    print(f"与逐个读不一致：{mismatches}", file=sys.stderr)
+    doc = {
+        "meta": {"commit": _commit(), "n": n, "latency_ms": args.latency_ms, "mismatches": mismatches,
+                 "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    text = json.dumps(doc, ensure_ascii=False, indent=1)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
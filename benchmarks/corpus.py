@@ -0,0 +1,167 @@
+"""可复现的合成照片库：带真实感 EXIF 的极小 JPG，按 年/月/日 分目录
+
+用法：
+    python benchmarks/corpus.py <目录> [--n 1k|100k|1M|任意整数] [--seed 0]
+同一目录、同样的 n 与 seed 再次生成时直接复用（目录下 .corpus.json 记录参数）。
+机身取自 CROP_MAP 的关键字再加几台不在表里的；约 10% 的文件有缺失或损坏：
+无 EXIF、缺镜头/机身/等效焦距、APP1 被截断、扩展名是 .jpg 的非 JPEG 文件。
+"""
+import argparse, io, json, random, struct, sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from resolver import CROP_MAP  # noqa: E402
+
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+MANIFEST = ".corpus.json"
+FILES_PER_DIR = 200
+
+# CROP_MAP 的键是关键字（如 "OM-"），补成像样的型号名；再加几台表里没有的机身
+MODELS = sorted({k + "1" if k.endswith("-") else k for k in CROP_MAP}) + [
+    "Canon EOS 5D Mark IV", "NIKON Z 6_2", "iPhone 15 Pro", "DMC-LX100",
+]
+LENSES = [
+    "FE 24-70mm F2.8 GM", "FE 85mm F1.8", "E 16-50mm F3.5-5.6 OSS", "XF35mmF1.4 R",
+    "XF18-55mmF2.8-4 R LM OIS", "M.Zuiko Digital ED 12-40mm F2.8 PRO", "LUMIX G VARIO 12-60/F3.5-5.6",
+    "RF-S18-150mm F3.5-6.3 IS STM", "RF50mm F1.8 STM", "EF70-200mm f/2.8L IS III USM",
+    "NIKKOR Z 24-120mm f/4 S", "iPhone 15 Pro back triple camera 6.86mm f/1.78", "Samyang AF 35mm F1.8 FE",
+]
+FOCALS = [12, 14, 16, 18, 23, 24, 28, 35, 40, 50, 56, 70, 85, 105, 135, 200]
+SHUTTERS = [(1, 8000), (1, 4000), (1, 1000), (1, 500), (1, 250), (1, 125), (1, 60), (1, 30), (1, 4), (1, 1), (2, 1)]
+APERTURES = [(14, 10), (18, 10), (28, 10), (40, 10), (56, 10), (80, 10), (110, 10)]
+ISOS = [64, 100, 200, 400, 800, 1600, 3200, 6400, 12800]
+
+
+def parse_n(text):
+    return SCALES.get(text) or int(text.replace("_", ""))
+
+
+# ---------- 最小 TIFF/EXIF 编码 ----------
+def _entry(tag, value):
+    """(标签, 类型, 个数, 数据)"""
+    if isinstance(value, str):
+        data = value.encode("ascii", "replace") + b"\x00"
+        return tag, 2, len(data), data
+    if isinstance(value, tuple):
+        return tag, 5, 1, struct.pack("<II", *value)
+    return tag, 3, 1, struct.pack("<H", value)
+
+
+def _ifd(entries, offset, next_data):
+    """编码一个 IFD；offset 为本 IFD 的位置，next_data 为其外置数据区的起点。返回 (IFD 字节, 数据区字节)"""
+    entries = sorted(entries)
+    head = struct.pack("<H", len(entries))
+    data = b""
+    for tag, typ, count, raw in entries:
+        if len(raw) <= 4:
+            head += struct.pack("<HHI", tag, typ, count) + raw.ljust(4, b"\x00")
+        else:
+            head += struct.pack("<HHII", tag, typ, count, next_data + len(data))
+            data += raw + (b"\x00" if len(raw) % 2 else b"")
+    return head + b"\x00\x00\x00\x00", data
+
+
+def exif_tiff(ifd0, exif):
+    """{标签号: 值} 两组 -> 小端 TIFF；值为 str（ASCII）、int（SHORT）或 (分子, 分母)（RATIONAL）"""
+    e0 = [_entry(t, v) for t, v in ifd0.items()]
+    e1 = [_entry(t, v) for t, v in exif.items()]
+    n0 = len(e0) + 1                       # + ExifIFD 指针
+    ifd0_size = 2 + 12 * n0 + 4
+    exif_off = 8 + ifd0_size + sum(len(r) + len(r) % 2 for *_, r in e0 if len(r) > 4)
+    e0.append((0x8769, 4, 1, struct.pack("<I", exif_off)))
+    ifd0_bytes, data0 = _ifd(e0, 8, 8 + ifd0_size)
+    exif_size = 2 + 12 * len(e1) + 4
+    exif_bytes, data1 = _ifd(e1, exif_off, exif_off + exif_size)
+    return b"II*\x00" + struct.pack("<I", 8) + ifd0_bytes + data0 + exif_bytes + data1
+
+
+_BODY = None
+
+def _jpeg_body():
+    """一张 8x8 灰色 JPG 去掉 SOI 之后的部分（生成一次，所有文件共用）"""
+    global _BODY
+    if _BODY is None:
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.new("RGB", (8, 8), (128, 128, 128)).save(buf, "JPEG", quality=50)
+        _BODY = buf.getvalue()[2:]
+    return _BODY
+
+
+def jpeg_with_exif(tiff):
+    seg = b"Exif\x00\x00" + tiff
+    return b"\xff\xd8\xff\xe1" + struct.pack(">H", len(seg) + 2) + seg + _jpeg_body()
+
+
+# ---------- 生成 ----------
+def photo_bytes(rnd, i):
+    """第 i 张照片的文件内容；约 10% 带缺失或损坏"""
+    kind = rnd.random()
+    if kind < 0.01:                                  # 扩展名是 .jpg 的非 JPEG
+        return bytes(rnd.getrandbits(8) for _ in range(64))
+    if kind < 0.04:                                  # 无 EXIF
+        return b"\xff\xd8" + _jpeg_body()
+    model = rnd.choice(MODELS)
+    lens = rnd.choice(LENSES)
+    day = i // FILES_PER_DIR
+    ifd0 = {0x0110: model}
+    exif = {
+        0x829A: rnd.choice(SHUTTERS), 0x829D: rnd.choice(APERTURES), 0x8827: rnd.choice(ISOS),
+        0x9003: f"{2015 + day // 336 % 10}:{day // 28 % 12 + 1:02d}:{day % 28 + 1:02d} "
+                f"{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:{rnd.randrange(60):02d}",
+        0x920A: (rnd.choice(FOCALS) * 10, 10), 0xA434: lens,
+    }
+    if rnd.random() < 0.5:                           # 一半的机身自带等效焦距
+        exif[0xA405] = int(exif[0x920A][0] / 10 * rnd.choice((1.0, 1.5, 2.0)))
+    if kind < 0.09:                                  # 缺标签
+        for tag in rnd.sample([0x0110, 0xA434, 0x920A, 0x8827], rnd.randint(1, 2)):
+            ifd0.pop(tag, None); exif.pop(tag, None)
+    data = jpeg_with_exif(exif_tiff(ifd0, exif))
+    if 0.09 <= kind < 0.10:                          # APP1 被截断
+        data = data[:rnd.randint(20, 60)]
+    return data
+
+
+def rel_path(rnd, i):
+    day = i // FILES_PER_DIR
+    ext = ".JPG" if rnd.random() < 0.3 else ".jpg"
+    return f"{2015 + day // 336 % 10}/{day // 28 % 12 + 1:02d}/{day % 28 + 1:02d}/IMG_{i:07d}{ext}"
+
+
+def make_corpus(root, n, seed=0, quiet=False):
+    """在 root 下生成 n 张照片；参数与上次相同则直接复用。返回 root"""
+    root = Path(root)
+    manifest = root / MANIFEST
+    want = {"n": n, "seed": seed, "version": 1}
+    try:
+        if json.loads(manifest.read_text(encoding="utf-8")) == want:
+            return root
+    except (OSError, ValueError):
+        pass
+    rnd = random.Random(seed)
+    made = set()
+    for i in range(n):
+        rel = rel_path(rnd, i)
+        path = root / rel
+        parent = path.parent
+        if parent not in made:
+            parent.mkdir(parents=True, exist_ok=True)
+            made.add(parent)
+        path.write_bytes(photo_bytes(rnd, i))
+        if not quiet and (i + 1) % 10000 == 0:
+            print(f"  生成 {i + 1}/{n}", file=sys.stderr)
+    manifest.write_text(json.dumps(want), encoding="utf-8")
+    return root
+
+
+def main():
+    ap = argparse.ArgumentParser(description="生成合成照片库")
+    ap.add_argument("folder")
+    ap.add_argument("--n", default="1k", help="张数：1k / 100k / 1M 或整数")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    make_corpus(args.folder, parse_n(args.n), args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""exiftool 替身：实现本项目用到的那部分命令行（-json 输出、-@ 参数文件、-stay_open 协议）
+
+用内置 APP1 解析器读 EXIF，不依赖 Perl。用于在没有 exiftool 的机器上测试/压测进程池：
+    PHOTO_META_EXIFTOOL="python benchmarks/fake_exiftool.py" python focal_stats_jpg.py <目录>
+环境变量 FAKE_EXIFTOOL_DELAY=秒 可给每个文件加一段人为耗时，模拟真实 exiftool 的开销。
+"""
+import json, os, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from exif_native import parse_native  # noqa: E402
+
+EXTS = {".jpg", ".jpeg"}
+OPTS_WITH_VALUE = {"-ext", "-charset", "-@", "-stay_open", "-common_args"}
+DELAY = float(os.environ.get("FAKE_EXIFTOOL_DELAY", "0") or 0)
+
+
+def _entry(path):
+    if DELAY:
+        time.sleep(DELAY)
+    row = parse_native(path)
+    if row is None:
+        return None
+    out = {"SourceFile": path.replace(os.sep, "/"),
+           "FileName": os.path.basename(path), "Directory": os.path.dirname(path).replace(os.sep, "/")}
+    if row["model"]:
+        out["Model"] = row["model"]
+    if row["lens"]:
+        out["LensModel"] = row["lens"]
+    for key, name in (("focal_mm", "FocalLength"), ("focal_35mm", "FocalLengthIn35mmFormat"),
+                      ("fnumber", "FNumber")):
+        if row[key] is not None:
+            out[name] = row[key]
+    if row["exposure"]:
+        a, _, b = row["exposure"].partition("/")
+        out["ExposureTime"] = float(a) / float(b) if b else float(a)   # -n：数值输出
+    if row["iso"]:
+        out["ISO"] = int(row["iso"])
+    if row["datetime"]:
+        out["DateTimeOriginal"] = row["datetime"]
+    return out
+
+
+def _files(args):
+    """从参数里取出文件（目录按 -r 递归）"""
+    recursive = "-r" in args
+    files, skip = [], False
+    for a in args:
+        if skip:
+            skip = False
+            continue
+        if a in OPTS_WITH_VALUE:
+            skip = True
+            continue
+        if a.startswith("-"):
+            continue
+        if os.path.isdir(a):
+            walker = Path(a).rglob("*") if recursive else Path(a).iterdir()
+            files += [str(p) for p in walker if p.suffix.lower() in EXTS]
+        else:
+            files.append(a)
+    return files
+
+
+def _execute(args, out):
+    entries = [e for e in map(_entry, _files(args)) if e]
+    if entries:
+        out.write(json.dumps(entries, ensure_ascii=False, indent=1) + "\n")
+
+
+def main(argv):
+    out = sys.stdout
+    if "-stay_open" in argv:
+        common = argv[argv.index("-common_args") + 1:] if "-common_args" in argv else []
+        pending = []
+        for line in sys.stdin:
+            arg = line.rstrip("\r\n")
+            if arg.startswith("-execute"):
+                _execute(pending + common, out)
+                out.write("{ready%s}\n" % arg[len("-execute"):])
+                out.flush()
+                pending = []
+            elif pending[-1:] == ["-stay_open"] and arg.lower() == "false":
+                return
+            else:
+                pending.append(arg)
+        return
+    args = []
+    it = iter(argv)
+    for a in it:
+        if a == "-@":
+            with open(next(it), encoding="utf-8") as f:
+                args += [l.rstrip("\r\n") for l in f if l.strip()]
+        else:
+            args.append(a)
+    _execute(args, out)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
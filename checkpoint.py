@@ -0,0 +1,132 @@
+import hashlib, json, os, time
+from pathlib import Path
+
+from exif_cache import default_cache_path
+
+# ---------------------------
+# 读取断点：长时间的读取被取消 / 中断（Ctrl+C、信号、网络盘掉线）后，下次读同一文件夹从断点继续。
+# 每个根目录一个追加写的 JSON Lines 文件：首行为头部，之后每行一段进度——
+# 已处理完的目录（整棵子树：先序遍历已经离开它），以及（不用 EXIF 缓存时）新解析文件的 (相对路径, 大小, mtime_ns, 行)
+# 和在已处理完的目录里发现已删除的文件。
+# 续读时已处理完的目录不再列举，其中的行直接取自缓存 / 断点；其余文件照常核对，解析过的不再解析。
+# 定时追加并 fsync，只写新增部分；最后一行写了一半（进程被杀）读时忽略。读取完整结束后删除。
+# 用缓存时行已逐批写进缓存（缓存就是断点的行数据），这里只记目录
+# ---------------------------
+FORMAT = "photo-meta-checkpoint"
+VERSION = 2   # 1 的 dirs 只表示目录本层的文件处理完了，不能整棵跳过
+CHECKPOINT_SECONDS = 10.0   # 两次落盘的最短间隔
+
+
+def checkpoint_path(folder, cache_path=None):
+    """folder 的断点文件：缓存文件旁的 checkpoints/ 目录下，按根目录路径的哈希命名"""
+    base = Path(cache_path).expanduser().parent if cache_path else default_cache_path().parent
+    digest = hashlib.sha1(os.fspath(folder).encode("utf-8", "surrogatepass")).hexdigest()[:16]
+    return base / "checkpoints" / f"{digest}.jsonl"
+
+
+class ScanCheckpoint:
+    """一个根目录的读取断点。resume=True 时读入上次留下的进度：dirs 为已处理完的目录（整棵子树，绝对路径），
+    entries 为 {路径: (大小, mtime_ns, 行 JSON 或 None)}（格式同 ExifCache.load）；否则丢弃旧断点。
+    rows=False 时不记录行（行已在缓存里）。record() 累积进度，按 interval 秒定时落盘；
+    读取完整结束时 finish() 删除文件，中途停下时 close() 把剩余进度写出"""
+
+    def __init__(self, folder, path=None, rows=True, resume=True, interval=CHECKPOINT_SECONDS):
+        self.root = os.fspath(folder).rstrip("/\\")
+        self.path = Path(path) if path else checkpoint_path(self.root)
+        self.rows = rows
+        self.interval = float(interval)
+        self.dirs, self.entries = set(), {}
+        self._dirs, self._files, self._gone = [], [], []
+        self._file = None
+        self._last = time.monotonic()
+        if resume:
+            self._read()
+        elif self.path.exists():
+            self.path.unlink()
+        # 是否接着上次的文件追加：读入时定下，之后 dirs / entries 被取走（iter_gather 会清空 entries）也不变
+        self._resumed = bool(self.dirs or self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def resumed(self):
+        return self._resumed
+
+    def _rel(self, path):
+        return path[len(self.root) + 1:] if path.startswith(self.root) else path
+
+    def _abs(self, rel):
+        return os.path.join(self.root, rel) if rel else self.root
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = iter(f)
+                head = json.loads(next(lines, "null"))
+                if (not isinstance(head, dict) or head.get("format") != FORMAT or head.get("version") != VERSION
+                        or head.get("root") != self.root):
+                    return
+                for line in lines:
+                    try:
+                        part = json.loads(line)
+                    except ValueError:   # 写了一半的最后一行
+                        break
+                    self.dirs.update(self._abs(d) for d in part.get("dirs", ()))
+                    self.entries.update((self._abs(p), (size, mtime, row)) for p, size, mtime, row in part.get("files", ()))
+                    for p in part.get("gone", ()):
+                        self.entries.pop(self._abs(p), None)
+        except (OSError, ValueError, TypeError):
+            self.dirs, self.entries = set(), {}
+
+    def record(self, entries=(), dirs=(), gone=()):
+        """entries: 新解析的 (path, size, mtime_ns, row_or_None)；dirs: 刚处理完的目录（整棵子树，绝对路径）；
+        gone: 这些目录里已不存在的文件（记过行的要作废）"""
+        if self.rows:
+            self._files.extend((self._rel(p), size, mtime, None if row is None else
+                                json.dumps(row, ensure_ascii=False, default=str)) for p, size, mtime, row in entries)
+            self._gone.extend(self._rel(p) for p in gone)
+        self._dirs.extend(self._rel(d) for d in dirs)
+        if time.monotonic() - self._last >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self._last = time.monotonic()
+        if not (self._dirs or self._files or self._gone):
+            return
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fresh = not (self._resumed and self.path.exists())
+            self._file = open(self.path, "w" if fresh else "a", encoding="utf-8")
+            if fresh:
+                self._file.write(json.dumps({"format": FORMAT, "version": VERSION, "root": self.root,
+                                             "started": time.strftime("%Y-%m-%dT%H:%M:%S")}, ensure_ascii=False) + "\n")
+        part = {"dirs": self._dirs, "files": self._files}
+        if self._gone:
+            part["gone"] = self._gone
+        self._file.write(json.dumps(part, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._dirs, self._files, self._gone = [], [], []
+
+    def close(self):
+        """中途停下：写出尚未落盘的进度"""
+        if self.path is None:
+            return
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """读取完整结束：断点作废"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+        self.path = None
+        self._dirs, self._files, self._gone = [], [], []
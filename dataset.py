@@ -0,0 +1,638 @@
+import calendar, math, os, re, sys
+from array import array
+from itertools import accumulate
+import numpy as np
+
+import profiling
+from resolver import crop_resolver, lens_bounds
+
+# ---------------------------
+# 列式数据集：每张照片一行，数值列为 float64 数组（缺失为 NaN），
+# 机身/镜头存整数编码（-1 表示缺失）+ 字符串表；筛选用布尔掩码，分箱用 bincount
+# ---------------------------
+NUM_COLS = ("focal_mm", "focal_35mm", "iso", "shutter_s", "shutter_stops", "taken")
+CODE_COLS = ("model_code", "lens_code")
+HIST_MAX_DENSE_BINS = 1 << 20   # 箱数超过这个量级（多半是异常值）就改用 np.unique
+TIME_INDEX_MAX_CELLS = 8 << 20  # 按时间分桶的累计直方图最多这么多格（int32），超出就把桶放宽
+SKETCH_ALPHA = 0.005            # 分位数草图的相对误差上限
+QUANTILES = (0.1, 0.5, 0.9)     # 汇总里报告的分位数：p10 / 中位数 / p90
+
+# EXIF 拍摄时间没有时区，一律当作 UTC 换算成时间戳（只用于排序与区间比较，不做时区换算）
+_DATETIME_RE = re.compile(r"\s*(\d{4})(?:[:/-](\d{1,2})(?:[:/-](\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?)?)?")
+
+
+# ---------- 工具函数 ----------
+def parse_shutter_to_stops(exposure_str):
+    if exposure_str is None:
+        return None, None
+    s = str(exposure_str).strip()
+    try:
+        if "/" in s:
+            a, b = s.split("/", 1)
+            val = float(a) / float(b)
+        else:
+            val = float(s)
+        if val <= 0:
+            return None, None
+        stops = math.log2(1.0 / val)
+        return val, stops
+    except Exception:
+        s2 = re.sub(r"[^0-9./]", "", s)
+        try:
+            if "/" in s2:
+                a, b = s2.split("/", 1)
+                val = float(a) / float(b)
+            else:
+                val = float(s2)
+            if val <= 0:
+                return None, None
+            stops = math.log2(1.0 / val)
+            return val, stops
+        except Exception:
+            return None, None
+
+
+def parse_exif_datetime(text):
+    """'2024:05:01 12:34:56'（也接受 - / 分隔、ISO 的 T）-> 时间戳（秒）；缺失、全零或不合法为 None"""
+    if text is None:
+        return None
+    m = _DATETIME_RE.match(str(text))
+    if not m or m.group(3) is None:
+        return None
+    y, mo, d, hh, mm, ss = (int(g) if g else 0 for g in m.groups())
+    if not (y >= 1 and 1 <= mo <= 12 and 1 <= d <= calendar.monthrange(y, mo)[1] and hh < 24 and mm < 60 and ss < 61):
+        return None
+    return float(calendar.timegm((y, mo, d, hh, mm, ss)))
+
+
+def parse_date_bound(text, end=False):
+    """命令行 --since / --until 的日期：YYYY、YYYY-MM、YYYY-MM-DD 或再带 HH:MM[:SS]。
+    end=True 时返回该时间段结束后的第一秒（区间为左闭右开），如 2024 -> 2025-01-01 00:00:00"""
+    m = _DATETIME_RE.fullmatch(str(text).strip())
+    if not m:
+        raise ValueError(f"日期格式应为 YYYY[-MM[-DD[ HH:MM[:SS]]]]：{text}")
+    y, mo, d, hh, mm, ss = m.groups()
+    parts = [int(y), int(mo or 1), int(d or 1), int(hh or 0), int(mm or 0), int(ss or 0)]
+    if not (parts[0] >= 1 and 1 <= parts[1] <= 12 and 1 <= parts[2] <= calendar.monthrange(parts[0], parts[1])[1]
+            and parts[3] < 24 and parts[4] < 60 and parts[5] < 60):
+        raise ValueError(f"日期不合法：{text}")
+    t = calendar.timegm(tuple(parts))
+    if end:
+        if mo is None:      # 整年：下一年的第一天
+            t = calendar.timegm((parts[0] + 1, 1, 1, 0, 0, 0))
+        elif d is None:     # 整月：下个月的第一天
+            t = calendar.timegm((parts[0] + parts[1] // 12, parts[1] % 12 + 1, 1, 0, 0, 0))
+        else:
+            t += 86400 if hh is None else 60 if ss is None else 1
+    return float(t)
+
+
+def month_index(taken):
+    """时间戳数组 -> 自 1970-01 起的月序号（int64；缺失为 -1）"""
+    t = np.asarray(taken, dtype=np.float64)
+    out = np.full(len(t), -1, dtype=np.int64)
+    ok = np.isfinite(t)
+    out[ok] = t[ok].astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+    return out
+
+
+def month_label(month):
+    """月序号 -> 'YYYY-MM'"""
+    y, m = divmod(int(month), 12)
+    return f"{1970 + y}-{m + 1:02d}"
+
+
+def safe_float(x):
+    try:
+        return float(x)
+    except Exception:
+        return None
+
+
+def histogram(values, bin_width):
+    """数组分箱（箱中心 = round(v / bw) * bw）；返回升序的 (xs, counts) 两个列表，只含非空箱"""
+    v = np.asarray(values, dtype=np.float64)
+    v = v[np.isfinite(v)]
+    if not len(v):
+        return [], []
+    bw = max(1e-6, float(bin_width))
+    idx = np.round(v / bw).astype(np.int64)
+    lo, hi = int(idx.min()), int(idx.max())
+    if hi - lo < HIST_MAX_DENSE_BINS:
+        counts = np.bincount(idx - lo)
+        keys = np.nonzero(counts)[0]
+        counts = counts[keys]
+        keys = keys + lo
+    else:
+        keys, counts = np.unique(idx, return_counts=True)
+    return (keys * bw).tolist(), counts.tolist()
+
+
+def sketch_keys(values, alpha=SKETCH_ALPHA):
+    """分位数草图（DDSketch 式对数分桶）：正值 v -> 桶号 ceil(log_γ v)，γ = (1+α)/(1-α)；非正值与缺失为 NaN。
+    桶号当作取值、箱宽 1 交给 HistogramCube 计数，就得到每个 (机身, 镜头) 组合一份草图，
+    桶数只取决于取值范围（焦距 1~2000mm 约 760 个），任意几份相加即合并"""
+    gamma = (1 + alpha) / (1 - alpha)
+    v = np.asarray(values, dtype=np.float64)
+    out = np.full(len(v), np.nan)
+    ok = np.isfinite(v) & (v > 0)
+    out[ok] = np.ceil(np.log(v[ok]) / math.log(gamma))
+    return out
+
+
+def sketch_quantiles(keys, counts, qs=QUANTILES, alpha=SKETCH_ALPHA):
+    """由草图的 (桶号, 张数) 求分位数，与真实值的相对误差不超过 alpha。
+    counts 为一维（一组）或二维（每行一组）；返回 (组数, len(qs))，没有数据的组为 NaN"""
+    gamma = (1 + alpha) / (1 - alpha)
+    keys = np.asarray(keys, dtype=np.float64)
+    counts = np.atleast_2d(np.asarray(counts))
+    out = np.full((len(counts), len(qs)), np.nan)
+    if not keys.size:
+        return out
+    cum = np.cumsum(counts, axis=1)
+    n = cum[:, -1]
+    for j, q in enumerate(qs):
+        idx = (cum > (q * (n - 1))[:, None]).argmax(axis=1)    # 第 q*(n-1) 名（从 0 数）所在的桶
+        out[:, j] = 2 * gamma ** keys[idx] / (gamma + 1)      # 桶内相对误差最小的代表值
+    out[n == 0] = np.nan
+    return out
+
+
+def _dense_unique(keys, n_keys):
+    """np.unique(keys, return_inverse=True) 的快速版：键域 [0, n_keys) 不大时用查表代替排序"""
+    if n_keys > HIST_MAX_DENSE_BINS:
+        uniq, inv = np.unique(keys, return_inverse=True)
+        return uniq, inv.ravel()
+    present = np.bincount(keys, minlength=n_keys) > 0
+    uniq = np.flatnonzero(present)
+    lookup = np.cumsum(present) - 1
+    return uniq, lookup[keys]
+
+
+def _nan(x):
+    return np.nan if x is None else x
+
+
+_ALTSEP = os.altsep or os.sep
+
+
+def _split_path(path):
+    """拆成 (目录含末尾分隔符, 文件名)；两段直接拼接即原路径（不做任何规范化）"""
+    i = max(path.rfind(os.sep), path.rfind(_ALTSEP)) + 1
+    return path[:i], path[i:]
+
+
+class PathTable:
+    """紧凑的文件路径列：目录表 + 每个文件的目录编码 + 文件名（UTF-8 拼成一整块，按偏移切分）。
+    同一目录下的文件共用一个目录字符串，每个文件只占 目录编码 4 字节 + 偏移 8 字节 + 文件名本身；
+    用法同只读列表（len / 下标 / 迭代得到完整路径），None 也可以存"""
+
+    __slots__ = ("dirs", "_dir_ix", "_dir", "_off", "_blob")
+
+    def __init__(self, paths=()):
+        self.dirs = []                 # 编码 -> 目录（含末尾分隔符）
+        self._dir_ix = {}
+        self._dir = array("i")         # 每个文件的目录编码，-1 表示路径为 None
+        self._off = array("q", [0])    # 第 i 个文件名在 _blob 中为 [_off[i], _off[i+1])
+        self._blob = bytearray()
+        self.extend(paths)
+
+    def __len__(self):
+        return len(self._dir)
+
+    def __getitem__(self, i):
+        d = self._dir[i]
+        if d < 0:
+            return None
+        i = i % len(self._dir)
+        return self.dirs[d] + self._blob[self._off[i]:self._off[i + 1]].decode("utf-8", "surrogateescape")
+
+    def __iter__(self):
+        dirs = self.dirs
+        for d, name in zip(self._dir, self._names()):
+            yield None if d < 0 else dirs[d] + name
+
+    def _names(self):
+        off = self._off.tolist()
+        if self._blob.isascii():       # 常见情况：整块解码一次，按偏移切字符串
+            text = self._blob.decode("ascii")
+            return (text[a:b] for a, b in zip(off, off[1:]))
+        blob = bytes(self._blob)
+        return (blob[a:b].decode("utf-8", "surrogateescape") for a, b in zip(off, off[1:]))
+
+    def _code(self, d):
+        c = self._dir_ix.get(d)
+        if c is None:
+            c = self._dir_ix[d] = len(self.dirs)
+            self.dirs.append(d)
+        return c
+
+    def extend(self, paths):
+        base = len(self._blob)
+        if isinstance(paths, PathTable):
+            remap = [self._code(d) for d in paths.dirs] + [-1]
+            self._dir.extend([remap[c] for c in paths._dir])
+            self._off.extend([o + base for o in paths._off[1:]])
+            self._blob += paths._blob
+            return
+        index, codes, names = self._dir_ix, [], []
+        sep, alt = os.sep, os.altsep
+        for p in paths:     # 热循环：_split_path 展开在这里
+            if p is None:
+                codes.append(-1)
+                names.append(b"")
+                continue
+            if type(p) is not str:
+                p = os.fspath(p)
+            i = p.rfind(sep) + 1
+            if alt:
+                i = max(i, p.rfind(alt) + 1)
+            d = p[:i]
+            c = index.get(d)
+            codes.append(self._code(d) if c is None else c)
+            names.append(p[i:].encode("utf-8", "surrogateescape"))
+        ends = accumulate(map(len, names), initial=base)
+        next(ends)
+        self._dir.extend(codes)
+        self._off.extend(ends)
+        self._blob += b"".join(names)
+
+    def append(self, path):
+        self.extend((path,))
+
+    def nbytes(self):
+        """大致的内存占用（字节）"""
+        return (self._dir.itemsize * len(self._dir) + self._off.itemsize * len(self._off) + len(self._blob)
+                + sum(sys.getsizeof(d) for d in self.dirs))
+
+    def isin(self, paths):
+        """布尔数组：每个文件的路径是否在 paths 中（只逐个比较所在目录出现在 paths 里的文件）"""
+        want = {}
+        for p in paths:
+            if p is not None:
+                d, name = _split_path(os.fspath(p))
+                c = self._dir_ix.get(d)
+                if c is not None:
+                    want.setdefault(c, set()).add(name.encode("utf-8", "surrogateescape"))
+        codes = np.frombuffer(self._dir, dtype=np.int32)
+        mask = np.zeros(len(codes), dtype=bool)
+        if want:
+            idx = np.flatnonzero(np.isin(codes, list(want)))
+            off = np.frombuffer(self._off, dtype=np.int64)
+            blob = bytes(self._blob)
+            mask[idx] = [blob[a:b] in want[c] for c, a, b in
+                         zip(codes[idx].tolist(), off[idx].tolist(), off[idx + 1].tolist())]
+        return mask
+
+    def take(self, keep):
+        """按布尔掩码筛选出新表；不再用到的目录一并去掉"""
+        keep = np.asarray(keep, dtype=bool)
+        codes = np.frombuffer(self._dir, dtype=np.int32)[keep]
+        lengths = np.diff(np.frombuffer(self._off, dtype=np.int64))
+        used = np.bincount(codes[codes >= 0], minlength=len(self.dirs)) > 0
+        remap = np.append(np.cumsum(used) - 1, -1).astype(np.int32)
+        out = PathTable()
+        out.dirs = [d for d, u in zip(self.dirs, used) if u]
+        out._dir_ix = {d: i for i, d in enumerate(out.dirs)}
+        out._dir = array("i", remap[codes].tobytes())
+        out._off = array("q", np.concatenate(([0], np.cumsum(lengths[keep]))).astype(np.int64).tobytes())
+        out._blob = bytearray(np.frombuffer(self._blob, dtype=np.uint8)[np.repeat(keep, lengths)].tobytes())
+        return out
+
+
+class PhotoDataset:
+    """列式照片数据集；用 from_rows() 由 gather_rows 的行构造，extend() 合并分批到达的数据"""
+
+    def __init__(self):
+        self.models, self.lenses = [], []          # 编码 -> 名称
+        self._model_ix, self._lens_ix = {}, {}     # 名称 -> 编码
+        self.files = PathTable()                   # 每行的文件路径（紧凑存储）
+        self._cols = {c: np.empty(0, dtype=np.float64) for c in NUM_COLS}
+        self._cols.update({c: np.empty(0, dtype=np.int32) for c in CODE_COLS})
+        self._parts = []                           # 尚未合并进 _cols 的列块
+        self._n = 0
+        self.version = 0                           # 数据变化时递增，供外部缓存判断失效
+        self._pairs = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        ds = cls()
+        ds.append_rows(rows)
+        return ds
+
+    def __len__(self):
+        return self._n
+
+    def nbytes(self):
+        """大致的内存占用（字节）：数值 / 编码列 + 路径表 + 名称表"""
+        cols = sum(self.column(c).nbytes for c in self._cols)
+        return cols + self.files.nbytes() + sum(sys.getsizeof(n) for n in self.models + self.lenses)
+
+    # ---- 构造 ----
+    @staticmethod
+    def _code(names, index, name):
+        if not name:
+            return -1
+        c = index.get(name)
+        if c is None:
+            c = index[name] = len(names)
+            names.append(name)
+        return c
+
+    def append_rows(self, rows):
+        with profiling.span("dataset.append"):
+            self._append_rows(rows)
+
+    def _append_rows(self, rows):
+        mcodes, lcodes, mm, f35, iso, sh_s, sh_stops, taken = [], [], [], [], [], [], [], []
+        shutter_memo = {}
+        files = []
+        for r in rows:
+            files.append(r.get("file"))
+            mcodes.append(self._code(self.models, self._model_ix, r.get("model")))
+            lcodes.append(self._code(self.lenses, self._lens_ix, r.get("lens")))
+            mm.append(_nan(safe_float(r.get("focal_mm"))))
+            f35.append(_nan(safe_float(r.get("focal_35mm")) or None))
+            iso.append(_nan(safe_float(r.get("iso"))))
+            exp = r.get("exposure")
+            key = str(exp)
+            if key not in shutter_memo:
+                shutter_memo[key] = parse_shutter_to_stops(exp)
+            s, st = shutter_memo[key]
+            sh_s.append(_nan(s)); sh_stops.append(_nan(st))
+            taken.append(_nan(parse_exif_datetime(r.get("datetime"))))
+        if not mcodes:
+            return
+        self.files.extend(files)
+        part = {
+            "model_code": np.array(mcodes, dtype=np.int32),
+            "lens_code": np.array(lcodes, dtype=np.int32),
+            "focal_mm": np.array(mm, dtype=np.float64),
+            "iso": np.array(iso, dtype=np.float64),
+            "shutter_s": np.array(sh_s, dtype=np.float64),
+            "shutter_stops": np.array(sh_stops, dtype=np.float64),
+            "taken": np.array(taken, dtype=np.float64),
+        }
+        # EXIF 无等效焦距时按机身猜裁切系数（每个机身只算一次）
+        exif35 = np.array(f35, dtype=np.float64)
+        guess = np.round(part["focal_mm"] * self.crop_table()[part["model_code"]], 1)
+        guess[part["focal_mm"] == 0] = np.nan
+        part["focal_35mm"] = np.where(np.isnan(exif35), guess, exif35)
+        self._parts.append(part)
+        self._n += len(mcodes)
+        self.version += 1
+
+    def extend(self, other):
+        """合并另一个数据集（按名称重映射编码）"""
+        if not len(other):
+            return
+        mmap = np.array([self._code(self.models, self._model_ix, n) for n in other.models] + [-1], dtype=np.int32)
+        lmap = np.array([self._code(self.lenses, self._lens_ix, n) for n in other.lenses] + [-1], dtype=np.int32)
+        part = {c: other.column(c) for c in NUM_COLS}
+        part["model_code"] = mmap[other.model_code]
+        part["lens_code"] = lmap[other.lens_code]
+        self.files.extend(other.files)
+        self._parts.append(part)
+        self._n += len(other)
+        self.version += 1
+
+    def remove_files(self, paths):
+        """删除这些文件对应的行（监视模式下文件被删除 / 修改后重新导入前调用）；返回删掉的行数。
+        不再出现的机身/镜头名一并从字符串表里去掉，编码随之重排"""
+        paths = set(paths)
+        if not paths or not self._n:
+            return 0
+        keep = ~self.files.isin(paths)
+        dropped = self._n - int(keep.sum())
+        if not dropped:
+            return 0
+        for c in self._cols:
+            self._cols[c] = self.column(c)[keep]
+        self.files = self.files.take(keep)
+        self._n -= dropped
+        for col, names, attr in (("model_code", self.models, "_model_ix"), ("lens_code", self.lenses, "_lens_ix")):
+            codes = self._cols[col]
+            used = np.bincount(codes[codes >= 0], minlength=len(names)) > 0
+            if used.all():
+                continue
+            remap = np.append(np.cumsum(used) - 1, -1).astype(np.int32)   # 末格对应缺失编码 -1
+            self._cols[col] = remap[codes]
+            names[:] = [n for n, u in zip(names, used) if u]
+            setattr(self, attr, {n: i for i, n in enumerate(names)})
+        self.version += 1
+        return dropped
+
+    # ---- 列访问 ----
+    def column(self, name):
+        if self._parts:
+            for c in self._cols:
+                self._cols[c] = np.concatenate([self._cols[c]] + [p[c] for p in self._parts])
+            self._parts = []
+        return self._cols[name]
+
+    focal_mm = property(lambda self: self.column("focal_mm"))
+    focal_35mm = property(lambda self: self.column("focal_35mm"))
+    iso = property(lambda self: self.column("iso"))
+    shutter_s = property(lambda self: self.column("shutter_s"))
+    shutter_stops = property(lambda self: self.column("shutter_stops"))
+    taken = property(lambda self: self.column("taken"))     # 拍摄时间戳（秒，见 parse_exif_datetime）
+    model_code = property(lambda self: self.column("model_code"))
+    lens_code = property(lambda self: self.column("lens_code"))
+
+    # ---- 按编码的查找表（最后一格对应缺失编码 -1）----
+    def crop_table(self, overrides=None):
+        """每个机身编码的裁切系数（NaN 表示未知）；overrides 为 {机身名: 系数}"""
+        return crop_resolver(overrides).table(self.models)
+
+    def _name_mask(self, names, index, selected):
+        table = np.zeros(len(names) + 1, dtype=bool)
+        table[-1] = True                 # 缺失的机身/镜头不受筛选影响
+        for n in selected:
+            c = index.get(n)
+            if c is not None:
+                table[c] = True
+        return table
+
+    # ---- 筛选 ----
+    def selection_mask(self, cams=None, lenses=None):
+        """与原逻辑一致：选择集为空时不过滤；没有机身/镜头信息的照片始终保留"""
+        mask = np.ones(len(self), dtype=bool)
+        if cams:
+            mask &= self._name_mask(self.models, self._model_ix, cams)[self.model_code]
+        if lenses:
+            mask &= self._name_mask(self.lenses, self._lens_ix, lenses)[self.lens_code]
+        return mask
+
+    def time_mask(self, since=None, until=None):
+        """拍摄时间在 [since, until) 内（时间戳，None 表示不限）；任一端有限制时，没有拍摄时间的照片不保留"""
+        if since is None and until is None:
+            return np.ones(len(self), dtype=bool)
+        t = self.taken
+        mask = np.isfinite(t)
+        if since is not None:
+            mask &= t >= since
+        if until is not None:
+            mask &= t < until
+        return mask
+
+    def month_mask(self, first, last):
+        """拍摄月份在 [first, last]（月序号，含两端）内的照片"""
+        m = month_index(self.taken)
+        return (m >= first) & (m <= last)
+
+    def month_range(self):
+        """有拍摄时间的照片所在的 (最早月, 最晚月) 月序号（见 month_index）；都没有时为 None"""
+        t = self.taken
+        t = t[np.isfinite(t)]
+        if not len(t):
+            return None
+        lo, hi = month_index([t.min(), t.max()])
+        return int(lo), int(hi)
+
+    def sanity_mask(self, tol_percent=5.0, tol_abs_mm=2.0):
+        """按镜头标称焦段筛掉物理焦距明显不合理的照片（同 in_physical_range）"""
+        lo, hi = lens_bounds(self.lenses, tol_percent, tol_abs_mm)
+        mm = self.focal_mm
+        code = self.lens_code
+        return np.isnan(mm) | ((lo[code] <= mm) & (mm <= hi[code]))
+
+    # ---- (机身, 镜头) 组合 ----
+    def pairs(self):
+        """(每行的组合编号, 各组合的机身编码, 各组合的镜头编码)；只含实际出现过的组合"""
+        if self._pairs is None or self._pairs[0] != self.version:
+            width = len(self.lenses) + 1
+            key = (self.model_code.astype(np.int64) + 1) * width + (self.lens_code + 1)
+            uniq, inv = _dense_unique(key, (len(self.models) + 1) * width)
+            self._pairs = (self.version, inv, (uniq // width - 1).astype(np.int32),
+                           (uniq % width - 1).astype(np.int32))
+        return self._pairs[1:]
+
+    def pair_selection(self, cams=None, lenses=None):
+        """选择集对应的组合掩码（语义同 selection_mask）"""
+        _, pm, pl = self.pairs()
+        sel = np.ones(len(pm), dtype=bool)
+        if cams:
+            sel &= self._name_mask(self.models, self._model_ix, cams)[pm]
+        if lenses:
+            sel &= self._name_mask(self.lenses, self._lens_ix, lenses)[pl]
+        return sel
+
+    def pair_selection_bits(self, cams=None, lenses=None):
+        """同 pair_selection，选择集为按名称表编码的布尔数组（位图，与 models / lenses 等长）；全为 False 时同样不过滤"""
+        _, pm, pl = self.pairs()
+        sel = np.ones(len(pm), dtype=bool)
+        if cams is not None and cams.any():
+            sel &= np.append(cams, True)[pm]
+        if lenses is not None and lenses.any():
+            sel &= np.append(lenses, True)[pl]
+        return sel
+
+    def name_counts(self):
+        """各机身、各镜头的照片数：(按 models 编码, 按 lenses 编码)"""
+        return tuple(np.bincount(codes[codes >= 0], minlength=len(names))
+                     for codes, names in ((self.model_code, self.models), (self.lens_code, self.lenses)))
+
+    def focal35(self, overrides=None):
+        """等效焦距列；overrides 中的机身一律用 物理焦距 × 指定系数"""
+        if not overrides:
+            return self.focal_35mm
+        ovr = np.array([_nan(overrides.get(m)) for m in self.models] + [np.nan], dtype=np.float64)
+        cf = ovr[self.model_code]
+        return np.where(np.isnan(cf), self.focal_35mm, self.focal_mm * cf)
+
+
+class HistogramCube:
+    """按 (机身, 镜头) 组合预先分好箱的直方图：counts[组合, 箱]。
+    分析模式、箱宽、合理性容差、裁切表固定时，结果只取决于选中了哪些组合，
+    所以改选择只需把选中组合的行相加，代价与照片数无关。
+    by_month=True 时另按拍摄月份分桶存累计计数 prefix[k, 组合, 箱]（前 k 个桶之和），
+    任意月份区间的直方图 = 两行相减，同样与照片数无关"""
+
+    def __init__(self, ds, values, bin_width, keep=None, by_month=False):
+        """values：每行的取值（NaN 不计）；keep：额外的行掩码（如合理性筛选），不保留的行完全不计"""
+        inv, pm, _ = ds.pairs()
+        months = month_index(ds.taken) if by_month else None
+        self._build(inv, len(pm), values, bin_width, keep, months=months)
+
+    @classmethod
+    def from_counts(cls, inv, n_pairs, values, weights, bin_width, keep=None):
+        """由已聚合的 (组合, 取值, 张数) 表构造（摘要文件用）：每个条目按 weights 张计"""
+        cube = cls.__new__(cls)
+        cube._build(inv, n_pairs, values, bin_width, keep, weights)
+        return cube
+
+    def _build(self, inv, n_pairs, values, bin_width, keep=None, weights=None, months=None):
+        keep = np.ones(len(inv), dtype=bool) if keep is None else keep
+        w = None if weights is None else weights[keep]
+        self.rows = np.bincount(inv[keep], weights=w, minlength=n_pairs).astype(np.int64, copy=False)  # 每个组合保留的照片数
+        ok = keep & np.isfinite(values)
+        bw = max(1e-6, float(bin_width))
+        idx = np.round(values[ok] / bw).astype(np.int64)
+        lo = int(idx.min()) if len(idx) else 0
+        keys, bins = _dense_unique(idx - lo, int(idx.max()) - lo + 1 if len(idx) else 0)
+        self.xs = (keys + lo) * bw
+        nb = len(keys)
+        flat = inv[ok].astype(np.int64) * nb + bins
+        w = None if weights is None else weights[ok]
+        self.counts = np.bincount(flat, weights=w, minlength=n_pairs * nb).astype(np.int64, copy=False).reshape(n_pairs, nb)
+        self.prefix = self.prefix_rows = self.month_start = None
+        if months is not None:
+            self._build_months(inv, n_pairs, months, keep, ok, bins, nb)
+
+    def group_counts(self, group, n_groups):
+        """把 (组合, 箱) 计数按组合所属的组（机身或镜头编码，-1 缺失）相加：
+        返回 (counts (组数+1, 箱数), 每组照片数)，最后一行为缺失"""
+        out = np.zeros((n_groups + 1, self.counts.shape[1]), dtype=np.int64)
+        np.add.at(out, group, self.counts)
+        rows = np.bincount(np.where(group < 0, n_groups, group), weights=self.rows, minlength=n_groups + 1)
+        return out, rows.astype(np.int64)
+
+    def _build_months(self, inv, n_pairs, months, keep, ok, bins, nb):
+        dated = months >= 0
+        if not dated.any():
+            return
+        lo, hi = int(months[dated].min()), int(months[dated].max())
+        step = 1      # 桶宽（月）；格数超限时放宽到 季度 / 年 / 2 年 …
+        while ((hi - lo + lo % step) // step + 1) * n_pairs * nb > TIME_INDEX_MAX_CELLS and step <= hi - lo:
+            step = {1: 3, 3: 12}.get(step, step * 2)
+        base = lo - lo % step    # 桶与自然季度 / 年对齐
+        n_buckets = (hi - base) // step + 1
+        bucket = (months - base) // step
+        kept = keep & dated
+        rows = np.bincount(bucket[kept] * n_pairs + inv[kept], minlength=n_buckets * n_pairs)
+        self.prefix_rows = np.zeros((n_buckets + 1, n_pairs), dtype=np.int64)
+        np.cumsum(rows.reshape(n_buckets, n_pairs), axis=0, out=self.prefix_rows[1:])
+        sel = ok & dated
+        flat = (bucket[sel] * n_pairs + inv[sel]) * nb + bins[dated[ok]]
+        counts = np.bincount(flat, minlength=n_buckets * n_pairs * nb).reshape(n_buckets, n_pairs, nb)
+        self.prefix = np.zeros((n_buckets + 1, n_pairs, nb), dtype=np.int32)
+        np.cumsum(counts, axis=0, dtype=np.int32, out=self.prefix[1:])
+        self.month_start = base + step * np.arange(n_buckets + 1)    # 各桶起始月序号（末项为结束）
+
+    def _buckets(self, months):
+        """月份区间 (首月, 末月)（含两端）-> 覆盖它的桶区间 [i, j)；桶宽大于 1 个月时向外取整"""
+        if self.month_start is None:
+            raise ValueError("该直方图没有按拍摄时间建索引（by_month=False，或没有照片有拍摄时间）")
+        first, last = months
+        i = np.searchsorted(self.month_start, first, side="right") - 1
+        j = np.searchsorted(self.month_start, last, side="right")
+        n = len(self.month_start) - 1
+        return min(max(i, 0), n), min(max(j, 0), n)
+
+    def month_span(self, months):
+        """查询 months 时实际覆盖的 (首月, 末月)；桶宽为 1 个月时即 months 本身（与数据范围取交集）"""
+        i, j = self._buckets(months)
+        return int(self.month_start[i]), int(self.month_start[j]) - 1
+
+    def query(self, pair_mask, months=None):
+        """选中组合的 (xs, counts, 照片数)；xs/counts 与 histogram() 的结果一致。
+        months 为 (首月, 末月) 月序号（见 month_index）时只计该区间内拍摄的照片，没有拍摄时间的不计"""
+        if months is None:
+            h = self.counts[pair_mask].sum(axis=0)
+            n = self.rows[pair_mask].sum()
+        else:
+            i, j = self._buckets(months)
+            h = (self.prefix[j][pair_mask] - self.prefix[i][pair_mask]).sum(axis=0, dtype=np.int64)
+            n = (self.prefix_rows[j] - self.prefix_rows[i])[pair_mask].sum()
+        nz = np.nonzero(h)[0]
+        return self.xs[nz].tolist(), h[nz].tolist(), int(n)
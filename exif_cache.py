@@ -0,0 +1,77 @@
+import json, os, sqlite3, sys
+from pathlib import Path
+
+# ---------------------------
+# EXIF 持久缓存：以 路径 + 大小 + mtime 为键，保存归一化后的行
+# ---------------------------
+CACHE_ENV = "PHOTO_META_CACHE"   # 可用环境变量指定缓存文件位置
+
+
+def default_cache_path() -> Path:
+    """默认缓存位置：用户缓存目录下的 photo_meta_analyzer/exif_cache.sqlite"""
+    env = os.environ.get(CACHE_ENV)
+    if env:
+        return Path(env).expanduser()
+    if sys.platform.startswith("win"):
+        base = Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Caches"
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    return base / "photo_meta_analyzer" / "exif_cache.sqlite"
+
+
+def _prefix_bounds(folder):
+    """folder 下所有路径在字典序上的区间 [lo, hi)，便于走索引范围查询"""
+    root = str(folder).rstrip("/\\")
+    return root + os.sep, root + chr(ord(os.sep) + 1)
+
+
+class ExifCache:
+    """SQLite 缓存；row 为 NULL 表示该文件无可用 EXIF（同样缓存，避免反复重试）"""
+
+    def __init__(self, db_path=None):
+        self.path = Path(db_path) if db_path else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, row TEXT)"
+        )
+        self.conn.commit()
+
+    def load(self, folder):
+        """读出 folder 下全部缓存条目：{path: (size, mtime_ns, row_or_None)}"""
+        lo, hi = _prefix_bounds(folder)
+        cur = self.conn.execute(
+            "SELECT path, size, mtime_ns, row FROM files WHERE path >= ? AND path < ?", (lo, hi))
+        return {p: (size, mtime, row) for p, size, mtime, row in cur}
+
+    @staticmethod
+    def decode(row_text):
+        return json.loads(row_text) if row_text is not None else None
+
+    def store(self, entries):
+        """entries: 可迭代的 (path, size, mtime_ns, row_or_None)"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, row) VALUES (?, ?, ?, ?)",
+            ((p, size, mtime, None if row is None else json.dumps(row, ensure_ascii=False, default=str))
+             for p, size, mtime, row in entries))
+        self.conn.commit()
+
+    def prune(self, paths):
+        """删除已不存在的文件"""
+        self.conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in paths))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,194 @@
+import struct
+from fractions import Fraction
+
+# ---------------------------
+# 极简 JPEG/TIFF-IFD 解析：只读文件头部的 APP1(Exif) 段，只解码本项目用到的标签
+# 输出格式与 Pillow + exifread 路径一致；遇到不认识的文件返回 None，由调用方回退
+# ---------------------------
+HEAD_BYTES = 64 * 1024  # 先读这么多；APP1 更长时再补读
+
+# 类型编号 -> 单个值的字节数
+_TYPE_SIZE = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+_IFD0_TAGS = {0x0110: "Model", 0x0132: "DateTime", 0x8769: "ExifIFD"}
+_EXIF_TAGS = {
+    0x829A: "ExposureTime", 0x829D: "FNumber", 0x8827: "ISO",
+    0x9003: "DateTimeOriginal", 0x920A: "FocalLength",
+    0xA405: "FocalLengthIn35mmFilm", 0xA434: "LensModel",
+}
+
+
+def find_exif_segment(f, head=HEAD_BYTES):
+    """从已打开的二进制文件中取出 APP1 里的 TIFF 数据（bytes），找不到返回 None"""
+    buf = f.read(head)
+    if buf[:2] != b"\xff\xd8":
+        return None
+    base, pos = 0, 2      # base：buf[0] 对应的文件偏移；pos：当前标记的文件偏移
+    while True:
+        if pos + 10 > base + len(buf):   # 前面的段很大（如内嵌 ICC），跳到当前位置重新读
+            f.seek(pos)
+            base, buf = pos, f.read(head)
+            if len(buf) < 4:
+                return None
+        i = pos - base
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:               # 填充字节
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):       # EOI / SOS：Exif 只可能出现在图像数据之前
+            return None
+        seg_len = struct.unpack_from(">H", buf, i + 2)[0]
+        if marker == 0xE1 and buf[i + 4:i + 10] == b"Exif\x00\x00":
+            end = i + 2 + seg_len
+            if end > len(buf):           # 段比已读部分长：只补读缺的那一截
+                buf += f.read(end - len(buf))
+                if end > len(buf):       # 文件被截断：交给调用方回退，与 Pillow/exifread 的结果保持一致
+                    return None
+            return buf[i + 10:end]
+        pos += 2 + seg_len
+
+
+def _read_value(tiff, bo, typ, count, raw):
+    size = _TYPE_SIZE.get(typ)
+    if size is None or count == 0:
+        return None
+    total = size * count
+    if total <= 4:
+        data = raw[:total]
+    else:
+        off = struct.unpack(bo + "I", raw)[0]
+        if off + total > len(tiff):
+            return None
+        data = tiff[off:off + total]
+    if typ == 2:
+        return data.split(b"\x00", 1)[0].decode("utf-8", errors="replace").strip()
+    if typ == 3:
+        return struct.unpack_from(bo + "H", data)[0]
+    if typ in (4, 9):
+        return struct.unpack_from(bo + ("I" if typ == 4 else "i"), data)[0]
+    if typ in (5, 10):
+        return struct.unpack_from(bo + ("II" if typ == 5 else "ii"), data)
+    return data
+
+
+def _read_ifd(tiff, bo, offset, wanted):
+    out = {}
+    if offset + 2 > len(tiff):
+        return out
+    n = struct.unpack_from(bo + "H", tiff, offset)[0]
+    pos = offset + 2
+    for _ in range(n):
+        if pos + 12 > len(tiff):
+            break
+        tag, typ, count = struct.unpack_from(bo + "HHI", tiff, pos)
+        name = wanted.get(tag)
+        if name is not None:
+            out[name] = _read_value(tiff, bo, typ, count, tiff[pos + 8:pos + 12])
+        pos += 12
+    return out
+
+
+def parse_tiff(tiff):
+    """解析 TIFF 头 + IFD0 + Exif 子 IFD，返回 {标签名: 原始值}；格式不对返回 None"""
+    if len(tiff) < 8:
+        return None
+    if tiff[:2] == b"II":
+        bo = "<"
+    elif tiff[:2] == b"MM":
+        bo = ">"
+    else:
+        return None
+    magic, ifd0 = struct.unpack_from(bo + "HI", tiff, 2)
+    if magic != 42:
+        return None
+    tags = _read_ifd(tiff, bo, ifd0, _IFD0_TAGS)
+    exif_off = tags.pop("ExifIFD", None)
+    if isinstance(exif_off, int):
+        tags.update(_read_ifd(tiff, bo, exif_off, _EXIF_TAGS))
+    return tags
+
+
+def _ratio(v):
+    """(分子, 分母) -> float；分母为 0 时与 rational_to_float 一致取分子"""
+    if isinstance(v, tuple):
+        a, b = v
+        return float(a) / float(b) if b else float(a)
+    if isinstance(v, int):
+        return float(v)
+    return None
+
+
+def _ratio_str(v):
+    """与 exifread 的显示一致：约分后的 'a/b'，整数只显示分子"""
+    if isinstance(v, tuple):
+        a, b = v
+        if not b:
+            return str(a)
+        return str(Fraction(a, b))
+    return None if v is None else str(v)
+
+
+class HeadFile:
+    """文件头已预读到内存（见 prefetch.py）的只读文件：头部以内的读取直接取内存，
+    超出头部才真正打开文件（complete 为真时数据就是整个文件，不再打开）。只支持 find_exif_segment 用到的 read / seek"""
+
+    def __init__(self, path, data, complete=False):
+        self.path, self.data, self.complete = path, data, complete
+        self.pos = 0
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def seek(self, pos):
+        self.pos = pos
+
+    def read(self, n):
+        end = self.pos + n
+        if end <= len(self.data) or self.complete:
+            out = self.data[self.pos:end]
+        else:
+            if self._f is None:
+                self._f = open(self.path, "rb")
+            self._f.seek(self.pos)
+            out = self._f.read(n)
+        self.pos += len(out)
+        return out
+
+
+def parse_native(path, head=None):
+    """只读头部解析一张 JPG；非 JPEG / 无 Exif / 结构损坏时返回 None。
+    head 为预读好的 (头部数据, 是否为完整文件) 时不再打开文件（APP1 超出头部时除外）"""
+    try:
+        with (open(path, "rb") if head is None else HeadFile(path, *head)) as f:
+            tiff = find_exif_segment(f)
+        if tiff is None:
+            return None
+        tags = parse_tiff(tiff)
+    except (OSError, struct.error, IndexError, ValueError):
+        return None
+    if tags is None:
+        return None
+    f35 = tags.get("FocalLengthIn35mmFilm")
+    iso = tags.get("ISO")
+    return {
+        "file": str(path),
+        "model": tags.get("Model"),
+        "lens": tags.get("LensModel"),
+        "focal_mm": _ratio(tags.get("FocalLength")),
+        "focal_35mm": None if f35 is None else float(f35),
+        "fnumber": _ratio(tags.get("FNumber")),
+        "exposure": _ratio_str(tags.get("ExposureTime")),
+        "iso": None if iso is None else str(iso),
+        "datetime": tags.get("DateTimeOriginal") or tags.get("DateTime") or None,
+    }
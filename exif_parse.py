@@ -0,0 +1,151 @@
+import io, os
+from pathlib import Path
+
+from exif_native import HEAD_BYTES, parse_native
+
+# ---------------------------
+# 单个文件的纯 Python 解析：内置 APP1 解析器 + Pillow/exifread 兜底。
+# 解析子进程只导入本模块（及 exif_native）；Pillow / exifread 在第一次兜底时才导入
+# ---------------------------
+
+def rational_to_float(val):
+    """将 50/1、(50,1) 或 PIL.IFDRational 转 float"""
+    try:
+        if hasattr(val, "numerator") and hasattr(val, "denominator"):
+            return float(val.numerator) / float(val.denominator)
+        s = str(val)
+        if "/" in s:
+            a, b = s.split("/", 1)
+            return float(a) / float(b) if float(b) else float(a)
+        if isinstance(val, (tuple, list)) and len(val) == 2:
+            a, b = val
+            return float(a) / float(b) if b else float(a)
+        return float(s)
+    except Exception:
+        return None
+
+
+class PillowExifreadParser:
+    """Pillow + exifread 兜底解析器；可复用：导入与标签号解析只在构造时做一次。
+    每个文件只读一次：先读头部 head 字节，放进同一个缓冲区给 Pillow 和 exifread 共用。
+    Pillow 能从头部打开说明 SOS 之前的所有段（含 APP1）都已在缓冲区里；打不开时才补读整个文件"""
+
+    PIL_TAGS = ("Model", "LensModel", "FocalLength", "FNumber", "ExposureTime",
+                "ISOSpeedRatings", "DateTimeOriginal")
+
+    def __init__(self, head=HEAD_BYTES):
+        self.head = head
+        try:
+            from PIL import Image, ExifTags
+            self._Image = Image
+            names = {v: k for k, v in ExifTags.TAGS.items()}
+            self._tag = {n: names.get(n) for n in self.PIL_TAGS}
+        except ImportError:
+            self._Image = None
+        try:
+            import exifread
+            self._exifread = exifread
+        except ImportError:
+            self._exifread = None
+
+    def _read(self, path, full=False):
+        """返回 (数据, 是否为完整文件)"""
+        with open(path, "rb") as f:
+            if full:
+                return f.read(), True
+            data = f.read(self.head)
+            return data, len(data) < self.head or os.fstat(f.fileno()).st_size <= self.head
+
+    def _pillow(self, data, out):
+        Image, tag = self._Image, self._tag
+        with Image.open(io.BytesIO(data)) as im:
+            exif = im.getexif()
+            if exif:
+                out["model"] = exif.get(tag["Model"])
+                out["lens"] = exif.get(tag["LensModel"])
+                out["focal_mm"] = rational_to_float(exif.get(tag["FocalLength"]))
+                out["fnumber"] = rational_to_float(exif.get(tag["FNumber"]))
+                out["exposure"] = exif.get(tag["ExposureTime"])
+                out["iso"] = exif.get(tag["ISOSpeedRatings"])
+                out["datetime"] = exif.get(tag["DateTimeOriginal"])
+                # 35mm 等效
+                v35 = exif.get(41989)  # FocalLengthIn35mmFilm
+                out["focal_35mm"] = rational_to_float(v35)
+
+    def _exifread_tags(self, data):
+        return self._exifread.process_file(io.BytesIO(data), details=False, stop_tag="UNDEF", strict=True)
+
+    def parse(self, path, head=None):
+        """head 为预读好的 (头部数据, 是否为完整文件) 时不再读头部"""
+        out = {"file": str(path), "model": None, "lens": None, "focal_mm": None,
+               "focal_35mm": None, "fnumber": None, "exposure": None, "iso": None, "datetime": None}
+        try:
+            data, complete = self._read(path) if head is None else head
+        except OSError:
+            return out
+        if self._Image is not None:
+            try:
+                self._pillow(data, out)
+            except Exception:
+                if not complete:   # 头部不够 Pillow 打开：补读整个文件再试
+                    try:
+                        data, complete = self._read(path, full=True)
+                        self._pillow(data, out)
+                    except Exception:
+                        pass
+        elif not complete:
+            try:
+                data, complete = self._read(path, full=True)
+            except OSError:
+                return out
+
+        # 再试 exifread（对 JPG/TIFF 有时更稳）
+        if (out["focal_mm"] is None or out["model"] is None) and self._exifread is not None:
+            try:
+                tags = self._exifread_tags(data)
+            except Exception:
+                tags = None
+            if tags:
+                def g(*keys):
+                    for k in keys:
+                        if k in tags:
+                            return str(tags[k])
+                    return None
+                out["model"] = out["model"] or g("Image Model")
+                out["lens"] = out["lens"] or g("EXIF LensModel")
+                out["focal_mm"] = out["focal_mm"] or rational_to_float(g("EXIF FocalLength"))
+                out["fnumber"] = out["fnumber"] or rational_to_float(g("EXIF FNumber"))
+                out["exposure"] = out["exposure"] or g("EXIF ExposureTime")
+                out["iso"] = out["iso"] or g("EXIF ISOSpeedRatings","EXIF PhotographicSensitivity")
+                out["datetime"] = out["datetime"] or g("EXIF DateTimeOriginal","Image DateTime")
+                out["focal_35mm"] = out["focal_35mm"] or rational_to_float(g("EXIF FocalLengthIn35mmFilm"))
+        return out
+
+_fallback_parser = None   # 每个进程一个，首次使用时创建
+
+def parse_with_pillow_exifread(path: Path, head=None):
+    global _fallback_parser
+    if _fallback_parser is None:
+        _fallback_parser = PillowExifreadParser()
+    return _fallback_parser.parse(path, head)
+
+def parse_photo(path: Path, head=None):
+    """纯 Python 解析一张 JPG：先用只读 APP1 段的内置解析器，认不出的文件再交给 Pillow/exifread；
+    head 为预读好的 (头部数据, 是否为完整文件)（见 prefetch.py），两者共用，不再重复读"""
+    row = parse_native(path, head)
+    return row if row is not None else parse_with_pillow_exifread(path, head)
+
+def ignore_sigint():
+    """解析子进程的初始化：终端的 Ctrl+C 交给主进程处理（停在批边界并保存断点），子进程不跟着中断"""
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _parse_photo_flagged(path: Path, head=None):
+    """parse_photo + 是否用了 Pillow/exifread 兜底（埋点统计回退率用）"""
+    row = parse_native(path, head)
+    return (row, False) if row is not None else (parse_with_pillow_exifread(path, head), True)
+
+def parse_heads(items, flagged=False):
+    """进程池里解析一块预读好的文件：items 为 [(path, head)]，head 为 None（预读失败）时照常从路径读"""
+    fn = _parse_photo_flagged if flagged else parse_photo
+    return [fn(Path(p), head) for p, head in items]
@@ -0,0 +1,174 @@
+import json, os, queue, shlex, subprocess, threading
+
+# ---------------------------
+# 常驻 exiftool 进程池：exiftool -stay_open True -@ -
+# 每个进程一个线程，按批喂文件路径，逐批读回 JSON，批完成即产出；内存只与批大小有关
+# ---------------------------
+EXIFTOOL_ENV = "PHOTO_META_EXIFTOOL"   # 可指定 exiftool 命令（如测试用的替身脚本）
+BATCH_SIZE = 256
+
+# 每批共用的参数（经 -common_args 只传一次）
+COMMON_ARGS = [
+    "-json", "-n", "-fast2", "-q", "-q", "-charset", "filename=utf8",
+    "-FileName", "-Directory", "-Model", "-LensModel",
+    "-FocalLength", "-FocalLengthIn35mmFormat", "-FNumber",
+    "-ExposureTime", "-ISO", "-DateTimeOriginal",
+]
+
+
+def exiftool_cmd():
+    """exiftool 命令前缀（列表）；默认 ["exiftool"]，可用环境变量覆盖"""
+    env = os.environ.get(EXIFTOOL_ENV)
+    if env:
+        return shlex.split(env, posix=(os.name != "nt"))
+    return ["exiftool"]
+
+
+class ExiftoolError(RuntimeError):
+    pass
+
+
+class _Worker:
+    """一个常驻 exiftool 进程"""
+
+    def __init__(self, cmd):
+        self.proc = subprocess.Popen(
+            list(cmd) + ["-stay_open", "True", "-@", "-", "-common_args"] + COMMON_ARGS,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            # 单独的进程组：终端的 Ctrl+C 只发给主进程，由它停在批边界后正常关闭 exiftool
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0) | getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0),
+            start_new_session=(os.name != "nt"),
+        )
+        self.seq = 0
+
+    def run(self, paths):
+        """处理一批文件，返回 exiftool 的 JSON 条目列表"""
+        self.seq += 1
+        ready = b"{ready%d}" % self.seq
+        args = list(paths) + [f"-execute{self.seq}"]
+        try:
+            self.proc.stdin.write(("\n".join(args) + "\n").encode("utf-8"))
+            self.proc.stdin.flush()
+        except OSError as e:
+            raise ExiftoolError(f"exiftool 进程已退出：{e}")
+        chunks = []
+        for line in self.proc.stdout:
+            if line.rstrip() == ready:
+                break
+            chunks.append(line)
+        else:
+            raise ExiftoolError("exiftool 进程意外退出")
+        text = b"".join(chunks).decode("utf-8", errors="ignore").strip()
+        return json.loads(text) if text else []
+
+    def close(self):
+        try:
+            self.proc.stdin.write(b"-stay_open\nFalse\n")
+            self.proc.stdin.flush()
+            self.proc.stdin.close()
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+
+
+class ExiftoolPool:
+    """用法：
+        with ExiftoolPool(procs=4) as pool:
+            for batch in pool.imap(paths):   # batch: [(path, exiftool 条目或 None), ...]
+                ...
+    """
+
+    def __init__(self, procs=1, cmd=None, batch_size=BATCH_SIZE):
+        self.cmd = list(cmd or exiftool_cmd())
+        self.procs = max(1, int(procs or 1))
+        self.batch_size = max(1, int(batch_size))
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for w in self._workers:
+            w.close()
+        self._workers = []
+
+    def _batches(self, paths):
+        batch = []
+        for p in paths:
+            batch.append(p)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def imap(self, paths):
+        """按批产出 [(path, 条目或 None)]；批完成即产出，批之间不保证顺序"""
+        batches = self._batches(paths)
+        lock = threading.Lock()
+        stop = threading.Event()
+        results = queue.Queue(maxsize=self.procs * 2)   # 有界：消费慢时工作线程自然停下
+        done = object()
+
+        while len(self._workers) < self.procs:
+            self._workers.append(_Worker(self.cmd))
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.2)
+                    return
+                except queue.Full:
+                    pass
+
+        def loop(worker):
+            try:
+                while not stop.is_set():
+                    with lock:
+                        batch = next(batches, None)
+                    if batch is None:
+                        break
+                    try:
+                        items = worker.run(batch)
+                    except Exception as e:
+                        put((batch, e))
+                        break
+                    put((batch, items))
+            finally:
+                put(done)
+
+        threads = [threading.Thread(target=loop, args=(w,), daemon=True) for w in self._workers]
+        for t in threads:
+            t.start()
+        failed = False
+        try:
+            remaining = len(threads)
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                batch, items = item
+                if isinstance(items, Exception):
+                    failed = True
+                    raise items
+                yield _match_batch(batch, items)
+        finally:
+            stop.set()
+            for t in threads:
+                t.join()
+            if failed:   # 出错的进程状态不可信，整池关掉，下次重建
+                self.close()
+
+
+def _match_batch(batch, items):
+    """按路径把 exiftool 条目对回输入顺序；exiftool 读不出的文件对应 None"""
+    found = {}
+    for it in items:
+        src = it.get("SourceFile")
+        if src:
+            found[os.path.normcase(os.path.normpath(src))] = it
+    return [(p, found.get(os.path.normcase(os.path.normpath(p)))) for p in batch]
@@ -0,0 +1,182 @@
+import csv, importlib.util, os, time
+from pathlib import Path
+
+# ---------------------------
+# 流式导出：边解析边写出，定期刷盘，内存只与刷盘间隔有关
+# 按扩展名选格式：.csv 文本（中途崩溃时已刷盘的行仍可用）；
+# .parquet / .pq 与 .arrow / .feather / .ipc 为列式（需要 pyarrow），元数据在文件尾，正常结束后才可读
+# ---------------------------
+FIELDS = ["file", "model", "lens", "focal_mm", "focal_35mm", "fnumber", "exposure", "iso", "datetime"]
+FLUSH_ROWS = 10000     # 累计这么多行 ...
+FLUSH_SECONDS = 5.0    # ... 或距上次刷盘这么久，就写出一批
+
+PARQUET_EXTS = {".parquet", ".pq"}
+ARROW_EXTS = {".arrow", ".feather", ".ipc"}
+
+
+class ExportError(RuntimeError):
+    pass
+
+
+class _Writer:
+    """公共部分：缓冲行、按行数/时间触发 _flush()；用法同文件对象（with 语句）"""
+
+    def __init__(self, path, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.path = Path(path)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.count = 0
+        self._buf = []
+        self._last = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write_rows(self, rows):
+        self._buf.extend(rows)
+        if len(self._buf) >= self.flush_rows or time.monotonic() - self._last >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._buf:
+            self._flush(self._buf)
+            self.count += len(self._buf)
+            self._buf = []
+        self._last = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._close()
+
+
+class CsvWriter(_Writer):
+    def __init__(self, path, **kw):
+        super().__init__(path, **kw)
+        self._f = self.path.open("w", newline="", encoding="utf-8")
+        self._w = csv.DictWriter(self._f, fieldnames=FIELDS, extrasaction="ignore")
+        self._w.writeheader()
+
+    def _flush(self, rows):
+        self._w.writerows(rows)
+        self._f.flush()
+
+    def _close(self):
+        self._f.close()
+
+
+def _exposure_seconds(v):
+    """'1/250' / '0.004' / 数值 -> 秒（float），解析不了为 None"""
+    if v is None:
+        return None
+    try:
+        a, _, b = str(v).partition("/")
+        return float(a) / float(b) if b else float(a)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def _int_or_none(v):
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+
+def _float_or_none(v):
+    try:
+        return None if v is None else float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+class _ArrowWriter(_Writer):
+    """每次刷盘写出一个 RecordBatch（Parquet 为一个 row group）。
+    数值列用真正的数值类型：焦距/光圈为 float64，ISO 为 int32，快门另给 exposure_s（秒，float64）"""
+
+    def __init__(self, path, **kw):
+        super().__init__(path, **kw)
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ExportError(f"导出 {self.path.suffix} 需要 pyarrow：pip install pyarrow")
+        self._pa = pa
+        self.schema = pa.schema([
+            ("file", pa.string()),
+            ("model", pa.string()),
+            ("lens", pa.string()),
+            ("focal_mm", pa.float64()),
+            ("focal_35mm", pa.float64()),
+            ("fnumber", pa.float64()),
+            ("exposure", pa.string()),
+            ("exposure_s", pa.float64()),
+            ("iso", pa.int32()),
+            ("datetime", pa.string()),
+        ])
+        self._open()
+
+    def _batch(self, rows):
+        pa = self._pa
+        def col(key, conv=None):
+            return [r.get(key) if conv is None else conv(r.get(key)) for r in rows]
+        def text(v):
+            return None if v is None else str(v)
+        arrays = [
+            pa.array(col("file", text), pa.string()),
+            pa.array(col("model", text), pa.string()),
+            pa.array(col("lens", text), pa.string()),
+            pa.array(col("focal_mm", _float_or_none), pa.float64()),
+            pa.array(col("focal_35mm", _float_or_none), pa.float64()),
+            pa.array(col("fnumber", _float_or_none), pa.float64()),
+            pa.array(col("exposure", text), pa.string()),
+            pa.array(col("exposure", _exposure_seconds), pa.float64()),
+            pa.array(col("iso", _int_or_none), pa.int32()),
+            pa.array(col("datetime", text), pa.string()),
+        ]
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+class ParquetWriter(_ArrowWriter):
+    def _open(self):
+        import pyarrow.parquet as pq
+        self._w = pq.ParquetWriter(str(self.path), self.schema)
+
+    def _flush(self, rows):
+        self._w.write_batch(self._batch(rows))
+
+    def _close(self):
+        self._w.close()
+
+
+class ArrowWriter(_ArrowWriter):
+    def _open(self):
+        import pyarrow.ipc as ipc
+        self._sink = self._pa.OSFile(str(self.path), "wb")
+        self._w = ipc.new_file(self._sink, self.schema)
+
+    def _flush(self, rows):
+        self._w.write_batch(self._batch(rows))
+        self._sink.flush()
+
+    def _close(self):
+        self._w.close()
+        self._sink.close()
+
+
+def check_format(path):
+    """提前检查导出格式可用（列式格式需要 pyarrow），免得解析完才报错"""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in PARQUET_EXTS | ARROW_EXTS and importlib.util.find_spec("pyarrow") is None:
+        raise ExportError(f"导出 {ext} 需要 pyarrow：pip install pyarrow")
+
+
+def open_writer(path, **kw):
+    """按扩展名选择导出格式"""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in PARQUET_EXTS:
+        return ParquetWriter(path, **kw)
+    if ext in ARROW_EXTS:
+        return ArrowWriter(path, **kw)
+    return CsvWriter(path, **kw)
@@ -1,62 +1,23 @@
-import argparse, csv, json, math, shutil, subprocess, sys
+import argparse, bisect, contextlib, json, os, shutil, sys, threading, time
 from pathlib import Path
-from collections import Counter, defaultdict
-
-# ---------------------------
-# 裁切系数（机身型号关键字 -> 系数），可自行扩充
-# ---------------------------
-CROP_MAP = {
-    # Sony Full Frame
-    "ILCE-7": 1.0, "ILCE-7C": 1.0, "ILCE-7CM2": 1.0, "ILCE-7M4": 1.0, "ILCE-9": 1.0, "ILCE-1": 1.0,
-    # Sony APS-C
-    "ILCE-6000": 1.5, "ILCE-6100": 1.5, "ILCE-6300": 1.5, "ILCE-6400": 1.5, "ILCE-6500": 1.5, "ZV-E10": 1.5,
-    # FUJIFILM APS-C
-    "X-T50": 1.5, "X-T30": 1.5, "X-S10": 1.5, "X-H2": 1.5, "X-T5": 1.5, "X-E4": 1.5,
-    # Canon RF APS-C
-    "EOS R50": 1.6, "EOS R10": 1.6, "EOS R7": 1.6,
-    # Micro Four Thirds
-    "OM-": 2.0, "E-M1": 2.0, "E-M5": 2.0, "DC-G9": 2.0, "DMC-GX": 2.0, "DC-GH": 2.0,
-    # L-Mount Full Frame (示例)
-    "DC-S5": 1.0,
-}
+from functools import partial
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from exif_parse import (  # noqa: F401  (解析函数原先定义在这里，保留导出)
+    PillowExifreadParser, _parse_photo_flagged, ignore_sigint, parse_heads, parse_photo, parse_with_pillow_exifread,
+    rational_to_float,
+)
+from exiftool_pool import BATCH_SIZE, ExiftoolError, ExiftoolPool, exiftool_cmd
+from walker import DEFAULT_EXCLUDES, walk_files
+import profiling
+from resolver import CROP_MAP, crop_resolver  # noqa: F401  (CROP_MAP 保留在此处导出)
 
 SUPPORTED_EXTS = {".jpg", ".jpeg"}  # 只统计 JPG/JPEG
 
 def has_exiftool():
-    return shutil.which("exiftool") is not None
-
-def rational_to_float(val):
-    """将 50/1、(50,1) 或 PIL.IFDRational 转 float"""
-    try:
-        if hasattr(val, "numerator") and hasattr(val, "denominator"):
-            return float(val.numerator) / float(val.denominator)
-        s = str(val)
-        if "/" in s:
-            a, b = s.split("/", 1)
-            return float(a) / float(b) if float(b) else float(a)
-        if isinstance(val, (tuple, list)) and len(val) == 2:
-            a, b = val
-            return float(a) / float(b) if b else float(a)
-        return float(s)
-    except Exception:
-        return None
-
-def run_exiftool(folder: Path):
-    """用 exiftool 递归仅扫 jpg/jpeg，并以 JSON 返回"""
-    cmd = [
-        "exiftool", "-json", "-n", "-fast2", "-q", "-q", "-r",
-        "-ext", "jpg", "-ext", "jpeg",
-        "-FileName", "-Directory", "-Model", "-LensModel",
-        "-FocalLength", "-FocalLengthIn35mmFormat", "-FNumber",
-        "-ExposureTime", "-ISO", "-DateTimeOriginal"
-    ]
-    cmd.append(str(folder))
-    try:
-        out = subprocess.check_output(cmd, stderr=subprocess.STDOUT)
-        return json.loads(out.decode("utf-8", errors="ignore"))
-    except Exception as e:
-        print(f"[exiftool] 调用失败：{e}. 将退回纯 Python 解析。", file=sys.stderr)
-        return None
+    return shutil.which(exiftool_cmd()[0]) is not None
 
 def parse_exiftool_item(it):
     p = Path(it.get("SourceFile") or Path(it.get("Directory",""))/it.get("FileName",""))
@@ -72,136 +33,467 @@ def parse_exiftool_item(it):
         "datetime": it.get("DateTimeOriginal"),
     }
 
-def parse_with_pillow_exifread(path: Path):
-    out = {"file": str(path), "model": None, "lens": None, "focal_mm": None,
-           "focal_35mm": None, "fnumber": None, "exposure": None, "iso": None, "datetime": None}
-    try:
-        from PIL import Image, ExifTags
-        tag_id = {v: k for k, v in ExifTags.TAGS.items()}
-        with Image.open(path) as im:
-            exif = im.getexif()
-            if exif:
-                out["model"] = exif.get(tag_id.get("Model"))
-                out["lens"] = exif.get(tag_id.get("LensModel"))
-                out["focal_mm"] = rational_to_float(exif.get(tag_id.get("FocalLength")))
-                out["fnumber"] = rational_to_float(exif.get(tag_id.get("FNumber")))
-                out["exposure"] = exif.get(tag_id.get("ExposureTime"))
-                out["iso"] = exif.get(tag_id.get("ISOSpeedRatings"))
-                out["datetime"] = exif.get(tag_id.get("DateTimeOriginal"))
-                # 35mm 等效
-                v35 = exif.get(41989)  # FocalLengthIn35mmFilm
-                out["focal_35mm"] = rational_to_float(v35)
-    except Exception:
-        pass
-
-    # 再试 exifread（对 JPG/TIFF 有时更稳）
-    if out["focal_mm"] is None or out["model"] is None:
-        try:
-            import exifread
-            with open(path, "rb") as f:
-                tags = exifread.process_file(f, details=False, stop_tag="UNDEF", strict=True)
-                def g(*keys):
-                    for k in keys:
-                        if k in tags:
-                            return str(tags[k])
-                    return None
-                out["model"] = out["model"] or g("Image Model")
-                out["lens"] = out["lens"] or g("EXIF LensModel")
-                out["focal_mm"] = out["focal_mm"] or rational_to_float(g("EXIF FocalLength"))
-                out["fnumber"] = out["fnumber"] or rational_to_float(g("EXIF FNumber"))
-                out["exposure"] = out["exposure"] or g("EXIF ExposureTime")
-                out["iso"] = out["iso"] or g("EXIF ISOSpeedRatings","EXIF PhotographicSensitivity")
-                out["datetime"] = out["datetime"] or g("EXIF DateTimeOriginal","Image DateTime")
-                out["focal_35mm"] = out["focal_35mm"] or rational_to_float(g("EXIF FocalLengthIn35mmFilm"))
-        except Exception:
-            pass
-    return out
-
-def estimate_35mm(focal_mm, model, focal_35mm_existing):
-    """若 EXIF 无等效焦距，按机身关键字猜裁切系数"""
+def estimate_35mm(focal_mm, model, focal_35mm_existing, resolver=None):
+    """若 EXIF 无等效焦距，按机身关键字猜裁切系数；resolver 带覆盖表时，被覆盖的机身一律按 物理焦距 × 系数"""
+    resolver = resolver or crop_resolver()
+    if focal_mm and model and model in resolver.overrides:
+        return round(float(focal_mm) * float(resolver.overrides[model]), 1), True
     if focal_35mm_existing:
         return focal_35mm_existing, False
     if not focal_mm or not model:
         return None, False
-    m = str(model)
-    # 尝试匹配关键字（包含关系即可）
-    for key, cf in CROP_MAP.items():
-        if key in m:
-            return round(float(focal_mm) * cf, 1), True
-    return None, False
+    cf = resolver.factor(model)
+    if cf is None:
+        return None, False
+    return round(float(focal_mm) * cf, 1), True
 
 def bin_value(v, width):
     return int(round(float(v) / width) * width)
 
-def gather_rows(folder: Path, use_exiftool=True):
+def iter_photo_files(folder: Path, excludes=DEFAULT_EXCLUDES, skip=()):
+    """递归列出 JPG：(路径, 大小, mtime_ns)；excludes 为要跳过的目录/文件名通配，skip 为整棵跳过的目录"""
+    return walk_files(folder, SUPPORTED_EXTS, excludes=excludes, skip=skip)
+
+PARALLEL_MIN_FILES = 64  # 文件太少时进程启动开销大于收益，直接串行
+WALK_CHUNK = 4096        # 边遍历边解析：每发现这么多文件就送去解析一轮
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+def skip_main_in_workers():
+    """spawn 出的子进程默认会以 __mp_main__ 的名字重新执行主脚本（界面脚本会连带导入 Qt）。
+    子进程要用的函数都在可按名导入的模块里（exif_parse、report），主脚本启动时调用一次，
+    子进程就只导入这些模块"""
+    import importlib.machinery
+    main = sys.modules.get("__main__")
+    if main is not None and getattr(main, "__spec__", None) is None:
+        main.__spec__ = importlib.machinery.ModuleSpec("__main__", None)
+
+def _chunks(it, size):
+    batch = []
+    for x in it:
+        batch.append(x)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _imap_chunks(executor, fn, items, chunksize, window):
+    """executor.map(fn, …, chunksize) 的有界版：fn 处理一整块，最多 window 块在途，
+    输入按需取用（不会像 map 那样先全部取完），产出顺序与输入一致"""
+    pending = deque()
+    try:
+        for chunk in _chunks(items, chunksize):
+            pending.append(executor.submit(fn, chunk))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+
+class Extractor:
+    """解析后端：有 exiftool 时用 jobs 个常驻 exiftool 进程，否则纯 Python（jobs>1 时用进程池）；
+    进程在多次 extract() 之间复用，用完 close()。
+    prefetch > 0 时纯 Python 解析前先用这么多个线程并发预读文件头（见 prefetch.py，网络盘用）"""
+
+    def __init__(self, use_exiftool=True, jobs=1, batch_size=BATCH_SIZE, prefetch=0):
+        self.use_exiftool = bool(use_exiftool) and has_exiftool()
+        self.jobs = max(1, int(jobs or 1))
+        self.batch_size = max(1, int(batch_size))
+        self.prefetch = max(0, int(prefetch or 0))
+        self._pool = None
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def parse_files(self, paths):
+        """纯 Python 逐个产出解析结果；jobs>1 时用进程池分块并行，顺序与输入一致（与串行完全相同）"""
+        paths = [Path(p) for p in paths]
+        flagged = profiling.enabled()
+        fn = _parse_photo_flagged if flagged else parse_photo
+        serial = self.jobs == 1 or len(paths) < PARALLEL_MIN_FILES
+        if not serial and self._executor is None:
+            # spawn：GUI 进程里有线程，fork 不安全；各平台行为也一致
+            ctx = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs, mp_context=ctx, initializer=ignore_sigint)
+        # 每个进程约 8 块：块足够大以摊薄进程间通信，又足够多以均衡负载
+        chunksize = max(1, min(256, len(paths) // (self.jobs * 8)))
+        if self.prefetch:
+            from prefetch import prefetch_heads
+            heads = prefetch_heads(paths, self.prefetch)
+            if serial:
+                results = (fn(p, head) for p, head in heads)
+            else:   # 头部随块发给子进程；在途的块有上限，预读的内存也就有上限
+                results = _imap_chunks(self._executor, partial(parse_heads, flagged=flagged), heads,
+                                       chunksize, self.jobs * 2)
+        elif serial:
+            results = map(fn, paths)
+        else:
+            results = self._executor.map(fn, paths, chunksize=chunksize)
+        if not flagged:
+            yield from results
+            return
+        for row, fallback in results:
+            if fallback:
+                profiling.count("files.fallback")
+            yield row
+
+    def extract(self, paths):
+        """逐批解析给定文件，产出 [(path, row), ...]；exiftool 读不出的文件 row 为 None。
+        exiftool 批完成即产出（批间无序）；exiftool 出错时剩余文件退回纯 Python，之后不再尝试"""
+        paths = list(paths)
+        if not paths:
+            return
+        if self.use_exiftool:
+            done = set()
+            try:
+                if self._pool is None:
+                    self._pool = ExiftoolPool(procs=self.jobs, batch_size=self.batch_size)
+                for batch in profiling.timed("extract.exiftool", self._pool.imap(paths)):
+                    out = []
+                    for p, it in batch:
+                        row = None
+                        if it is not None:
+                            row = parse_exiftool_item(it)
+                            row["file"] = p
+                        out.append((p, row))
+                    done.update(p for p, _ in out)
+                    yield out
+                return
+            except (OSError, ValueError, ExiftoolError) as e:
+                profiling.count("errors.exiftool")
+                print(f"[exiftool] 调用失败：{e}. 将退回纯 Python 解析。", file=sys.stderr)
+                self.use_exiftool = False
+                paths = [p for p in paths if p not in done]
+        yield from profiling.timed("extract.native", _chunks(zip(paths, self.parse_files(paths)), self.batch_size))
+
+def iter_parse_files(paths, jobs=1):
+    with Extractor(use_exiftool=False, jobs=jobs) as ex:
+        yield from ex.parse_files(paths)
+
+def parse_files(paths, jobs=1):
+    return list(iter_parse_files(paths, jobs=jobs))
+
+def iter_extract(paths, use_exiftool=True, jobs=1, batch_size=BATCH_SIZE):
+    with Extractor(use_exiftool=use_exiftool, jobs=jobs, batch_size=batch_size) as ex:
+        yield from ex.extract(paths)
+
+def extract_rows(paths, use_exiftool=True, jobs=1):
+    """只解析给定文件，返回 {path: row}；exiftool 读不出的文件对应 None"""
+    out = {}
+    for batch in iter_extract(paths, use_exiftool=use_exiftool, jobs=jobs):
+        out.update(batch)
+    return out
+
+def iter_gather(folder: Path, use_exiftool=True, cache=None, jobs=1, batch_size=BATCH_SIZE,
+                excludes=DEFAULT_EXCLUDES, checkpoint=None, stop=None, prefetch=0):
+    """流式读取：边遍历边解析，逐批产出 (rows, done, total)——本批的行、已处理文件数、目前已发现的文件数。
+    cache 为 ExifCache 时命中的文件直接取缓存，只解析新增/变化的文件，结束时清理已删除文件的缓存；
+    jobs 为并行度（exiftool 常驻进程数 / 纯 Python 解析进程数）；excludes 见 walker.walk_files。
+    checkpoint 为 checkpoint.ScanCheckpoint 时上次留下的行同缓存一样复用，上次已处理完的目录不再列举
+    （其中的行直接取自缓存 / 断点，不核对大小与修改时间），进度定时落盘，完整读完后删除；
+    stop 为 threading.Event，置位后在当前批结束时停下（不清理缓存，断点保留），调用方据此判断是否读完；
+    prefetch 见 Extractor"""
+    with profiling.span("cache.load"):
+        known = cache.load(folder) if cache is not None else {}
+    if checkpoint is not None:
+        for p, entry in checkpoint.entries.items():
+            known.setdefault(p, entry)
+        checkpoint.entries = {}
+    try:
+        yield from _gather(folder, known, use_exiftool, cache, jobs, batch_size, excludes, checkpoint, stop, prefetch)
+        if stop is not None and stop.is_set():
+            return
+        # 剩下的缓存条目对应的文件已被删除；根目录本身不可访问（如网络盘掉线）时不算
+        if cache is not None and known and os.path.isdir(folder):
+            with profiling.span("cache.prune"):
+                cache.prune(known)
+        if checkpoint is not None:
+            checkpoint.finish()
+    finally:   # 中途停下 / 出错 / 消费方提前关闭：写出已有进度（读完时已删除，这里什么也不做）
+        if checkpoint is not None:
+            checkpoint.close()
+
+def _finished_files(known, dirs, root):
+    """known 中位于已处理完的目录（dirs，整棵子树）下的路径"""
+    memo = {}
+
+    def finished(d):
+        hit = memo.get(d)
+        if hit is None:
+            parent = os.path.dirname(d)
+            hit = memo[d] = d in dirs or (d != root and parent != d and finished(parent))
+        return hit
+
+    return [p for p in known if finished(os.path.dirname(p))]
+
+def _closed_dirs(prev, cur, root):
+    """先序遍历从目录 prev 走到 cur：prev 及其祖先中不是 cur 祖先的目录，整棵子树都已走完"""
+    out = []
+    while prev != root and cur != prev and not cur.startswith(prev + os.sep):
+        out.append(prev)
+        parent = os.path.dirname(prev)
+        if parent == prev:
+            break
+        prev = parent
+    return out
+
+class _KnownDirs:
+    """known 的路径按所在目录分组，便于取出某棵子树下的全部条目"""
+
+    def __init__(self, known):
+        self.groups = {}
+        for p in known:
+            self.groups.setdefault(os.path.dirname(p), []).append(p)
+        self.keys = sorted(self.groups)
+
+    def unseen(self, dirs, known):
+        """dirs（整棵子树）下仍留在 known 里的路径，即本次遍历没有见到的（已删除的）文件"""
+        out = []
+        for d in dirs:
+            keys = [d] if d in self.groups else []
+            sub = d + os.sep
+            i = bisect.bisect_left(self.keys, sub)
+            while i < len(self.keys) and self.keys[i].startswith(sub):
+                keys.append(self.keys[i])
+                i += 1
+            for k in keys:
+                out.extend(p for p in self.groups.pop(k, ()) if p in known)
+        return out
+
+def _gather(folder, known, use_exiftool, cache, jobs, batch_size, excludes, checkpoint, stop, prefetch):
+    done = total = 0
+    root = os.fspath(folder).rstrip("/\\")
+    skip = ()
+    # 上次已处理完的目录：行取自缓存 / 断点（用缓存时断点不记行，没有缓存就只能重新列举）
+    if checkpoint is not None and checkpoint.dirs and (checkpoint.rows or cache is not None):
+        skip = checkpoint.dirs
+        with profiling.span("checkpoint.resume"):
+            paths = _finished_files(known, skip, root)
+        for part in _chunks(paths, WALK_CHUNK):
+            entries = [known.pop(p) for p in part]
+            done += len(part)
+            total += len(part)
+            profiling.count("files.resumed", len(part))
+            yield [json.loads(e[2]) for e in entries if e[2] is not None], done, total
+        if stop is not None and stop.is_set():
+            return
+    last = None   # 已处理完的最后一个文件所在目录
+    # 目录处理完时，其中没见到的缓存 / 断点条目（文件已删除）马上清掉，否则续读时会被当作已处理的行复用
+    known_dirs = _KnownDirs(known) if checkpoint is not None and known else None
+    with Extractor(use_exiftool=use_exiftool, jobs=jobs, batch_size=batch_size, prefetch=prefetch) as ex:
+        for chunk in profiling.timed("walk", _chunks(iter_photo_files(folder, excludes, skip), WALK_CHUNK)):
+            total += len(chunk)
+            rows, stale = [], {}
+            with profiling.span("cache.lookup", files=len(chunk)):
+                for p, size, mtime in chunk:
+                    hit = known.pop(p, None)
+                    if hit is not None and hit[0] == size and hit[1] == mtime:
+                        row = None if hit[2] is None else json.loads(hit[2])   # 缓存 / 断点里的行 JSON
+                        if row is not None:
+                            rows.append(row)
+                    else:
+                        stale[p] = (size, mtime)
+            done += len(chunk) - len(stale)
+            profiling.count("files.found", len(chunk))
+            profiling.count("files.cached", len(chunk) - len(stale))
+            if rows or not stale:
+                yield rows, done, total
+            if stop is not None and stop.is_set():
+                return
+            for batch in ex.extract(stale):
+                if cache is not None:   # 逐批写入缓存：中途中断时已解析的部分不会丢
+                    with profiling.span("cache.store", files=len(batch)):
+                        cache.store((p, *stale[p], row) for p, row in batch)
+                if checkpoint is not None:
+                    checkpoint.record((p, *stale[p], row) for p, row in batch)
+                done += len(batch)
+                rows = [row for _, row in batch if row is not None]
+                profiling.count("files.parsed", len(batch))
+                profiling.count("files.no_exif", len(batch) - len(rows))
+                yield rows, done, total
+                if stop is not None and stop.is_set():
+                    return
+            if checkpoint is not None:   # 本块处理完：遍历已离开的目录整棵记为完成
+                dirs = []
+                for p, _, _ in chunk:
+                    d = os.path.dirname(p)
+                    if d != last:
+                        if last is not None:
+                            dirs.extend(_closed_dirs(last, d, root))
+                        last = d
+                gone = known_dirs.unseen(dirs, known) if known_dirs is not None else []
+                if gone:
+                    for p in gone:
+                        del known[p]
+                    if cache is not None:
+                        with profiling.span("cache.prune"):
+                            cache.prune(gone)
+                checkpoint.record(dirs=dirs, gone=gone)
+
+def iter_watch(watcher, use_exiftool=True, cache=None, jobs=1, stop=None, batch_size=BATCH_SIZE, prefetch=0):
+    """监视模式：watcher（watcher.FolderWatcher）每给出一批变化，只解析新增/修改的文件，
+    产出 (rows, gone)——新解析出的行，以及旧行应当作废的全部路径（修改过的 + 已删除的）。
+    cache 同步更新；stop 为 threading.Event，置位后在半秒内结束；prefetch 见 Extractor"""
+    with Extractor(use_exiftool=use_exiftool, jobs=jobs, batch_size=batch_size, prefetch=prefetch) as ex:
+        while stop is None or not stop.is_set():
+            ch = watcher.wait(timeout=0.5)
+            if ch is None:
+                continue
+            profiling.count("watch.changed", len(ch.changed))
+            profiling.count("watch.removed", len(ch.removed))
+            rows = []
+            for batch in ex.extract(ch.changed):
+                if cache is not None:
+                    with profiling.span("cache.store", files=len(batch)):
+                        cache.store((p, *ch.changed[p], row) for p, row in batch)
+                rows.extend(row for _, row in batch if row is not None)
+            if cache is not None and ch.removed:
+                with profiling.span("cache.prune"):
+                    cache.prune(ch.removed)
+            yield rows, set(ch.changed) | set(ch.removed)
+
+def gather_rows(folder: Path, use_exiftool=True, cache=None, jobs=1, excludes=DEFAULT_EXCLUDES):
+    """一次性读取全部行（iter_gather 的收集版）"""
     rows = []
-    if use_exiftool and has_exiftool():
-        data = run_exiftool(folder)
-        if data:
-            for it in data:
-                p = Path(it.get("SourceFile",""))
-                if p.suffix.lower() not in SUPPORTED_EXTS:
-                    continue
-                rows.append(parse_exiftool_item(it))
-            return rows
-    # 纯 Python 解析
-    for p in folder.rglob("*"):
-        if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS:
-            rows.append(parse_with_pillow_exifread(p))
+    for batch, _, _ in iter_gather(folder, use_exiftool=use_exiftool, cache=cache, jobs=jobs,
+                                   excludes=excludes):
+        rows.extend(batch)
     return rows
 
 def save_csv(rows, out_csv: Path):
-    fields = ["file","model","lens","focal_mm","focal_35mm","fnumber","exposure","iso","datetime"]
-    with out_csv.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fields)
-        w.writeheader()
+    from export import CsvWriter
+    with CsvWriter(out_csv) as w:
+        w.write_rows(rows)
+
+def fill_35mm(rows, resolver=None):
+    """就地计算/补全 focal_35mm（每个机身型号只解析一次）"""
+    resolver = resolver or crop_resolver()
+    with profiling.span("estimate_35mm", rows=len(rows)):
         for r in rows:
-            w.writerow(r)
+            f35, used_guess = estimate_35mm(r.get("focal_mm"), r.get("model"), r.get("focal_35mm"), resolver)
+            r["focal_35mm"] = f35
+
+def filter_by_time(rows, since=None, until=None):
+    """只保留拍摄时间在 [since, until)（时间戳）内的行，没有拍摄时间的行不保留；两端都不限时原样返回"""
+    if since is None and until is None:
+        return rows
+    from dataset import parse_exif_datetime
+    out = []
+    for r in rows:
+        t = parse_exif_datetime(r.get("datetime"))
+        if t is not None and (since is None or t >= since) and (until is None or t < until):
+            out.append(r)
+    return out
+
+def export_rows(batches, out_path: Path, resolver=None, on_rows=None):
+    """流式导出：逐批补全 focal_35mm 后写出（格式按扩展名，见 export.open_writer），
+    每批再交给 on_rows（如并入数据集）；返回写出的行数。一行都没有时不创建文件"""
+    from export import open_writer
+    resolver = resolver or crop_resolver()
+    writer = None
+    try:
+        for rows in batches:
+            if not rows:
+                continue
+            fill_35mm(rows, resolver)
+            with profiling.span("export.write", rows=len(rows)):
+                if writer is None:
+                    writer = open_writer(out_path)
+                writer.write_rows(rows)
+            if on_rows is not None:
+                on_rows(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer.count if writer is not None else 0
+
+def _as_dataset(rows):
+    from dataset import PhotoDataset
+    return rows if isinstance(rows, PhotoDataset) else PhotoDataset.from_rows(rows)
+
+def _focal_values(ds, use_equiv):
+    """(焦距列, 有效掩码)；与原逻辑一致，0 与缺失都不计"""
+    import numpy as np
+    v = ds.focal_35mm if use_equiv else ds.focal_mm
+    return v, np.isfinite(v) & (v != 0)
+
+def _top_bins(keys, k):
+    """同 Counter(keys).most_common(k)：按张数降序，同数按首次出现先后"""
+    import numpy as np
+    uniq, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.lexsort((first, -counts))[:k]
+    return list(zip(uniq[order].tolist(), counts[order].tolist()))
+
+def _quantile_text(qv):
+    return " / ".join(f"{label} {v:.0f}mm" for label, v in zip(("p10", "中位", "p90"), qv))
+
+def _print_group_top(names, codes, keys, quantiles=None):
+    """按机身/镜头编码分组打印 Top5（quantiles[编码] 给出时附上该组的 p10 / 中位 / p90）；组按首次出现先后排列"""
+    import numpy as np
+    order = np.argsort(codes, kind="stable")
+    codes, keys = codes[order], keys[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    groups = []
+    for s, e in zip(starts, np.r_[starts[1:], len(codes)]):
+        c = int(codes[s])
+        if c >= 0:
+            groups.append((order[s], c, keys[s:e]))
+    for _, code, kk in sorted(groups, key=lambda g: g[0]):
+        line = ", ".join([f"{k}mm×{c}" for k, c in _top_bins(kk, 5)])
+        if quantiles is not None:
+            line += f"（{_quantile_text(quantiles[code])}）"
+        print(f"- {names[code]}: {line}")
 
 def print_summary(rows, use_equiv=True, bin_width=5, topk=15):
-    vals = []
-    per_cam = defaultdict(list)
-    per_lens = defaultdict(list)
+    """rows 可以是行列表或 PhotoDataset"""
+    import numpy as np
+    ds = _as_dataset(rows)
+    vals, ok = _focal_values(ds, use_equiv)
 
-    for r in rows:
-        mm = r.get("focal_mm")
-        f35, used_guess = estimate_35mm(mm, r.get("model"), r.get("focal_35mm"))
-        val = f35 if use_equiv else mm
-        if val:
-            vals.append(val)
-            per_cam[r.get("model")].append(val)
-            per_lens[r.get("lens")].append(val)
-
-    if not vals:
+    if not ok.any():
         print("没有可统计的焦距数据。")
         return
 
-    # 分箱统计
-    cnt = Counter(bin_value(v, bin_width) for v in vals)
-    total = sum(cnt.values())
+    # 分箱统计（同 bin_value）
+    keys = (np.round(vals[ok] / bin_width) * bin_width).astype(np.int64)
+    total = len(keys)
     print(f"\n=== 焦距统计（{'35mm 等效' if use_equiv else '物理焦距 mm'}，分箱 {bin_width}mm） ===")
-    for k, c in cnt.most_common(topk):
+    for k, c in _top_bins(keys, topk):
         pct = 100.0 * c / total
         print(f"{k:>4} mm : {c:>6} 张  ({pct:5.1f}%)")
     print(f"总计：{total} 张（仅统计成功读取 EXIF 的 JPG）")
 
+    # 分位数：按 (机身, 镜头) 组合各一份对数分桶草图（未分箱的焦距，相对误差 ≤ 0.5%），按组相加即得各机身/镜头的
+    from dataset import HistogramCube, sketch_keys, sketch_quantiles
+    sketch = HistogramCube(ds, sketch_keys(np.where(ok, vals, np.nan)), 1.0)
+    _, pm, pl = ds.pairs()
+    print(f"分位数：{_quantile_text(sketch_quantiles(sketch.xs, sketch.counts.sum(axis=0))[0])}")
+
     # 每台相机 Top5 焦段
     print("\n=== 各机身 Top5 焦段（按张数） ===")
-    for cam, vv in per_cam.items():
-        if not cam: 
-            continue
-        cc = Counter(bin_value(v, bin_width) for v in vv)
-        line = ", ".join([f"{k}mm×{c}" for k,c in cc.most_common(5)])
-        print(f"- {cam}: {line}")
+    _print_group_top(ds.models, ds.model_code[ok], keys,
+                     sketch_quantiles(sketch.xs, sketch.group_counts(pm, len(ds.models))[0]))
 
     # 每支镜头 Top5 焦段
     print("\n=== 各镜头 Top5 焦段（按张数） ===")
-    for ln, vv in per_lens.items():
-        if not ln: 
-            continue
-        cc = Counter(bin_value(v, bin_width) for v in vv)
-        line = ", ".join([f"{k}mm×{c}" for k,c in cc.most_common(5)])
-        print(f"- {ln}: {line}")
+    _print_group_top(ds.lenses, ds.lens_code[ok], keys,
+                     sketch_quantiles(sketch.xs, sketch.group_counts(pl, len(ds.lenses))[0]))
 
 def maybe_plot_hist(rows, out_png: Path, use_equiv=True, bin_width=5):
     try:
@@ -209,18 +501,13 @@ def maybe_plot_hist(rows, out_png: Path, use_equiv=True, bin_width=5):
     except Exception as e:
         print(f"无法绘图（未安装 matplotlib 或环境不支持）：{e}")
         return
-    vals = []
-    for r in rows:
-        mm = r.get("focal_mm")
-        f35, used_guess = estimate_35mm(mm, r.get("model"), r.get("focal_35mm"))
-        val = f35 if use_equiv else mm
-        if val:
-            vals.append(val)
-    if not vals:
+    vals, ok = _focal_values(_as_dataset(rows), use_equiv)
+    vals = vals[ok]
+    if not len(vals):
         print("没有可绘图的数据。")
         return
     # 生成直方图
-    vmin, vmax = min(vals), max(vals)
+    vmin, vmax = vals.min(), vals.max()
     nbins = max(1, int((vmax - vmin) / bin_width) + 1)
     plt.figure()
     plt.hist(vals, bins=nbins)
@@ -232,42 +519,265 @@ def maybe_plot_hist(rows, out_png: Path, use_equiv=True, bin_width=5):
     print(f"已保存直方图：{out_png}")
 
 def main():
-    ap = argparse.ArgumentParser(description="统计子文件夹内JPG的焦距（支持等效35mm）")
+    from watcher import DEBOUNCE_SECONDS
+    if sys.argv[1:2] == ["merge"]:
+        return merge_main(sys.argv[2:])
+    ap = argparse.ArgumentParser(description="统计子文件夹内JPG的焦距（支持等效35mm）",
+                                 epilog="合并摘要：%(prog)s merge -o 合并.json.gz 分片1.json.gz 分片2.json.gz …")
+    ap.add_argument("--profile", default=None, metavar="TRACE.json",
+                    help="记录各阶段耗时与计数，写出 Chrome trace（chrome://tracing / Perfetto 可打开）")
     ap.add_argument("folder", help="包含照片的根目录")
     ap.add_argument("--no-exiftool", action="store_true", help="禁用 exiftool（强制走纯 Python）")
     ap.add_argument("--raw-mm", action="store_true", help="改为统计物理焦距（默认统计35mm等效）")
     ap.add_argument("--bin", type=int, default=5, help="分箱宽度（mm），默认5")
-    ap.add_argument("--csv", default="jpg_exif_focals.csv", help="导出明细CSV路径")
+    ap.add_argument("--csv", default="jpg_exif_focals.csv",
+                    help="导出明细路径；按扩展名选格式：.csv / .parquet / .arrow（后两者需要 pyarrow）")
     ap.add_argument("--plot", default=None, help="保存直方图 PNG 路径（可选）")
+    ap.add_argument("--report-dir", default=None,
+                    help="批量报告目录：总体及每个机身/镜头的 等效焦距/物理焦距/快门/ISO 复合图（可选）")
+    ap.add_argument("--summary-out", default=None, metavar="PATH",
+                    help="写出可合并的摘要文件（.json，.json.gz 为压缩），多台机器/多个目录的摘要可用 merge 子命令合并")
     ap.add_argument("--topk", type=int, default=15, help="打印TopK焦段，默认15")
+    ap.add_argument("--since", default=None, metavar="DATE",
+                    help="只统计/导出此时间及之后拍摄的照片：YYYY、YYYY-MM、YYYY-MM-DD（可带 HH:MM[:SS]）")
+    ap.add_argument("--until", default=None, metavar="DATE",
+                    help="只统计/导出此时间段及之前拍摄的照片（含该年/月/日），格式同 --since；"
+                         "指定任一端时没有拍摄时间的照片不计入")
+    ap.add_argument("--jobs", "-j", type=int, default=default_jobs(),
+                    help="并行度：exiftool 常驻进程数 / 纯 Python 解析进程数，默认等于 CPU 核数")
+    ap.add_argument("--prefetch", type=int, default=0, metavar="N",
+                    help="网络盘（SMB/NFS）上用 N 个线程并发预读文件头，掩盖往返延迟（如 32；纯 Python 解析时有效），默认 0 不预读")
+    ap.add_argument("--cache", default=None, help="EXIF 缓存文件路径（默认放在用户缓存目录）")
+    ap.add_argument("--no-cache", action="store_true", help="禁用 EXIF 缓存，每次全量解析")
+    ap.add_argument("--no-resume", action="store_true",
+                    help="丢弃上次中断（Ctrl+C / SIGTERM）留下的断点，从头读取；默认从断点继续")
+    ap.add_argument("--crop-factor", action="append", default=[], metavar="MODEL=CF",
+                    help="指定机身的裁切系数（完整型号名，可重复），优先于 EXIF 与内置表")
+    ap.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                    help="跳过匹配的目录/文件（名称或相对路径通配，可重复）")
+    ap.add_argument("--no-default-excludes", action="store_true",
+                    help="不跳过默认的缩略图/预览目录（" + ", ".join(DEFAULT_EXCLUDES) + "）")
+    ap.add_argument("--watch", action="store_true",
+                    help="读取完后持续监视文件夹，增量导入新增/修改/删除的照片并刷新汇总（Ctrl+C 结束）；"
+                         "明细导出只反映首次读取")
+    ap.add_argument("--watch-poll", type=float, default=None, metavar="SECONDS",
+                    help="监视改用定时轮询并指定间隔（网络盘上 inotify 收不到其他机器的改动）")
+    ap.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS, metavar="SECONDS",
+                    help=f"监视时最后一次改动后静默多久再处理一批，默认 {DEBOUNCE_SECONDS:g}")
     args = ap.parse_args()
+    if not args.profile:
+        return run(ap, args)
+    prof = profiling.enable()
+    try:
+        return run(ap, args)
+    finally:
+        profiling.disable()
+        prof.write_trace(args.profile)
+        print(f"\n=== 性能统计（trace：{args.profile}）===\n" + prof.format_summary(), file=sys.stderr)
 
+def run(ap, args):
     folder = Path(args.folder).expanduser().resolve()
     if not folder.exists():
         print(f"路径不存在：{folder}")
         sys.exit(1)
+    overrides = {}
+    for spec in args.crop_factor:
+        model, _, cf = spec.rpartition("=")
+        try:
+            overrides[model.strip()] = float(cf)
+        except ValueError:
+            ap.error(f"--crop-factor 格式应为 型号=系数：{spec}")
+    resolver = crop_resolver(overrides)
+    from dataset import parse_date_bound
+    try:
+        args.since_ts = parse_date_bound(args.since) if args.since else None
+        args.until_ts = parse_date_bound(args.until, end=True) if args.until else None
+    except ValueError as e:
+        ap.error(str(e))
 
-    rows = gather_rows(folder, use_exiftool=(not args.no_exiftool))
-    if not rows:
-        print("未读取到任何 JPG / EXIF。")
-        sys.exit(0)
+    # 边解析边导出明细，同时并入列式数据集（汇总与绘图共用）；不再整体保留行列表
+    from dataset import PhotoDataset
+    from export import ExportError, check_format
+    ds = PhotoDataset()
+    out_path = Path(args.csv).resolve()
+    try:
+        check_format(out_path)
+    except ExportError as e:
+        print(e)
+        sys.exit(1)
+    excludes = list(args.exclude) + ([] if args.no_default_excludes else list(DEFAULT_EXCLUDES))
+    # 不用缓存时监视要在读取之前开始（以启动时的遍历为基准），读取期间的改动才不会漏掉
+    watcher = make_watcher(folder, args, excludes) if args.watch and args.no_cache else None
 
-    # 计算/补全 focal_35mm
-    for r in rows:
-        f35, used_guess = estimate_35mm(r.get("focal_mm"), r.get("model"), r.get("focal_35mm"))
-        r["focal_35mm"] = f35
+    # 断点：用缓存时行已逐批存进缓存，断点只记进度；不用缓存时连同已解析的行一起记
+    from checkpoint import ScanCheckpoint, checkpoint_path
+    ckpt = ScanCheckpoint(folder, checkpoint_path(folder, args.cache), rows=args.no_cache, resume=not args.no_resume)
+    if ckpt.resumed:
+        print(f"从断点继续：跳过上次已处理完的 {len(ckpt.dirs)} 个目录"
+              + (f"，复用已解析的 {len(ckpt.entries)} 个文件" if ckpt.entries else "") + "（--no-resume 从头读取）")
+    stop = threading.Event()
+    progress = [0, 0]
 
-    # 保存CSV
-    out_csv = Path(args.csv).resolve()
-    save_csv(rows, out_csv)
-    print(f"已导出明细到：{out_csv}")
+    def export(cache=None):
+        def batches():
+            for rows, done, total in iter_gather(folder, use_exiftool=(not args.no_exiftool), cache=cache,
+                                                 jobs=args.jobs, excludes=excludes, checkpoint=ckpt, stop=stop,
+                                                 prefetch=args.prefetch):
+                progress[:] = done, total
+                yield filter_by_time(rows, args.since_ts, args.until_ts)
+        return export_rows(batches(), out_path, resolver, on_rows=ds.append_rows)
 
+    try:
+        with stop_on_signals(stop):
+            if args.no_cache:
+                n = export()
+            else:
+                from exif_cache import ExifCache
+                with ExifCache(args.cache) as cache:
+                    n = export(cache)
+    except ExportError as e:
+        print(e)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        stop.set()
+    if stop.is_set():
+        print(f"\n已中断：已处理 {progress[0]}/{progress[1]} 个文件（部分明细：{out_path}）。"
+              "进度已保存，再次运行同一文件夹会从断点继续。")
+        sys.exit(130)
+    if not n:
+        print("时间范围内没有照片。" if args.since or args.until else "未读取到任何 JPG / EXIF。")
+        if not args.watch:
+            sys.exit(0)
+    else:
+        print(f"已导出明细到：{out_path}")
+        summarize(ds, args)
+    if args.report_dir and n:
+        write_report_dir(ds, args)
+    if args.summary_out:
+        write_summary(ds, folder, args)
+    if args.watch:
+        watch_folder(folder, ds, args, resolver, excludes, watcher)
+
+@contextlib.contextmanager
+def stop_on_signals(stop):
+    """期间收到 Ctrl+C / SIGTERM / SIGHUP 时置位 stop（读取停在当前批结束处并保存断点）；
+    已在停止中再按 Ctrl+C 则立即抛出 KeyboardInterrupt"""
+    import signal
+
+    def handler(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        print(f"\n收到 {signal.Signals(signum).name}，当前批处理完后停止（再按一次 Ctrl+C 立即中断）…", file=sys.stderr)
+
+    old = {}
+    for name in ("SIGINT", "SIGTERM", "SIGHUP", "SIGBREAK"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            old[sig] = signal.signal(sig, handler)
+    try:
+        yield stop
+    finally:
+        for sig, prev in old.items():
+            signal.signal(sig, prev)
+
+def summarize(ds, args):
     # 打印汇总
-    print_summary(rows, use_equiv=(not args.raw_mm), bin_width=max(1, args.bin), topk=args.topk)
+    with profiling.span("summary"):
+        print_summary(ds, use_equiv=(not args.raw_mm), bin_width=max(1, args.bin), topk=args.topk)
 
     # 可选绘图
     if args.plot:
-        maybe_plot_hist(rows, Path(args.plot).resolve(), use_equiv=(not args.raw_mm), bin_width=max(1, args.bin))
+        with profiling.span("plot.hist"):
+            maybe_plot_hist(ds, Path(args.plot).resolve(), use_equiv=(not args.raw_mm), bin_width=max(1, args.bin))
+
+def write_report_dir(ds, args):
+    from report import REPORT_BINS, write_report
+    out_dir = Path(args.report_dir).resolve()
+    bins = (float(max(1, args.bin)), float(max(1, args.bin))) + REPORT_BINS[2:]
+    n = write_report(ds, out_dir, jobs=args.jobs, bins=bins)
+    print(f"已生成报告：{out_dir}（{n} 张图）")
+
+def write_summary(ds, folder, args):
+    from summary import PhotoSummary
+    out = Path(args.summary_out).resolve()
+    with profiling.span("summary.write"):
+        PhotoSummary.from_dataset(ds, root=folder).save(out)
+    print(f"已写出摘要：{out}")
+
+def print_summary_top(summary, use_equiv=True, bin_width=5, topk=15):
+    """摘要的焦段 TopK（同 print_summary 的总表；只计有物理焦距的照片，同界面）"""
+    cube = summary.cube(0 if use_equiv else 1, bin_width)
+    counts = cube.counts.sum(axis=0)
+    keys = [int(x) for x in cube.xs]
+    items = [(k, int(c)) for k, c in zip(keys, counts) if c and k]
+    total = sum(c for _, c in items)
+    if not total:
+        print("没有可统计的焦距数据。")
+        return
+    print(f"\n=== 焦距统计（{'35mm 等效' if use_equiv else '物理焦距 mm'}，分箱 {bin_width}mm） ===")
+    for k, c in sorted(items, key=lambda kc: (-kc[1], kc[0]))[:topk]:
+        print(f"{k:>4} mm : {c:>6} 张  ({100.0 * c / total:5.1f}%)")
+    print(f"总计：{total} 张")
+    from dataset import sketch_quantiles
+    sketch = summary.cube(0 if use_equiv else 1, 1.0, sketch=True)
+    print(f"分位数：{_quantile_text(sketch_quantiles(sketch.xs, sketch.counts.sum(axis=0))[0])}")
+
+def merge_main(argv):
+    """merge 子命令：合并多个摘要文件（顺序、分组任意，结果相同）"""
+    from summary import SummaryError, load_summaries
+    ap = argparse.ArgumentParser(prog="focal_stats_jpg.py merge", description="合并 --summary-out 写出的摘要文件")
+    ap.add_argument("inputs", nargs="+", help="摘要文件（也可以是之前合并的结果）")
+    ap.add_argument("-o", "--out", required=True, help="合并结果路径（.json / .json.gz）")
+    ap.add_argument("--raw-mm", action="store_true", help="改为统计物理焦距（默认统计35mm等效）")
+    ap.add_argument("--bin", type=int, default=5, help="分箱宽度（mm），默认5")
+    ap.add_argument("--topk", type=int, default=15, help="打印TopK焦段，默认15")
+    args = ap.parse_args(argv)
+    try:
+        merged = load_summaries(args.inputs)
+    except SummaryError as e:
+        print(e)
+        sys.exit(1)
+    out = Path(args.out).resolve()
+    merged.save(out)
+    print(f"已合并 {len(args.inputs)} 个摘要（{len(merged.sources)} 个来源，{len(merged)} 张）→ {out}")
+    print_summary_top(merged, use_equiv=(not args.raw_mm), bin_width=max(1, args.bin), topk=args.topk)
+
+def make_watcher(folder, args, excludes, known=None):
+    from watcher import POLL_SECONDS, FolderWatcher
+    return FolderWatcher(folder, SUPPORTED_EXTS, excludes, known=known, debounce=args.debounce,
+                         poll_interval=args.watch_poll or POLL_SECONDS, backend="poll" if args.watch_poll else "auto")
+
+def watch_folder(folder, ds, args, resolver, excludes, watcher=None):
+    """--watch：每批改动只解析变化的文件，并入数据集后重新打印汇总（及 --plot 图）"""
+    cache = None
+    if not args.no_cache:
+        from exif_cache import ExifCache
+        cache = ExifCache(args.cache)
+    try:
+        if watcher is None:   # 以刚写好的缓存为基准：读取期间发生的改动会作为第一批
+            watcher = make_watcher(folder, args, excludes, known={
+                p: (size, mtime) for p, (size, mtime, _) in cache.load(folder).items()})
+        print(f"\n监视中：{folder}（{watcher.backend}，Ctrl+C 结束）")
+        for rows, gone in iter_watch(watcher, use_exiftool=(not args.no_exiftool), cache=cache, jobs=args.jobs,
+                                     prefetch=args.prefetch):
+            rows = filter_by_time(rows, args.since_ts, args.until_ts)
+            fill_35mm(rows, resolver)
+            dropped = ds.remove_files(gone)
+            ds.append_rows(rows)
+            print(f"\n[watch {time.strftime('%H:%M:%S')}] 改动 {len(gone)} 个文件：+{len(rows)} / -{dropped} 行，"
+                  f"共 {len(ds)} 张")
+            summarize(ds, args)
+            if args.summary_out:
+                write_summary(ds, folder, args)
+    except KeyboardInterrupt:
+        print("\n已停止监视。")
+    finally:
+        if watcher is not None:
+            watcher.close()
+        if cache is not None:
+            cache.close()
 
 if __name__ == "__main__":
+    skip_main_in_workers()
     main()
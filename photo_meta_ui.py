@@ -1,215 +1,314 @@
-import sys
+import os, sys, threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from collections import Counter
-import math
-import re
 
 # ==== 与 focal_stats_jpg.py 同目录 ====
 try:
-    from focal_stats_jpg import gather_rows, estimate_35mm  # noqa
+    from focal_stats_jpg import SUPPORTED_EXTS, iter_gather, iter_watch, default_jobs, skip_main_in_workers  # noqa
+    from watcher import FolderWatcher  # noqa
+    from exif_cache import ExifCache  # noqa
+    from checkpoint import ScanCheckpoint  # noqa
+    import profiling  # noqa
+    from dataset import PhotoDataset, HistogramCube, month_label  # noqa
+    from resolver import crop_factor  # noqa
+    from report import (CompositeCache, build_cube, composite_key, cube_quantiles, format_quantiles,  # noqa
+                        plot_spec, selection_summary_text)
+    from summary import SummaryError, load_summaries  # noqa
 except Exception as e:
     raise SystemExit("请将 photo_meta_ui.py 与 focal_stats_jpg.py 放在同一目录再运行：%s" % e)
 
 # ==== UI / 绘图 ====
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QFileDialog, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QLineEdit, QComboBox, QListWidget, QListWidgetItem,
-    QAbstractItemView, QCheckBox, QMessageBox, QDoubleSpinBox, QSpinBox,
-    QTableWidget, QTableWidgetItem, QScrollArea, QSizePolicy, QProgressBar
+    QPushButton, QLabel, QLineEdit, QComboBox,
+    QCheckBox, QMessageBox, QDoubleSpinBox, QSpinBox,
+    QTableWidget, QTableWidgetItem, QScrollArea, QSizePolicy, QProgressBar,
+    QGroupBox, QPlainTextEdit, QSlider, QListView
 )
-from PySide6.QtCore import Qt, QSize, QObject, QThread, Signal
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
-
-
-# ---------- 工具函数 ----------
-def parse_shutter_to_stops(exposure_str):
-    if exposure_str is None:
-        return None, None
-    s = str(exposure_str).strip()
-    try:
-        if "/" in s:
-            a, b = s.split("/", 1)
-            val = float(a) / float(b)
-        else:
-            val = float(s)
-        if val <= 0:
-            return None, None
-        stops = math.log2(1.0 / val)
-        return val, stops
-    except Exception:
-        s2 = re.sub(r"[^0-9./]", "", s)
-        try:
-            if "/" in s2:
-                a, b = s2.split("/", 1)
-                val = float(a) / float(b)
-            else:
-                val = float(s2)
-            if val <= 0:
-                return None, None
-            stops = math.log2(1.0 / val)
-            return val, stops
-        except Exception:
-            return None, None
-
-
-def safe_float(x):
-    try:
-        return float(x)
-    except Exception:
-        return None
-
-
-def build_dataframe_like(rows):
-    data = []
-    for r in rows:
-        f35, _ = estimate_35mm(r.get("focal_mm"), r.get("model"), r.get("focal_35mm"))
-        iso = safe_float(r.get("iso"))
-        shutter_s, shutter_stops = parse_shutter_to_stops(r.get("exposure"))
-        data.append({
-            "file": r.get("file"),
-            "model": r.get("model"),
-            "lens": r.get("lens"),
-            "focal_mm": safe_float(r.get("focal_mm")),
-            "focal_35mm": safe_float(f35),
-            "iso": iso,
-            "exposure_raw": r.get("exposure"),
-            "shutter_s": shutter_s,
-            "shutter_stops": shutter_stops,
-        })
-    return data
-
-
-def histogram(values, bin_width, mode):
-    if not values:
-        return {}
-    bw = max(1e-6, float(bin_width))
-    def bin_func(v): return round(v / bw) * bw
-    c = Counter(bin_func(v) for v in values if v is not None)
-    return dict(sorted(c.items(), key=lambda kv: kv[0]))
-
-
-# ---- 解析镜头名得到焦段范围（mm）----
-_lens_range_cache = {}
-
-def parse_lens_focal_range(lens_name: str):
-    if not lens_name:
-        return None
-    key = lens_name.strip()
-    if key in _lens_range_cache:
-        return _lens_range_cache[key]
-    s = lens_name.replace(" ", "")
-    m = re.search(r'(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*mm', lens_name, re.IGNORECASE)
-    if not m:
-        m = re.search(r'(\d+(?:\.\d+)?)-?(\d+(?:\.\d+)?)mm', s, re.IGNORECASE)
-    if m:
-        v1 = float(m.group(1)); v2 = float(m.group(2))
-        lo, hi = (v1, v2) if v1 <= v2 else (v2, v1)
-        _lens_range_cache[key] = (lo, hi, False)
-        return _lens_range_cache[key]
-    m = re.search(r'(\d+(?:\.\d+)?)\s*mm', lens_name, re.IGNORECASE)
-    if not m:
-        m = re.search(r'(\d+(?:\.\d+)?)mm', s, re.IGNORECASE)
-    if m:
-        v = float(m.group(1))
-        _lens_range_cache[key] = (v, v, True)
-        return _lens_range_cache[key]
-    _lens_range_cache[key] = None
-    return None
-
-
-def in_physical_range(focal_mm, lens_name, tol_percent=5.0, tol_abs_mm=2.0):
-    if focal_mm is None:
-        return True
-    rng = parse_lens_focal_range(lens_name or "")
-    if not rng:
-        return True
-    lo, hi, is_prime = rng
-    if is_prime:
-        delta = max(tol_abs_mm, lo * (tol_percent / 100.0))
-        return (lo - delta) <= focal_mm <= (hi + delta)
-    else:
-        delta = max(tol_abs_mm, max(lo, hi) * (tol_percent / 100.0))
-        return (lo - delta) <= focal_mm <= (hi + delta)
-
-
-# ---------- Matplotlib 画布 ----------
-class MplCanvas(FigureCanvas):
-    def __init__(self, parent=None):
-        self.fig = Figure(figsize=(6, 4), dpi=100, constrained_layout=True)
-        self.ax = self.fig.add_subplot(111)
-        super().__init__(self.fig)
-        self.setParent(parent)
-        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-
-    def plot_bar(self, xs, counts, title, xlabel, *, numeric=False, bar_width=None):
-        self.ax.clear()
-        if numeric:
-            if not xs:
-                self.ax.set_title("No data"); self.draw(); return
-            if bar_width is None:
-                bar_width = 0.8
-            self.ax.bar(xs, counts, width=bar_width, align='center')
-            xmin = min(xs) - bar_width * 0.55
-            xmax = max(xs) + bar_width * 0.55
-            self.ax.set_xlim(xmin, xmax)
-        else:
-            pos = list(range(len(xs)))
-            self.ax.bar(pos, counts, width=0.8, align='center')
-            self.ax.set_xticks(pos)
-            self.ax.set_xticklabels(xs, rotation=45)
-        self.ax.set_title(title, fontweight="bold")
-        self.ax.set_xlabel(xlabel)
-        self.ax.set_ylabel("Count")
-        self.ax.margins(x=0.02, y=0.05)
-        self.draw()
+from PySide6.QtCore import Qt, QSize, QObject, QThread, QTimer, Signal, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QFontDatabase
+import numpy as np
 
 
 # ---------- 读取线程 ----------
 class ReaderWorker(QObject):
-    finished = Signal(object, str)   # data(list_of_dict) or None, error_message
-    def __init__(self, folder: Path):
+    progress = Signal(int, int)      # 已处理文件数, 目前已发现的文件数
+    batch = Signal(object)           # 本批数据（PhotoDataset）
+    finished = Signal(str)           # 读取结束（读完或已取消）：error_message（空串表示成功）
+    watching = Signal(str)           # 开始监视：实际使用的方式（inotify / poll）
+    changed = Signal(object, object) # 监视到一批改动：(旧行作废的路径集合, 新数据 PhotoDataset)
+    stopped = Signal(str)            # 线程结束：监视出错时为错误信息
+    def __init__(self, folder: Path, jobs=1, read=True, watch=False):
         super().__init__()
         self.folder = folder
+        self.jobs = jobs
+        self.read = read
+        self.watch = watch
+        self._stop = threading.Event()
+
+    def stop(self):
+        """可从任意线程调用：读取在当前批结束时停下（进度留在缓存与断点里），监视循环在半秒内退出"""
+        self._stop.set()
 
     def run(self):
+        err = ""
         try:
-            rows = gather_rows(self.folder, use_exiftool=True)  # 阻塞但在子线程
-            data = build_dataframe_like(rows)
-            self.finished.emit(data, "")
+            # 缓存连接需在本线程内创建（sqlite 连接不可跨线程）
+            with ExifCache() as cache:
+                if self.read:
+                    try:
+                        # 行已逐批存进缓存，断点只记已处理完的目录；下次读同一文件夹时这些目录不再列举，其余文件缓存命中即跳过
+                        ckpt = ScanCheckpoint(self.folder, rows=False)
+                        for rows, done, total in iter_gather(self.folder, use_exiftool=True, cache=cache,
+                                                             jobs=self.jobs, checkpoint=ckpt, stop=self._stop):
+                            if rows:
+                                self.batch.emit(PhotoDataset.from_rows(rows))
+                            self.progress.emit(done, total)
+                    except Exception as e:
+                        self.finished.emit(str(e))
+                        return
+                    self.finished.emit("")
+                if self.watch and not self._stop.is_set():
+                    # 以缓存（即刚读到的状态）为基准，读完到开始监视之间的改动也会作为第一批
+                    known = {p: (size, mtime) for p, (size, mtime, _) in cache.load(self.folder).items()}
+                    with FolderWatcher(self.folder, SUPPORTED_EXTS, known=known) as watcher:
+                        self.watching.emit(watcher.backend)
+                        for rows, gone in iter_watch(watcher, use_exiftool=True, cache=cache,
+                                                     jobs=self.jobs, stop=self._stop):
+                            self.changed.emit(gone, PhotoDataset.from_rows(rows))
         except Exception as e:
-            self.finished.emit(None, str(e))
+            err = str(e)
+        finally:
+            self.stopped.emit(err)
+
+
+# ---------- 刷新调度 ----------
+class UpdateScheduler(QObject):
+    """合并短时间内的多次刷新请求，聚合计算放到后台线程，结果交回 GUI 线程画图。
+    collect() 在 GUI 线程读取控件状态；compute(params) 在后台线程算出结果；
+    计算进行中再来的请求只保留最新一次，算完再跑，过期结果直接丢弃"""
+    result = Signal(object)
+    _done = Signal(int, object)     # 后台线程 -> GUI 线程
+
+    def __init__(self, collect, compute, delay_ms=40, parent=None):
+        super().__init__(parent)
+        self._collect = collect
+        self._compute = compute
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._kick)
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._gen = 0
+        self._busy = False
+        self._pending = None
+        self._done.connect(self._on_done)
+
+    def request(self, *_):
+        """信号槽入口：窗口期内的请求合并成一次（不重启计时，拖动时也能持续刷新）"""
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _kick(self):
+        params = self._collect()
+        self._gen += 1
+        if self._busy:
+            self._pending = (self._gen, params)
+        else:
+            self._submit(self._gen, params)
+
+    def _submit(self, gen, params):
+        self._busy = True
+        fut = self._pool.submit(self._compute, params)
+        fut.add_done_callback(lambda f: self._done.emit(gen, f))
+
+    def _on_done(self, gen, fut):
+        self._busy = False
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._submit(*pending)
+        if gen != self._gen:        # 已有更新的请求，这个结果过期了
+            return
+        exc = fut.exception()
+        if exc is not None:
+            print(f"[update] 计算失败：{exc}", file=sys.stderr)
+            return
+        self.result.emit(fut.result())
+
+    def shutdown(self):
+        self._timer.stop()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ---------- 机身 / 镜头列表 ----------
+class NameListModel(QAbstractListModel):
+    """机身或镜头列表：每项带照片数，可勾选。勾选状态是按数据集名称表编码的位图（selected，numpy 布尔数组），
+    切换一项只改一位、只通知这一行；search() 按子串过滤显示哪些行（不影响勾选），按名称排序"""
+    changed = Signal()   # 勾选变了
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.names = []                          # 编码 -> 名称（数据集名称表的副本）
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.selected = np.zeros(0, dtype=bool)
+        self._order = []                         # 按名称排序的编码
+        self._rows = []                          # 当前显示的编码（_order 里匹配搜索的）
+        self._query = ""
+
+    def set_names(self, names, counts):
+        """换成新的名称表：已有的名称保持原勾选状态，新出现的默认勾选"""
+        prev = dict(zip(self.names, self.selected.tolist()))
+        self.beginResetModel()
+        self.names = list(names)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.selected = np.array([prev.get(n, True) for n in self.names], dtype=bool)
+        self._order = sorted(range(len(self.names)), key=self.names.__getitem__)
+        self._rows = self._match(self._order, self._query)
+        self.endResetModel()
+
+    def clear(self):
+        self.set_names([], [])
+
+    def _match(self, codes, query):
+        if not query:
+            return list(codes)
+        return [c for c in codes if query in self.names[c].casefold()]
+
+    def search(self, text):
+        """只显示名称含 text 的项（不区分大小写）；在上次结果上继续输入时只筛上次的结果"""
+        query = text.strip().casefold()
+        if query == self._query:
+            return
+        base = self._rows if self._query and query.startswith(self._query) else self._order
+        self.beginResetModel()
+        self._rows = self._match(base, query)
+        self._query = query
+        self.endResetModel()
+
+    def set_all(self, on):
+        """全选 / 全不选当前显示的项（有搜索时只动搜到的）"""
+        if not self._rows:
+            return
+        self.selected[self._rows] = on
+        self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1), [Qt.CheckStateRole])
+        self.changed.emit()
+
+    def toggle(self, row):
+        code = self._rows[row]
+        self.selected[code] = not self.selected[code]
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [Qt.CheckStateRole])
+        self.changed.emit()
+
+    def selected_names(self):
+        return [self.names[c] for c in self._order if self.selected[c]]
+
+    # ---- QAbstractListModel ----
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        code = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{self.names[code]}  ({self.counts[code]})"
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.selected[code] else Qt.Unchecked
+        if role == Qt.ToolTipRole:
+            return f"{self.names[code]}：{self.counts[code]} 张"
+        return None
+
+    def flags(self, index):
+        # 不设 ItemIsUserCheckable：单击整行即切换（见 NameList），复选框只负责显示
+        return Qt.ItemIsEnabled | Qt.ItemNeverHasChildren if index.isValid() else Qt.NoItemFlags
+
+
+class NameList(QWidget):
+    """列表 + 搜索框 + 全选 / 全不选；单击一项切换勾选"""
+
+    def __init__(self, title, parent=None):
+        super().__init__(parent)
+        self.model = NameListModel(self)
+        self.ed_search = QLineEdit()
+        self.ed_search.setPlaceholderText("搜索…")
+        self.ed_search.setClearButtonEnabled(True)
+        self.btn_all = QPushButton("全选")
+        self.btn_none = QPushButton("全不选")
+        self.view = QListView()
+        self.view.setUniformItemSizes(True)   # 几千项时不必逐项量尺寸
+        self.view.setModel(self.model)
+        bar = QHBoxLayout()
+        bar.addWidget(self.ed_search, 1)
+        bar.addWidget(self.btn_all)
+        bar.addWidget(self.btn_none)
+        lay = QVBoxLayout(self)
+        lay.setContentsMargins(0, 0, 0, 0)
+        lay.addWidget(QLabel(title))
+        lay.addLayout(bar)
+        lay.addWidget(self.view)
+        self.ed_search.textChanged.connect(self.model.search)
+        self.btn_all.clicked.connect(lambda: self.model.set_all(True))
+        self.btn_none.clicked.connect(lambda: self.model.set_all(False))
+        self.view.clicked.connect(lambda idx: self.model.toggle(idx.row()))
 
 
 # ---------- 主窗 ----------
 class MainWindow(QMainWindow):
+    _autosaved = Signal(str)   # 后台自动保存结束 -> GUI 线程显示状态
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Photo Meta Analyzer")
         self.setMinimumSize(QSize(1120, 720))
 
         # 数据
-        self.data = []
+        self.data = PhotoDataset()
         self.current_folder = None
         self._last_plot = None  # 保存复合图时使用
+        self._composites = CompositeCache()   # 复合图 PNG（LRU）
+        self._autosave_pool = ThreadPoolExecutor(max_workers=1)
+        self._autosave_key = None             # 最近一次排队 / 写出的自动保存 (路径, 内容键)
+        self._cubes = {}        # 分析模式 -> HistogramCube
+        self._sketches = {}     # 分析模式 -> (拍摄月份区间, 分位数草图)
+        self._cube_params = None
+        self._data_lock = threading.Lock()   # 后台聚合与 GUI 线程合并新数据互斥
+        self._reading = False
+        self._cancelled = False   # 本次读取是否被用户取消
+
+        # 读取过程中分批到达的数据：节流重绘（每秒几次）
+        self._partial_pending = False
+        self._partial_timer = QTimer(self)
+        self._partial_timer.setInterval(300)
+        self._partial_timer.timeout.connect(self._refresh_partial)
 
         # 顶部条 + 进度条
         self.ed_path = QLineEdit()
         self.btn_browse = QPushButton("选择文件夹")
         self.btn_read = QPushButton("读取")
+        self.btn_open_summary = QPushButton("打开摘要…")
+        self.btn_open_summary.setToolTip("打开一个或多个摘要文件（命令行 --summary-out 生成），合并后直接筛选/出图")
+        self.chk_watch = QCheckBox("监视新照片")
+        self.chk_watch.setToolTip("读取完后持续监视文件夹，新增/修改/删除的照片自动并入统计")
         self.lbl_status = QLabel("状态：未读取")
         self.lbl_status.setStyleSheet("color:#555;")
         self.progress = QProgressBar()
         self.progress.setVisible(False)   # 读取时显示
         self.progress.setFixedWidth(180)
+        self.btn_cancel = QPushButton("取消")
+        self.btn_cancel.setToolTip("停止读取：已读到的照片保留，进度已保存，再次读取同一文件夹会从断点继续")
+        self.btn_cancel.setVisible(False)
 
         top_layout = QHBoxLayout()
         top_layout.addWidget(QLabel("文件夹："))
         top_layout.addWidget(self.ed_path, 1)
         top_layout.addWidget(self.btn_browse)
         top_layout.addWidget(self.btn_read)
+        top_layout.addWidget(self.chk_watch)
+        top_layout.addWidget(self.btn_open_summary)
         top_layout.addWidget(self.lbl_status)
         top_layout.addWidget(self.progress)
+        top_layout.addWidget(self.btn_cancel)
 
         # ===== 三列：左=参数  中=相机  右=镜头 =====
         self.cmb_analysis = QComboBox()
@@ -227,6 +326,11 @@ class MainWindow(QMainWindow):
         self.spn_dpi.setValue(150)
         self.spn_dpi.setDecimals(0)
 
+        # 解析并行度（exiftool 常驻进程数 / 纯 Python 解析进程数）
+        self.spn_jobs = QSpinBox()
+        self.spn_jobs.setRange(1, max(1, default_jobs() * 2))
+        self.spn_jobs.setValue(default_jobs())
+
         # 合理性筛选
         self.chk_sanity = QCheckBox("启用物理合理性筛选（按镜头标称焦段）")
         self.spn_tol_pct = QSpinBox()
@@ -239,6 +343,14 @@ class MainWindow(QMainWindow):
         self.spn_tol_abs.setValue(2.0)
         self.spn_tol_abs.setSuffix(" mm")
 
+        # 拍摄时间区间（按月）：两端都拉到头时不筛选（没有拍摄时间的照片也计入）
+        self.sld_from = QSlider(Qt.Horizontal)
+        self.sld_to = QSlider(Qt.Horizontal)
+        self.lbl_period = QLabel("")
+        for s in (self.sld_from, self.sld_to):
+            s.setPageStep(12)
+        self._set_time_range(None)
+
         self.chk_autosave = QCheckBox("更新时自动保存PNG（复合图）")
         self.btn_save_png = QPushButton("另存当前复合图")
 
@@ -254,6 +366,8 @@ class MainWindow(QMainWindow):
         left.addWidget(self.spn_bin)
         left.addWidget(QLabel("图像DPI"))
         left.addWidget(self.spn_dpi)
+        left.addWidget(QLabel("并行解析进程数"))
+        left.addWidget(self.spn_jobs)
         left.addWidget(QLabel("合理性筛选"))
         row_tol = QHBoxLayout()
         row_tol.addWidget(self.chk_sanity)
@@ -263,6 +377,18 @@ class MainWindow(QMainWindow):
         row_tol2.addWidget(self.spn_tol_pct)
         row_tol2.addWidget(self.spn_tol_abs)
         left.addLayout(row_tol2)
+        row_period = QHBoxLayout()
+        row_period.addWidget(QLabel("拍摄时间"))
+        row_period.addWidget(self.lbl_period, 1)
+        left.addLayout(row_period)
+        row_from = QHBoxLayout()
+        row_from.addWidget(QLabel("从"))
+        row_from.addWidget(self.sld_from)
+        left.addLayout(row_from)
+        row_to = QHBoxLayout()
+        row_to.addWidget(QLabel("到"))
+        row_to.addWidget(self.sld_to)
+        left.addLayout(row_to)
         left.addWidget(self.chk_autosave)
         left.addWidget(self.btn_save_png)
         left.addWidget(QLabel("裁切系数（可编辑）"))
@@ -270,17 +396,13 @@ class MainWindow(QMainWindow):
         left.addWidget(self.btn_apply_crop)
 
         # 中列：相机
-        self.lst_camera = QListWidget()
-        self.lst_camera.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.lst_camera = NameList("相机（单击勾选，可多选）")
         mid = QVBoxLayout()
-        mid.addWidget(QLabel("相机（可多选）"))
         mid.addWidget(self.lst_camera)
 
         # 右列：镜头
-        self.lst_lens = QListWidget()
-        self.lst_lens.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.lst_lens = NameList("镜头（单击勾选，可多选）")
         right = QVBoxLayout()
-        right.addWidget(QLabel("镜头（可多选）"))
         right.addWidget(self.lst_lens)
 
         filter_layout = QHBoxLayout()
@@ -289,7 +411,12 @@ class MainWindow(QMainWindow):
         filter_layout.addLayout(right, 3)
 
         # 图 + 概览
-        self.canvas = MplCanvas(self)
+        # 画布等窗口显示出来之后再创建（matplotlib 导入较慢），先放一个占位容器
+        self.canvas = None
+        self.canvas_slot = QWidget()
+        self.canvas_slot.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.canvas_slot.setMinimumHeight(240)   # 展开统计面板时不至于把图挤没
+        QVBoxLayout(self.canvas_slot).setContentsMargins(0, 0, 0, 0)
         self.sel_label = QLabel("")
         self.sel_label.setWordWrap(True)
         self.sel_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
@@ -306,30 +433,67 @@ class MainWindow(QMainWindow):
         sel_area.setWidget(self.sel_container)
 
         chart_row = QHBoxLayout()
-        chart_row.addWidget(self.canvas, 1)
+        chart_row.addWidget(self.canvas_slot, 1)
         chart_row.addWidget(sel_area)
 
+        # 性能统计（可折叠；勾选时才启用埋点）
+        self.grp_stats = QGroupBox("性能统计")
+        self.grp_stats.setCheckable(True)
+        self.grp_stats.setChecked(False)
+        self.txt_stats = QPlainTextEdit()
+        self.txt_stats.setReadOnly(True)
+        self.txt_stats.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.txt_stats.setMaximumHeight(180)
+        self.btn_stats_reset = QPushButton("清空")
+        self.btn_stats_trace = QPushButton("导出 trace…")
+        self.stats_body = QWidget()
+        stats_layout = QHBoxLayout(self.stats_body)
+        stats_layout.setContentsMargins(0, 0, 0, 0)
+        stats_layout.addWidget(self.txt_stats, 1)
+        stats_btns = QVBoxLayout()
+        stats_btns.addWidget(self.btn_stats_reset)
+        stats_btns.addWidget(self.btn_stats_trace)
+        stats_btns.addStretch(1)
+        stats_layout.addLayout(stats_btns)
+        QVBoxLayout(self.grp_stats).addWidget(self.stats_body)
+        self.stats_body.setVisible(False)
+        self._stats_timer = QTimer(self)
+        self._stats_timer.setInterval(1000)
+        self._stats_timer.timeout.connect(self._refresh_stats)
+
         root = QWidget()
         layout = QVBoxLayout(root)
         layout.addLayout(top_layout)
         layout.addLayout(filter_layout)
         layout.addLayout(chart_row, 1)
+        layout.addWidget(self.grp_stats)
         self.setCentralWidget(root)
 
-        # 信号
+        # 信号：所有刷新请求都经调度器合并，避免连续信号引发的重算风暴
+        self.scheduler = UpdateScheduler(self._collect_plot_params, self._compute_plot, parent=self)
+        self.scheduler.result.connect(self._apply_plot)
+        self._autosaved.connect(self._on_autosaved)
         self.btn_browse.clicked.connect(self.on_browse)
         self.btn_read.clicked.connect(self.on_read_clicked)
+        self.btn_cancel.clicked.connect(self.on_cancel_clicked)
+        self.chk_watch.toggled.connect(self.on_watch_toggled)
+        self.btn_open_summary.clicked.connect(self.on_open_summaries)
         self.cmb_analysis.currentIndexChanged.connect(self.on_mode_changed)
-        self.cmb_analysis.currentIndexChanged.connect(self.update_plot)
-        self.lst_camera.itemSelectionChanged.connect(self.update_plot)
-        self.lst_lens.itemSelectionChanged.connect(self.update_plot)
+        self.cmb_analysis.currentIndexChanged.connect(self.scheduler.request)
+        self.lst_camera.model.changed.connect(self.scheduler.request)
+        self.lst_lens.model.changed.connect(self.scheduler.request)
         self.btn_save_png.clicked.connect(self.save_png)
-        self.btn_apply_crop.clicked.connect(self.update_plot)
-        self.spn_bin.valueChanged.connect(self.update_plot)
-        self.spn_dpi.valueChanged.connect(self.update_plot)
-        self.chk_sanity.stateChanged.connect(self.update_plot)
-        self.spn_tol_pct.valueChanged.connect(self.update_plot)
-        self.spn_tol_abs.valueChanged.connect(self.update_plot)
+        self.grp_stats.toggled.connect(self.on_stats_toggled)
+        self.btn_stats_reset.clicked.connect(self.on_stats_reset)
+        self.btn_stats_trace.clicked.connect(self.on_stats_trace)
+        self.btn_apply_crop.clicked.connect(self.scheduler.request)
+        self.spn_bin.valueChanged.connect(self.scheduler.request)
+        self.spn_dpi.valueChanged.connect(self.scheduler.request)
+        self.chk_sanity.stateChanged.connect(self.scheduler.request)
+        self.spn_tol_pct.valueChanged.connect(self.scheduler.request)
+        self.spn_tol_abs.valueChanged.connect(self.scheduler.request)
+        self.sld_from.valueChanged.connect(self.on_period_changed)
+        self.sld_to.valueChanged.connect(self.on_period_changed)
 
         self.on_mode_changed()
 
@@ -354,25 +518,153 @@ class MainWindow(QMainWindow):
             QMessageBox.critical(self, "错误", "路径不存在。")
             return
 
-        # 禁用控件 & 显示不确定进度条
+        self._stop_worker()   # 正在监视上一次的文件夹
+
+        # 禁用控件 & 显示进度条（总数未知前为不确定模式）
         self.setControlsEnabled(False)
         self.progress.setVisible(True)
-        self.progress.setRange(0, 0)  # 不确定模式
+        self.progress.setRange(0, 0)
+        self.btn_cancel.setVisible(True)
+        self.btn_cancel.setEnabled(True)
         self.lbl_status.setText("状态：读取中…")
+        with self._data_lock:
+            self.data = PhotoDataset()
+        self.current_folder = p
+        for w in (self.lst_camera, self.lst_lens):
+            w.model.clear()
+        self.tbl_crop.setRowCount(0)
+        self._set_time_range(None)
+        self._reading = True
+        self._cancelled = False
+        self._partial_pending = False
+        self._partial_timer.start()
+        self._start_worker(p, read=True, watch=self.chk_watch.isChecked())
+
+    # —— 取消读取：当前批处理完后停下，已读部分照常出图
+    def on_cancel_clicked(self):
+        if not self._reading or self._worker is None:
+            return
+        self._cancelled = True
+        self._worker.stop()
+        self.btn_cancel.setEnabled(False)
+        self.lbl_status.setText("状态：正在取消…")
+
+    # —— 打开摘要：多个文件合并后当作一份数据，无需原始照片
+    def on_open_summaries(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, "打开摘要文件", "",
+                                                "摘要 (*.json *.json.gz *.gz);;所有文件 (*)")
+        if not paths:
+            return
+        try:
+            summary = load_summaries(paths)
+        except SummaryError as e:
+            QMessageBox.critical(self, "错误", f"无法打开摘要：\n{e}")
+            return
+        self.open_summary(summary)
+        self.lbl_status.setText(f"状态：已打开 {len(paths)} 个摘要（{len(summary.sources)} 个来源，{len(summary)} 张）")
+
+    def open_summary(self, summary):
+        self._stop_worker()
+        self._cancelled = False
+        with self._data_lock:
+            self.data = summary
+        self.current_folder = None
+        for w in (self.lst_camera, self.lst_lens):
+            w.model.clear()
+        self.tbl_crop.setRowCount(0)
+        self.fill_filters()
+        self.fill_crop_table()
+        self.scheduler.request()
 
-        # 启动线程
-        self._thread = QThread()
-        self._worker = ReaderWorker(p)
+    def _start_worker(self, folder, read, watch):
+        self._thread = QThread(self)   # 归窗口所有：_on_worker_stopped 放下引用时线程可能还没退出
+        self._worker = ReaderWorker(folder, jobs=self.spn_jobs.value(), read=read, watch=watch)
         self._worker.moveToThread(self._thread)
         self._thread.started.connect(self._worker.run)
+        self._worker.batch.connect(self._on_read_batch)
+        self._worker.progress.connect(self._on_read_progress)
         self._worker.finished.connect(self._on_read_finished)
-        self._worker.finished.connect(self._thread.quit)
-        self._worker.finished.connect(self._worker.deleteLater)
+        self._worker.watching.connect(self._on_watch_started)
+        self._worker.changed.connect(self._on_watch_changed)
+        self._worker.stopped.connect(self._on_worker_stopped)
+        self._worker.stopped.connect(self._thread.quit)
+        # 线程结束后再删 worker：_on_worker_stopped 还要用 sender() 认出它
+        self._thread.finished.connect(self._worker.deleteLater)
         self._thread.finished.connect(self._thread.deleteLater)
         self._thread.start()
 
-    def _on_read_finished(self, data, err):
+    def _stop_worker(self):
+        """停止监视并等线程退出（读取中不会调用：那时相关控件都已禁用）"""
+        if self._worker is None:
+            return
+        self._worker.stop()
+        self._thread.quit()
+        self._thread.wait()
+        self._thread = self._worker = None
+
+    def _on_worker_stopped(self, err):
+        if self.sender() is not self._worker:   # 已被 _stop_worker 收尾过
+            return
+        self._thread = self._worker = None
+        if err:
+            self.lbl_status.setText(f"状态：监视出错：{err}")
+            self.chk_watch.blockSignals(True)
+            self.chk_watch.setChecked(False)
+            self.chk_watch.blockSignals(False)
+
+    # —— 监视：勾选时开始（已读取过文件夹），取消时停止
+    def on_watch_toggled(self, on):
+        if not on:
+            self._stop_worker()
+            if self.current_folder is not None:
+                self.lbl_status.setText(f"状态：已停止监视（{len(self.data)} 条）")
+        elif self._worker is None and self.current_folder is not None:
+            self._start_worker(self.current_folder, read=False, watch=True)
+
+    def _on_watch_started(self, backend):
+        self.lbl_status.setText(f"状态：监视中（{backend}，{len(self.data)} 条）")
+
+    def _on_watch_changed(self, gone, data):
+        with self._data_lock:
+            dropped = self.data.remove_files(gone)
+            self.data.extend(data)
+        self.fill_filters()
+        self.fill_crop_table()
+        self.scheduler.request()
+        self.lbl_status.setText(f"状态：监视中（+{len(data)} / -{dropped}，共 {len(self.data)} 条）")
+
+    def _on_read_batch(self, data):
+        first = not len(self.data)
+        with self._data_lock:
+            self.data.extend(data)
+        self._partial_pending = True
+        if first:  # 第一批立刻出图，之后交给定时器节流
+            self._refresh_partial()
+
+    def _on_read_progress(self, done, total):
+        if self._cancelled:
+            return
+        if total:
+            self.progress.setRange(0, total)
+            self.progress.setValue(done)
+        self.lbl_status.setText(f"状态：读取中… {done}/{total}")
+
+    def _refresh_partial(self):
+        if not self._partial_pending or not len(self.data):
+            return
+        self._partial_pending = False
+        self.fill_filters()
+        self.scheduler.request()
+
+    def _on_read_finished(self, err):
         # 线程回调在主线程执行
+        self._reading = False
+        self._partial_timer.stop()
+        self.btn_cancel.setVisible(False)
+        if self._cancelled:   # 取消后不再进入监视
+            self.chk_watch.blockSignals(True)
+            self.chk_watch.setChecked(False)
+            self.chk_watch.blockSignals(False)
         if err:
             QMessageBox.critical(self, "错误", f"读取失败：\n{err}")
             self.lbl_status.setText("状态：读取失败")
@@ -380,9 +672,8 @@ class MainWindow(QMainWindow):
             self.setControlsEnabled(True)
             return
 
-        self.data = data or []
-        if not self.data:
-            self.lbl_status.setText("状态：未找到 JPG/EXIF")
+        if not len(self.data):
+            self.lbl_status.setText("状态：已取消" if self._cancelled else "状态：未找到 JPG/EXIF")
             self.progress.setVisible(False)
             self.setControlsEnabled(True)
             return
@@ -391,8 +682,12 @@ class MainWindow(QMainWindow):
         self.fill_crop_table()
         self.cmb_analysis.setCurrentIndex(0)
         self.on_mode_changed()
-        self.update_plot()
+        self.scheduler.request()
         self.lbl_status.setText(f"状态：已更新（{len(self.data)} 条）")
+        if self._cancelled:
+            self.lbl_status.setText(f"状态：已取消（已读 {len(self.data)} 条，再次读取从断点继续）")
+        elif self._worker is not None and self._worker.watch:
+            self.lbl_status.setText(f"状态：监视中（{len(self.data)} 条）")
 
         # 恢复控件 & 关闭进度条
         self.progress.setVisible(False)
@@ -400,33 +695,79 @@ class MainWindow(QMainWindow):
 
     def setControlsEnabled(self, enabled: bool):
         for w in [
-            self.btn_browse, self.btn_read, self.cmb_analysis, self.spn_bin, self.spn_dpi,
-            self.chk_sanity, self.spn_tol_pct, self.spn_tol_abs,
+            self.btn_browse, self.btn_read, self.chk_watch, self.btn_open_summary, self.cmb_analysis, self.spn_bin, self.spn_dpi, self.spn_jobs,
+            self.chk_sanity, self.spn_tol_pct, self.spn_tol_abs, self.sld_from, self.sld_to,
             self.chk_autosave, self.btn_save_png, self.tbl_crop, self.btn_apply_crop,
             self.lst_camera, self.lst_lens
         ]:
             w.setEnabled(enabled)
 
     def fill_filters(self):
-        cams = sorted({d["model"] for d in self.data if d.get("model")})
-        lens = sorted({d["lens"] for d in self.data if d.get("lens")})
-        self.lst_camera.clear()
-        for c in cams:
-            it = QListWidgetItem(c); self.lst_camera.addItem(it); it.setSelected(True)
-        self.lst_lens.clear()
-        for l in lens:
-            it = QListWidgetItem(l); self.lst_lens.addItem(it); it.setSelected(True)
+        """重建机身/镜头列表（带照片数）：已有的项保持原勾选状态，新出现的默认勾选；
+        重建不发 changed，由调用方统一刷新"""
+        cam_counts, lens_counts = self.data.name_counts()
+        self.lst_camera.model.set_names(self.data.models, cam_counts)
+        self.lst_lens.model.set_names(self.data.lenses, lens_counts)
+        self._set_time_range(self.data.month_range() if isinstance(self.data, PhotoDataset) else None)
+
+    # —— 拍摄时间区间
+    def _set_time_range(self, rng):
+        """数据的月份范围变化时重设两个滑块：原先拉到头的一端继续跟着到头，其余保持原值（夹在新范围内）"""
+        sliders = (self.sld_from, self.sld_to)
+        for s in sliders:
+            s.blockSignals(True)
+        if rng is None:
+            for s in sliders:
+                s.setRange(0, 0)
+            self._has_dates = False
+        else:
+            was_lo = not self._has_dates or self.sld_from.value() == self.sld_from.minimum()
+            was_hi = not self._has_dates or self.sld_to.value() == self.sld_to.maximum()
+            for s in sliders:
+                s.setRange(*rng)
+            if was_lo:
+                self.sld_from.setValue(rng[0])
+            if was_hi:
+                self.sld_to.setValue(rng[1])
+            self._has_dates = True
+        for s in sliders:
+            s.blockSignals(False)
+        self._update_period_label()
+
+    def period(self):
+        """当前选中的 (首月, 末月) 月序号；不筛选（两端拉到头或没有拍摄时间）时为 None"""
+        lo, hi = self.sld_from.value(), self.sld_to.value()
+        if not self._has_dates or (lo == self.sld_from.minimum() and hi == self.sld_to.maximum()):
+            return None
+        return lo, hi
+
+    def _update_period_label(self):
+        if not self._has_dates:
+            self.lbl_period.setText("（无拍摄时间）")
+            return
+        text = f"{month_label(self.sld_from.value())} ~ {month_label(self.sld_to.value())}"
+        self.lbl_period.setText(text if self.period() else text + "（全部）")
+
+    def on_period_changed(self):
+        # 两端交叉时把另一端推过去
+        if self.sender() is self.sld_from and self.sld_to.value() < self.sld_from.value():
+            self.sld_to.setValue(self.sld_from.value())
+        elif self.sender() is self.sld_to and self.sld_from.value() > self.sld_to.value():
+            self.sld_from.setValue(self.sld_to.value())
+        self._update_period_label()
+        self.scheduler.request()
 
     def fill_crop_table(self):
-        cams = sorted({d["model"] for d in self.data if d.get("model")})
+        """按当前机身重建裁切表；已在表中的机身保留手动改过的系数"""
+        prev = self.read_crop_table()
+        cams = sorted(self.data.models)
         self.tbl_crop.setRowCount(len(cams))
         for i, cam in enumerate(cams):
             self.tbl_crop.setItem(i, 0, QTableWidgetItem(str(cam)))
-            s = (cam or "").upper(); cf = 1.0
-            if any(k in s for k in ["ILCE-6", "A6", "X-T", "X-S", "X-H", "ZV-E", "ALPHA 6"]): cf = 1.5
-            if "EOS R" in s and any(k in s for k in ["R7", "R10", "R50"]): cf = 1.6
-            if any(k in s for k in ["OM-", "E-M", "DMC-G", "DC-G", "GH", "GX"]): cf = 2.0
-            self.tbl_crop.setItem(i, 1, QTableWidgetItem(str(cf)))
+            cf = prev.get(cam)
+            if cf is None:
+                cf = crop_factor(cam)     # 与命令行共用同一张关键字表；认不出按全画幅
+            self.tbl_crop.setItem(i, 1, QTableWidgetItem(str(1.0 if cf is None else cf)))
 
     def read_crop_table(self):
         d = {}
@@ -468,17 +809,11 @@ class MainWindow(QMainWindow):
             self.spn_bin.setSuffix(" ISO")
             self.spn_bin.blockSignals(False)
 
-    def _sel_summary_text(self, cams, lens):
-        def summarise(items, n=30):
-            if not items:
-                return "(none)"
-            if len(items) <= n:
-                return ", ".join(items)
-            return ", ".join(items[:n]) + f" … (total {len(items)})"
-        return f"Camera: {summarise(cams)}\n\nLens: {summarise(lens)}"
+    def _sel_summary_text(self, cams, lens, period=None, quantiles=None):
+        return selection_summary_text(cams, lens, period, quantiles)
 
     def save_png(self):
-        if not self.data or not self._last_plot:
+        if not len(self.data) or not self._last_plot:
             QMessageBox.information(self, "提示", "还没有可保存的图。")
             return
         path, _ = QFileDialog.getSaveFileName(self, "保存复合图", "hist.png", "PNG Files (*.png)")
@@ -487,132 +822,204 @@ class MainWindow(QMainWindow):
             self.lbl_status.setText("状态：已保存 → " + Path(path).name)
 
     def _save_composite(self, path, dpi=150):
-        lp = self._last_plot
-        fig = Figure(figsize=(8, 4.5), dpi=dpi, constrained_layout=True)
-        gs = fig.add_gridspec(ncols=2, nrows=1, width_ratios=[3.0, 1.3])
-        ax = fig.add_subplot(gs[0, 0])
-        ax2 = fig.add_subplot(gs[0, 1])
-        if lp["numeric"]:
-            xs = lp["xs"]; ys = lp["ys"]; bw = lp["bar_width"]
-            ax.bar(xs, ys, width=bw, align='center')
-            ax.set_xlim(min(xs)-bw*0.55, max(xs)+bw*0.55)
-        else:
-            pos = list(range(len(lp["xs"])))
-            ax.bar(pos, lp["ys"], width=0.8, align='center')
-            ax.set_xticks(pos); ax.set_xticklabels(lp["xs"], rotation=45)
-        ax.set_title(lp["title"], fontweight="bold")
-        ax.set_xlabel(lp["xlabel"]); ax.set_ylabel("Count"); ax.margins(x=0.02, y=0.05)
-        ax2.axis("off")
-        txt = self._sel_summary_text(lp["cams"], lp["lens"])
-        ax2.text(0.02, 0.98, "Selection summary", fontsize=11, weight="bold", va="top")
-        ax2.text(0.02, 0.92, txt, fontsize=10, va="top", wrap=True)
-        fig.savefig(path, dpi=dpi)
+        with profiling.span("plot.save_composite"):
+            Path(path).write_bytes(self._composites.png(self._last_plot, dpi))
+
+    def _autosave(self, out, dpi):
+        """自动保存：与上次写出的内容相同则跳过；否则交给后台线程渲染（缓存命中时不渲染）并原子替换文件"""
+        key = (os.fspath(out), composite_key(self._last_plot, dpi))
+        if key == self._autosave_key and out.exists():
+            profiling.count("plot.autosave_skipped")
+            return
+        self._autosave_key = key
+        self._autosave_pool.submit(self._write_autosave, out, self._last_plot, dpi, key)
 
-    def update_plot(self):
-        if not self.data:
+    def _write_autosave(self, out, plot, dpi, key):
+        """后台线程；排队期间又有更新的图时直接放弃，只写最新的一张"""
+        if key != self._autosave_key:
             return
-        dpi = int(self.spn_dpi.value())
-        self.canvas.fig.set_dpi(dpi)
-
-        mode_idx = self.cmb_analysis.currentIndex()  # 0等效 1物理 2快门 3ISO
-        keep_cams = [i.text() for i in self.lst_camera.selectedItems()]
-        keep_lens = [i.text() for i in self.lst_lens.selectedItems()]
-        keep_cams_set = set(keep_cams); keep_lens_set = set(keep_lens)
-        bin_w = float(self.spn_bin.value())
-        crop_override = self.read_crop_table()
-
-        # 过滤 + 合理性筛选
-        use_sanity = self.chk_sanity.isChecked()
-        tol_pct = float(self.spn_tol_pct.value())
-        tol_abs = float(self.spn_tol_abs.value())
-
-        filt = []
-        removed_by_sanity = 0
-        for d in self.data:
-            if keep_cams_set and d.get("model") and d["model"] not in keep_cams_set:
-                continue
-            if keep_lens_set and d.get("lens") and d["lens"] not in keep_lens_set:
-                continue
-            if use_sanity:
-                if not in_physical_range(d.get("focal_mm"), d.get("lens"),
-                                         tol_percent=tol_pct, tol_abs_mm=tol_abs):
-                    removed_by_sanity += 1
-                    continue
-            filt.append(d)
+        try:
+            with profiling.span("plot.autosave"):
+                data = self._composites.png(plot, dpi, key[1])
+                tmp = out.with_name(out.name + ".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, out)
+        except OSError as e:
+            self._autosave_key = None
+            self._autosaved.emit(f"自动保存失败：{e}")
+            return
+        self._autosaved.emit(f"已保存 → {out.name}")
+
+    def _on_autosaved(self, msg):
+        self.lbl_status.setText(f"状态：{msg}")
+
+    # ---------- 性能统计 ----------
+    def on_stats_toggled(self, on):
+        self.stats_body.setVisible(on)
+        if on:
+            profiling.enable()
+            self._refresh_stats()
+            self._stats_timer.start()
+        else:
+            self._stats_timer.stop()
+            profiling.disable()
 
-        self.sel_label.setText(self._sel_summary_text(keep_cams, keep_lens))
+    def on_stats_reset(self):
+        if profiling.enabled():
+            profiling.enable()
+            self._refresh_stats()
+
+    def on_stats_trace(self):
+        prof = profiling.active()
+        if prof is None:
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "导出 Chrome trace", "trace.json", "JSON (*.json)")
+        if path:
+            prof.write_trace(path)
+            self.lbl_status.setText("状态：已导出 trace → " + Path(path).name)
+
+    def _refresh_stats(self):
+        prof = profiling.active()
+        self.txt_stats.setPlainText(prof.format_summary() if prof else "")
+
+    def _cube(self, mode_idx, bin_w, crop_override, use_sanity, tol_pct, tol_abs, by_month=False):
+        """当前分析模式的直方图立方体；数据、箱宽、合理性容差或裁切表变化时全部失效重算。
+        by_month：需要按拍摄时间查询，缓存的立方体没有时间索引时重建一个带索引的"""
+        ds = self.data
+        params = (ds, ds.version, bin_w, use_sanity, tol_pct, tol_abs, tuple(sorted(crop_override.items())))
+        if params != self._cube_params:
+            self._cube_params = params
+            self._cubes = {}
+            self._sketches = {}
+        cube = self._cubes.get(mode_idx)
+        if cube is None or (by_month and cube.month_start is None and isinstance(ds, PhotoDataset)):
+            sanity = (tol_pct, tol_abs) if use_sanity else None
+            cube = self._cubes[mode_idx] = build_cube(ds, mode_idx, bin_w, crop_override, sanity, by_month)
+        return cube
+
+    def _sketch(self, mode_idx, months, crop_override, use_sanity, tol_pct, tol_abs):
+        """当前分析模式的分位数草图（与 _cube 同时失效）；拍摄时间区间变了才重算，只留最近一个区间"""
+        hit = self._sketches.get(mode_idx)
+        if hit is None or hit[0] != months:
+            sanity = (tol_pct, tol_abs) if use_sanity else None
+            hit = self._sketches[mode_idx] = (months, build_cube(self.data, mode_idx, 1.0, crop_override, sanity,
+                                                                 sketch=True, months=months))
+        return hit[1]
+
+    def _collect_plot_params(self):
+        """GUI 线程：读取当前控件状态"""
+        return dict(
+            mode_idx=self.cmb_analysis.currentIndex(),   # 0等效 1物理 2快门 3ISO
+            cam_names=self.lst_camera.model.names, cam_bits=self.lst_camera.model.selected.copy(),
+            lens_names=self.lst_lens.model.names, lens_bits=self.lst_lens.model.selected.copy(),
+            bin_w=float(self.spn_bin.value()),
+            crop_override=self.read_crop_table(),
+            use_sanity=self.chk_sanity.isChecked(),
+            tol_pct=float(self.spn_tol_pct.value()),
+            tol_abs=float(self.spn_tol_abs.value()),
+            dpi=int(self.spn_dpi.value()),
+            months=self.period(),
+        )
+
+    def _compute_plot(self, p):
+        """后台线程：筛选 + 分箱，返回画图所需的一切（不碰任何控件）"""
+        if not len(self.data):   # 如监视中照片全被删除：照样出图，显示 No data
+            return dict(cams=[], lens=[], period=None, quantiles=None, n_filt=0, dpi=p["dpi"])
+        mode_idx = p["mode_idx"]
+        bin_w = p["bin_w"]
+        keep_cams = sorted(n for n, on in zip(p["cam_names"], p["cam_bits"]) if on)
+        keep_lens = sorted(n for n, on in zip(p["lens_names"], p["lens_bits"]) if on)
+
+        # 过滤：只需把选中的 (机身, 镜头) 组合的预分箱直方图相加
+        # 拍摄时间：按月累计索引，两行相减
+        months, period = p["months"], None
+        with self._data_lock:
+            with profiling.span("plot.aggregate", mode=mode_idx):
+                cube = self._cube(mode_idx, bin_w, p["crop_override"], p["use_sanity"], p["tol_pct"], p["tol_abs"],
+                                  by_month=months is not None)
+            if cube.month_start is None:
+                months = None     # 数据已变（如换成摘要），滑块还没来得及更新
+            with profiling.span("plot.query"):
+                if p["cam_names"] == self.data.models and p["lens_names"] == self.data.lenses:
+                    sel = self.data.pair_selection_bits(p["cam_bits"], p["lens_bits"])
+                else:   # 列表还没跟上数据（读取中名称表又变了），按名称选
+                    sel = self.data.pair_selection(set(keep_cams), set(keep_lens))
+                xs, ys, n_filt = cube.query(sel, months)
+            if months is not None:
+                months = cube.month_span(months)
+                period = f"{month_label(months[0])} ~ {month_label(months[1])}"
+            # 分位数：选中组合的草图相加
+            with profiling.span("plot.quantiles"):
+                sketch = self._sketch(mode_idx, months, p["crop_override"], p["use_sanity"], p["tol_pct"], p["tol_abs"])
+                quantiles = format_quantiles(mode_idx, cube_quantiles(sketch, sel))
+
+        plot = dict(cams=keep_cams, lens=keep_lens, period=period, quantiles=quantiles, n_filt=n_filt, dpi=p["dpi"])
+        if not n_filt:
+            return plot
+
+        plot.update(plot_spec(mode_idx, xs, ys, bin_w))
+        return plot
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.canvas is None:
+            QTimer.singleShot(0, self._ensure_canvas)
+
+    def _ensure_canvas(self):
+        """首次需要时导入 matplotlib 并创建画布"""
+        if self.canvas is None:
+            with profiling.span("ui.canvas_init"):
+                from plot_canvas import MplCanvas
+                self.canvas = MplCanvas(self.canvas_slot)
+            self.canvas_slot.layout().addWidget(self.canvas)
+        return self.canvas
+
+    def _apply_plot(self, plot):
+        """GUI 线程：把计算结果画到画布上"""
+        if plot is None:
+            return
+        self._ensure_canvas()
+        self.canvas.fig.set_dpi(plot["dpi"])
+        self.sel_label.setText(self._sel_summary_text(plot["cams"], plot["lens"], plot["period"], plot["quantiles"]))
 
-        if not filt:
+        if self._cancelled:
+            prefix = "已取消读取，"
+        else:
+            prefix = "监视中，" if self._worker is not None and not self._reading else ""
+        if not plot["n_filt"]:
             self.canvas.plot_bar([], [], "No data", "", numeric=False)
-            self.lbl_status.setText("状态：筛选后无数据")
+            if len(self.data):
+                self.lbl_status.setText("状态：筛选后无数据")
+            elif not self._reading:   # 读取中状态栏显示进度
+                self.lbl_status.setText(f"状态：{prefix}没有照片")
             return
 
-        if mode_idx == 0:  # 35mm等效
-            def focal35_with_override(x):
-                mm = x.get("focal_mm"); model = x.get("model")
-                if mm is None: return None
-                if model in crop_override:
-                    return float(mm) * float(crop_override[model])
-                f35, _ = estimate_35mm(mm, model, x.get("focal_35mm"))
-                return f35
-            vals = [focal35_with_override(x) for x in filt if focal35_with_override(x) is not None]
-            dist = histogram(vals, bin_width=bin_w, mode="focal")
-            xs = list(dist.keys()); ys = list(dist.values())
-            title = f"Focal length (35mm eq) | bin={bin_w:g}"
-            xlabel = "Focal (mm, 35mm eq)"
-            self.canvas.plot_bar(xs, ys, title, xlabel, numeric=True, bar_width=bin_w*0.9)
-            self._last_plot = dict(xs=xs, ys=ys, title=title, xlabel=xlabel,
-                                   numeric=True, bar_width=bin_w*0.9, cams=keep_cams, lens=keep_lens)
-
-        elif mode_idx == 1:  # 物理
-            vals = [x["focal_mm"] for x in filt if x.get("focal_mm") is not None]
-            dist = histogram(vals, bin_width=bin_w, mode="focal")
-            xs = list(dist.keys()); ys = list(dist.values())
-            title = f"Focal length (physical) | bin={bin_w:g}"
-            xlabel = "Focal (mm)"
-            self.canvas.plot_bar(xs, ys, title, xlabel, numeric=True, bar_width=bin_w*0.9)
-            self._last_plot = dict(xs=xs, ys=ys, title=title, xlabel=xlabel,
-                                   numeric=True, bar_width=bin_w*0.9, cams=keep_cams, lens=keep_lens)
-
-        elif mode_idx == 2:  # 快门（EV）
-            vals = [x["shutter_stops"] for x in filt if x.get("shutter_stops") is not None]
-            dist = histogram(vals, bin_width=max(0.01, bin_w), mode="shutter")
-            xs_ev = list(dist.keys()); ys = list(dist.values())
-            labels = []
-            for ev in xs_ev:
-                sec = 1.0 / (2 ** ev)
-                if sec >= 1:
-                    labels.append(f"{int(round(sec))}s")
-                else:
-                    denom = int(round(1/sec)); labels.append(f"1/{denom}")
-            title = f"Shutter speed (grouped by {bin_w:g} EV)"
-            xlabel = "Shutter"
-            self.canvas.plot_bar(labels, ys, title, xlabel, numeric=False)
-            self._last_plot = dict(xs=labels, ys=ys, title=title, xlabel=xlabel,
-                                   numeric=False, bar_width=None, cams=keep_cams, lens=keep_lens)
+        with profiling.span("plot.draw"):
+            self.canvas.plot_bar(plot["xs"], plot["ys"], plot["title"], plot["xlabel"],
+                                 numeric=plot["numeric"], bar_width=plot["bar_width"])
+        self._last_plot = plot
 
-        else:  # ISO
-            vals = [x["iso"] for x in filt if x.get("iso") is not None]
-            dist = histogram(vals, bin_width=max(10.0, bin_w), mode="iso")
-            xs = list(dist.keys()); ys = list(dist.values())
-            self.canvas.plot_bar(xs, ys,
-                                 f"ISO distribution | bin={max(10.0, bin_w):g}",
-                                 "ISO",
-                                 numeric=True, bar_width=max(10.0, bin_w)*0.9)
-            self._last_plot = dict(xs=xs, ys=ys, title=f"ISO distribution | bin={max(10.0, bin_w):g}",
-                                   xlabel="ISO", numeric=True, bar_width=max(10.0, bin_w)*0.9,
-                                   cams=keep_cams, lens=keep_lens)
-
-        # 状态
-        if self.chk_autosave.isChecked() and self._last_plot:
-            out = Path.cwd() / "hist.png"
-            self._save_composite(out, dpi=int(self.spn_dpi.value()))
-            self.lbl_status.setText(f"状态：已保存 → hist.png")
-        else:
-            self.lbl_status.setText(f"状态：已更新（{len(filt)} 条）")
+        # 状态；自动保存在后台写完后再报告
+        self.lbl_status.setText(f"状态：{prefix}已更新（{plot['n_filt']} 条）")
+        if self.chk_autosave.isChecked() and self._last_plot and not self._reading:
+            self._autosave(Path.cwd() / "hist.png", int(self.spn_dpi.value()))
+
+    def update_plot(self):
+        """同步刷新（绕过调度器）"""
+        self._apply_plot(self._compute_plot(self._collect_plot_params()))
+
+    def closeEvent(self, event):
+        if self._worker is not None:
+            self._worker.stop()      # 读取中也会在当前批结束时停下，进度留待下次继续
+            self._thread.quit()
+            self._thread.wait()
+        self.scheduler.shutdown()
+        self._autosave_pool.shutdown(wait=True)   # 写到一半的 hist.png 写完再退出
+        super().closeEvent(event)
 
 
 if __name__ == "__main__":
+    skip_main_in_workers()
     app = QApplication(sys.argv)
     w = MainWindow()
     w.show()
@@ -0,0 +1,85 @@
+from PySide6.QtWidgets import QSizePolicy
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
+
+# ---------------------------
+# 界面里的 Matplotlib 画布；单独成模块，主窗口显示出来之后才导入（matplotlib 导入要零点几秒）
+# 分箱布局（横轴取值、箱宽、标题）不变时只改已有柱子的高度，不重建坐标轴；
+# 纵轴上限取到刻度整数倍，高度变化不超出时连坐标轴也不重画，只把柱子 blit 到缓存的背景上
+# ---------------------------
+
+
+class MplCanvas(FigureCanvas):
+    def __init__(self, parent=None):
+        self.fig = Figure(figsize=(6, 4), dpi=100, constrained_layout=True)
+        self.ax = self.fig.add_subplot(111)
+        super().__init__(self.fig)
+        self.setParent(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self._layout = None       # 当前柱子对应的 (numeric, xs, bar_width, title, xlabel)
+        self._bars = []
+        self._background = None   # 不含柱子的画面（blit 用），每次完整重画后更新
+        self._background_dpi = None
+        self.mpl_connect("draw_event", self._on_draw)
+        self.stats = {"rebuild": 0, "update": 0, "blit": 0}   # 各种刷新方式的次数
+
+    def _on_draw(self, event):
+        """完整重画之后：柱子是 animated 的不会被画上，先存下背景再补画柱子"""
+        self._background = self.copy_from_bbox(self.ax.bbox)
+        self._background_dpi = self.fig.dpi
+        for bar in self._bars:
+            self.ax.draw_artist(bar)
+
+    def _ylim_top(self, counts):
+        """纵轴上限：最高柱 + 5% 留白，向上取到刻度的整数倍（高度小幅变化时上限不变，可以 blit）"""
+        need = max(counts, default=0) * 1.05 or 1.0
+        ticks = self.ax.yaxis.get_major_locator().tick_values(0, need)
+        return next((float(t) for t in ticks if t >= need), need)
+
+    def plot_bar(self, xs, counts, title, xlabel, *, numeric=False, bar_width=None):
+        if numeric and bar_width is None:
+            bar_width = 0.8
+        layout = (numeric, tuple(xs), bar_width, title, xlabel)
+        if layout == self._layout and self._bars and len(counts) == len(self._bars):
+            self._update_bars(counts)
+            return
+        self._rebuild(xs, counts, title, xlabel, numeric, bar_width)
+        self._layout = layout if xs else None
+
+    def _update_bars(self, counts):
+        for bar, c in zip(self._bars, counts):
+            bar.set_height(c)
+        top = self._ylim_top(counts)
+        if top != self.ax.get_ylim()[1] or self._background is None or self._background_dpi != self.fig.dpi:
+            self.stats["update"] += 1
+            self.ax.set_ylim(0, top)
+            self.draw_idle()
+            return
+        self.stats["blit"] += 1
+        self.restore_region(self._background)
+        for bar in self._bars:
+            self.ax.draw_artist(bar)
+        self.blit(self.ax.bbox)
+
+    def _rebuild(self, xs, counts, title, xlabel, numeric, bar_width):
+        self.stats["rebuild"] += 1
+        self.ax.clear()
+        self._bars = []
+        if numeric:
+            if not xs:
+                self.ax.set_title("No data"); self.draw(); return
+            self._bars = list(self.ax.bar(xs, counts, width=bar_width, align='center', animated=True))
+            xmin = min(xs) - bar_width * 0.55
+            xmax = max(xs) + bar_width * 0.55
+            self.ax.set_xlim(xmin, xmax)
+        else:
+            pos = list(range(len(xs)))
+            self._bars = list(self.ax.bar(pos, counts, width=0.8, align='center', animated=True))
+            self.ax.set_xticks(pos)
+            self.ax.set_xticklabels(xs, rotation=45)
+        self.ax.set_title(title, fontweight="bold")
+        self.ax.set_xlabel(xlabel)
+        self.ax.set_ylabel("Count")
+        self.ax.margins(x=0.02)
+        self.ax.set_ylim(0, self._ylim_top(counts))
+        self.draw()
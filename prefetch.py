@@ -0,0 +1,45 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from exif_native import HEAD_BYTES
+
+# ---------------------------
+# 文件头预读：网络盘（SMB/NFS）上每次打开/读取都要等一个往返，解析是被延迟卡住的而不是被 CPU。
+# 用一组线程同时发出多个有界的头部读取（只读前 head 字节，EXIF 都在这里），
+# 按输入顺序交给解析阶段；在途的 + 读完待取的合计不超过 depth 个，内存上限约 depth × head
+# ---------------------------
+PREFETCH_DEPTH = 32   # 网络盘上的建议值；本地盘预读没有收益
+
+
+def read_head(path, head=HEAD_BYTES):
+    """读文件头：返回 (数据, 是否为完整文件)；读不了时返回 None（解析时照常从路径读，出错处理不变）"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(head)
+            return data, len(data) < head or os.fstat(f.fileno()).st_size <= head
+    except OSError:
+        return None
+
+
+def prefetch_heads(paths, depth=PREFETCH_DEPTH, head=HEAD_BYTES):
+    """按输入顺序产出 (path, 头部)，头部见 read_head；后台 depth 个线程并发预读，
+    取走一个才补读下一个（有界队列）。消费方提前停下时丢弃还没开始的读取"""
+    depth = max(1, int(depth))
+    it = iter(paths)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=depth, thread_name_prefix="prefetch") as pool:
+        try:
+            for p in it:
+                pending.append((p, pool.submit(read_head, p, head)))
+                if len(pending) >= depth:
+                    break
+            while pending:
+                p, fut = pending.popleft()
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending.append((nxt, pool.submit(read_head, nxt, head)))
+                yield p, fut.result()
+        finally:
+            for _, fut in pending:
+                fut.cancel()
@@ -0,0 +1,148 @@
+import json, os, threading, time
+from collections import defaultdict
+
+# ---------------------------
+# 轻量性能埋点：命名区间（span）+ 计数器，命令行 --profile 写出 Chrome trace，界面显示统计面板
+# 未启用时 span() 返回共享的空上下文、count() 直接返回，开销只是一次函数调用；
+# 埋点放在批/阶段级别，不在逐文件的热循环里
+# ---------------------------
+_active = None   # 当前的 Profiler；None 表示未启用
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("prof", "name", "args", "t0")
+
+    def __init__(self, prof, name, args):
+        self.prof, self.name, self.args = prof, name, args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof._add(self.name, self.t0, time.perf_counter_ns() - self.t0, self.args)
+        return False
+
+
+class Profiler:
+    """收集区间与计数器；线程安全（区间记录所在线程）"""
+
+    def __init__(self, max_events=1_000_000):
+        self.max_events = max_events
+        self.events = []                 # (名称, 开始 ns, 时长 ns, 线程号, 参数)
+        self.counters = defaultdict(int)
+        self.totals = defaultdict(lambda: [0, 0])   # 名称 -> [次数, 总时长 ns]，事件满了也继续累计
+        self.t_origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def _add(self, name, t0, dur, args):
+        with self._lock:
+            tot = self.totals[name]
+            tot[0] += 1
+            tot[1] += dur
+            if len(self.events) < self.max_events:
+                self.events.append((name, t0, dur, threading.get_ident(), args))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def summary(self):
+        """{"spans": {名称: {count, total_s, mean_ms}}, "counters": {...}}，附常用的派生指标"""
+        with self._lock:
+            spans = {k: {"count": c, "total_s": round(t / 1e9, 6), "mean_ms": round(t / c / 1e6, 3)}
+                     for k, (c, t) in sorted(self.totals.items())}
+            counters = dict(sorted(self.counters.items()))
+        parsed = counters.get("files.parsed", 0)
+        extract_s = sum(v["total_s"] for k, v in spans.items() if k.startswith("extract."))
+        derived = {}
+        if parsed and extract_s:
+            derived["parse_files_per_sec"] = round(parsed / extract_s, 1)
+        if parsed:
+            derived["fallback_rate"] = round(counters.get("files.fallback", 0) / parsed, 4)
+        return {"spans": spans, "counters": counters, "derived": derived}
+
+    def format_summary(self):
+        s = self.summary()
+        lines = [f"{'阶段':<24}{'次数':>8}{'总耗时 s':>12}{'平均 ms':>10}"]
+        for k, v in s["spans"].items():
+            lines.append(f"{k:<26}{v['count']:>8}{v['total_s']:>12.3f}{v['mean_ms']:>10.2f}")
+        if s["counters"]:
+            lines.append("")
+            lines += [f"{k:<26}{v:>12}" for k, v in s["counters"].items()]
+        if s["derived"]:
+            lines.append("")
+            lines += [f"{k:<26}{v:>12}" for k, v in s["derived"].items()]
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """Chrome trace（chrome://tracing、Perfetto 可直接打开）；汇总放在 otherData 里"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        trace = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                  "ts": (t0 - self.t_origin) / 1000.0, "dur": dur / 1000.0, **({"args": args} if args else {})}
+                 for name, t0, dur, tid, args in events]
+        doc = {"traceEvents": trace, "displayTimeUnit": "ms", "otherData": self.summary()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False)
+
+
+def enable(profiler=None):
+    """启用埋点，返回 Profiler"""
+    global _active
+    _active = profiler or Profiler()
+    return _active
+
+
+def disable():
+    global _active
+    prof, _active = _active, None
+    return prof
+
+
+def active():
+    return _active
+
+
+def enabled():
+    return _active is not None
+
+
+def span(name, **args):
+    """with span("阶段名"): ...；未启用时几乎无开销"""
+    prof = _active
+    if prof is None:
+        return _NULL
+    return _Span(prof, name, args or None)
+
+
+def timed(name, it):
+    """逐项计时地迭代 it：每个区间只含取下一项的耗时，不含调用方处理该项的时间"""
+    it = iter(it)
+    end = object()
+    while True:
+        with span(name):
+            item = next(it, end)
+        if item is end:
+            return
+        yield item
+
+
+def count(name, n=1):
+    prof = _active
+    if prof is not None:
+        prof.count(name, n)
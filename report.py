@@ -0,0 +1,243 @@
+import io, json, os, re, threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+
+import profiling
+from dataset import QUANTILES, HistogramCube, sketch_keys, sketch_quantiles
+from summary import PhotoSummary
+
+# ---------------------------
+# 图表与批量报告：界面与命令行共用同一套取值 / 分箱 / 复合图绘制
+# 报告模式一次聚合（每种分析一个 HistogramCube），再按机身、镜头归并出各自的直方图，
+# 渲染分发到进程池；只用 Agg（Figure 直接 savefig），不导入 pyplot / Qt
+# ---------------------------
+MODES = ("focal35", "focal", "shutter", "iso")      # 分析模式编号 0~3 对应的文件名
+REPORT_BINS = (5.0, 5.0, 1.0, 100.0)                 # 报告默认箱宽：mm, mm, EV, ISO
+PARALLEL_MIN_CHARTS = 16   # 图太少时进程启动开销大于收益，直接串行
+COMPOSITE_CACHE_SIZE = 16  # 界面里缓存的复合图 PNG 张数
+
+
+def mode_values(ds, mode_idx, bin_w, overrides=None):
+    """分析模式对应的 (每行取值, 实际箱宽)；0 等效焦距 1 物理焦距 2 快门 EV 3 ISO"""
+    if mode_idx == 0:
+        vals = ds.focal35(overrides)
+        return np.where(np.isnan(ds.focal_mm), np.nan, vals), bin_w  # 没有物理焦距的照片不计入
+    if mode_idx == 1:
+        return ds.focal_mm, bin_w
+    if mode_idx == 2:
+        return ds.shutter_stops, max(0.01, bin_w)
+    return ds.iso, max(10.0, bin_w)
+
+
+def build_cube(ds, mode_idx, bin_w, overrides=None, sanity=None, by_month=False, sketch=False, months=None):
+    """数据集或摘要（PhotoSummary）当前分析模式的直方图立方体；sanity 为 (容差 %, 容差 mm) 或 None；
+    by_month 时另建按拍摄月份的累计索引（摘要没有拍摄时间，忽略）。
+    sketch=True 时改为分位数草图（见 dataset.sketch_keys，快门按秒统计），months 为 (首月, 末月) 时只计该区间"""
+    if isinstance(ds, PhotoSummary):
+        return ds.cube(mode_idx, bin_w, overrides, sanity, sketch=sketch)
+    keep = ds.sanity_mask(*sanity) if sanity is not None else None
+    if months is not None:
+        keep = ds.month_mask(*months) if keep is None else keep & ds.month_mask(*months)
+    vals, bw = mode_values(ds, mode_idx, bin_w, overrides)
+    if sketch:
+        vals, bw = sketch_keys(2.0 ** -vals if mode_idx == 2 else vals), 1.0
+    return HistogramCube(ds, vals, bw, keep, by_month=by_month)
+
+
+def format_quantiles(mode_idx, qv, qs=QUANTILES):
+    """分位数（sketch_quantiles 的一行）-> 'p10 24 mm · median 35 mm · p90 105 mm'；快门按秒给出"""
+    def fmt(v):
+        if mode_idx == 2:
+            return _shutter_label(np.log2(1.0 / v))
+        return f"{v:.0f} mm" if mode_idx in (0, 1) else f"ISO {v:.0f}"
+    names = {0.5: "median"}
+    return " · ".join(f"{names.get(q, f'p{q * 100:g}')} {fmt(v)}" for q, v in zip(qs, qv) if np.isfinite(v))
+
+
+def cube_quantiles(cube, pair_mask=None, qs=QUANTILES):
+    """草图立方体（sketch=True）中选中组合合并后的分位数"""
+    counts = cube.counts.sum(axis=0) if pair_mask is None else cube.counts[pair_mask].sum(axis=0)
+    return sketch_quantiles(cube.xs, counts, qs)[0]
+
+
+def _shutter_label(ev):
+    sec = 1.0 / (2 ** ev)
+    if sec >= 1:
+        return f"{int(round(sec))}s"
+    return f"1/{int(round(1/sec))}"
+
+
+def plot_spec(mode_idx, xs, ys, bin_w):
+    """直方图的绘制参数（xs/ys/title/xlabel/numeric/bar_width）"""
+    if mode_idx == 0:  # 35mm等效
+        return dict(xs=xs, ys=ys, title=f"Focal length (35mm eq) | bin={bin_w:g}",
+                    xlabel="Focal (mm, 35mm eq)", numeric=True, bar_width=bin_w*0.9)
+    if mode_idx == 1:  # 物理
+        return dict(xs=xs, ys=ys, title=f"Focal length (physical) | bin={bin_w:g}",
+                    xlabel="Focal (mm)", numeric=True, bar_width=bin_w*0.9)
+    if mode_idx == 2:  # 快门（EV）
+        return dict(xs=[_shutter_label(ev) for ev in xs], ys=ys,
+                    title=f"Shutter speed (grouped by {bin_w:g} EV)",
+                    xlabel="Shutter", numeric=False, bar_width=None)
+    # ISO
+    return dict(xs=xs, ys=ys, title=f"ISO distribution | bin={max(10.0, bin_w):g}",
+                xlabel="ISO", numeric=True, bar_width=max(10.0, bin_w)*0.9)
+
+
+def selection_summary_text(cams, lens, period=None, quantiles=None):
+    def summarise(items, n=30):
+        if not items:
+            return "(none)"
+        if len(items) <= n:
+            return ", ".join(items)
+        return ", ".join(items[:n]) + f" … (total {len(items)})"
+    text = f"Camera: {summarise(cams)}\n\nLens: {summarise(lens)}"
+    if period:
+        text += f"\n\nTaken: {period}"
+    if quantiles:
+        text += f"\n\nQuantiles: {quantiles}"
+    return text
+
+
+def render_composite(lp, path, dpi=150):
+    """复合图：左侧直方图 + 右侧相机/镜头清单；lp 为 plot_spec() 的结果再加 cams / lens。
+    path 也可以是文件对象（如 BytesIO）"""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(8, 4.5), dpi=dpi, constrained_layout=True)
+    gs = fig.add_gridspec(ncols=2, nrows=1, width_ratios=[3.0, 1.3])
+    ax = fig.add_subplot(gs[0, 0])
+    ax2 = fig.add_subplot(gs[0, 1])
+    if lp["numeric"]:
+        xs = lp["xs"]; ys = lp["ys"]; bw = lp["bar_width"]
+        ax.bar(xs, ys, width=bw, align='center')
+        ax.set_xlim(min(xs)-bw*0.55, max(xs)+bw*0.55)
+    else:
+        pos = list(range(len(lp["xs"])))
+        ax.bar(pos, lp["ys"], width=0.8, align='center')
+        ax.set_xticks(pos); ax.set_xticklabels(lp["xs"], rotation=45)
+    ax.set_title(lp["title"], fontweight="bold")
+    ax.set_xlabel(lp["xlabel"]); ax.set_ylabel("Count"); ax.margins(x=0.02, y=0.05)
+    ax2.axis("off")
+    txt = selection_summary_text(lp["cams"], lp["lens"], lp.get("period"), lp.get("quantiles"))
+    ax2.text(0.02, 0.98, "Selection summary", fontsize=11, weight="bold", va="top")
+    ax2.text(0.02, 0.92, txt, fontsize=10, va="top", wrap=True)
+    fig.savefig(path, dpi=dpi, format="png")
+
+
+def composite_key(lp, dpi):
+    """复合图内容的键：画出来的东西（取值、计数、标题、清单、拍摄时间、分位数）+ DPI 相同，PNG 就相同"""
+    return (tuple(lp["xs"]), tuple(lp["ys"]), lp["title"], lp["xlabel"], lp["numeric"], lp["bar_width"],
+            tuple(lp["cams"]), tuple(lp["lens"]), lp.get("period"), lp.get("quantiles"), dpi)
+
+
+class CompositeCache:
+    """复合图 PNG 的 LRU 缓存（按 composite_key）：切回看过的筛选、反复保存同一张图时不再渲染；线程安全"""
+
+    def __init__(self, maxsize=COMPOSITE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def png(self, lp, dpi=150, key=None):
+        """复合图的 PNG 字节"""
+        key = key or composite_key(lp, dpi)
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+        buf = io.BytesIO()
+        render_composite(lp, buf, dpi=dpi)
+        data = buf.getvalue()
+        with self._lock:
+            self._items[key] = data
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return data
+
+
+# ---------- 批量报告 ----------
+def _safe_name(name, used):
+    base = re.sub(r"[^\w.-]+", "_", name).strip("._") or "unnamed"
+    out, i = base, 2
+    while out.lower() in used:
+        out, i = f"{base}_{i}", i + 1
+    used.add(out.lower())
+    return out
+
+
+def report_charts(ds, bins=REPORT_BINS, overrides=None, keep=None):
+    """一次聚合出全部图表：[(相对路径, 绘图参数)]；overall/、camera/<机身>/、lens/<镜头>/ 下各 4 张"""
+    _, pm, pl = ds.pairs()
+    names = {"camera": (ds.models, pm), "lens": (ds.lenses, pl)}
+    # 各组（机身 / 镜头）包含的另一维名称，写进复合图右侧清单
+    members = {"camera": [sorted({ds.lenses[l] for l in pl[pm == c] if l >= 0}) for c in range(len(ds.models))],
+               "lens": [sorted({ds.models[m] for m in pm[pl == c] if m >= 0}) for c in range(len(ds.lenses))]}
+    dirs = {}
+    for kind, (table, _) in names.items():
+        used = set()   # 同一目录下去重（按大小写不敏感比较，兼容 Windows/macOS）
+        dirs[kind] = [_safe_name(n, used) for n in table]
+
+    charts = []
+    for mode_idx, mode in enumerate(MODES):
+        vals, bw = mode_values(ds, mode_idx, bins[mode_idx], overrides)
+        cube = HistogramCube(ds, vals, bw, keep)
+        xs = cube.xs
+        total = cube.counts.sum(axis=0)
+        nz = np.nonzero(total)[0]
+        if len(nz):
+            spec = plot_spec(mode_idx, xs[nz].tolist(), total[nz].tolist(), bw)
+            spec.update(cams=sorted(ds.models), lens=sorted(ds.lenses), photos=int(cube.rows.sum()))
+            charts.append((f"overall/{mode}.png", spec))
+        for kind, (table, group) in names.items():
+            counts, rows = cube.group_counts(group, len(table))
+            for code, name in enumerate(table):
+                nz = np.nonzero(counts[code])[0]
+                if not len(nz):
+                    continue
+                spec = plot_spec(mode_idx, xs[nz].tolist(), counts[code][nz].tolist(), bw)
+                if kind == "camera":
+                    spec.update(cams=[name], lens=members[kind][code])
+                else:
+                    spec.update(cams=members[kind][code], lens=[name])
+                spec["photos"] = int(rows[code])
+                charts.append((f"{kind}/{dirs[kind][code]}/{mode}.png", spec))
+    return charts
+
+
+def _render_job(job):
+    path, spec, dpi = job
+    render_composite(spec, path, dpi=dpi)
+    return path
+
+
+def write_report(ds, out_dir, jobs=1, dpi=150, bins=REPORT_BINS, overrides=None, keep=None):
+    """渲染全部图表到 out_dir，并写出 index.json（图表清单）；返回图表数"""
+    out_dir = os.fspath(out_dir)
+    with profiling.span("report.aggregate"):
+        charts = report_charts(ds, bins=bins, overrides=overrides, keep=keep)
+    work = []
+    for rel, spec in charts:
+        path = os.path.join(out_dir, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        work.append((path, spec, dpi))
+    with profiling.span("report.render", charts=len(work)):
+        if jobs <= 1 or len(work) < PARALLEL_MIN_CHARTS:
+            for job in work:
+                _render_job(job)
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as ex:
+                chunksize = max(1, min(16, len(work) // (jobs * 4)))
+                for _ in ex.map(_render_job, work, chunksize=chunksize):
+                    pass
+    index = [dict(file=rel, title=spec["title"], photos=spec["photos"], cameras=spec["cams"], lenses=spec["lens"])
+             for rel, spec in charts]
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    return len(charts)
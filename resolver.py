@@ -0,0 +1,155 @@
+import re
+
+# ---------------------------
+# 裁切系数（机身型号关键字 -> 系数），可自行扩充
+# 按“最长匹配”生效：具体型号写长键，系列通配写短键（如 "ZV-E10" 优先于 "ZV-E1"）；大小写不敏感
+# ---------------------------
+CROP_MAP = {
+    # Sony Full Frame
+    "ILCE-7": 1.0, "ILCE-7C": 1.0, "ILCE-7CM2": 1.0, "ILCE-7M4": 1.0, "ILCE-9": 1.0, "ILCE-1": 1.0,
+    "ZV-E1": 1.0,
+    # Sony APS-C
+    "ILCE-6": 1.5,
+    "ILCE-6000": 1.5, "ILCE-6100": 1.5, "ILCE-6300": 1.5, "ILCE-6400": 1.5, "ILCE-6500": 1.5, "ZV-E10": 1.5,
+    # FUJIFILM APS-C
+    "X-T": 1.5, "X-S": 1.5, "X-H": 1.5, "X-E": 1.5,
+    "X-T50": 1.5, "X-T30": 1.5, "X-S10": 1.5, "X-H2": 1.5, "X-T5": 1.5, "X-E4": 1.5,
+    # Canon RF APS-C
+    "EOS R50": 1.6, "EOS R10": 1.6, "EOS R7": 1.6,
+    # Micro Four Thirds
+    "OM-": 2.0, "E-M1": 2.0, "E-M5": 2.0, "DC-G9": 2.0, "DMC-GX": 2.0, "DC-GH": 2.0,
+    "DMC-G": 2.0, "DC-G": 2.0,
+    # L-Mount Full Frame (示例)
+    "DC-S5": 1.0,
+}
+
+_END = None   # 前缀树中标记“到此为一个完整关键字”的键
+
+
+class CropResolver:
+    """机身型号 -> 裁切系数。关键字预编译成前缀树，一次扫描取最长匹配（同长取最靠左），
+    结果与 CROP_MAP 的书写顺序无关；每个型号字符串只解析一次。
+    overrides 为 {机身名: 系数}，按完整型号名精确匹配，优先于关键字"""
+
+    def __init__(self, table=None, overrides=None):
+        self.overrides = dict(overrides or {})
+        self._trie = {}
+        for key, cf in (CROP_MAP if table is None else table).items():
+            node = self._trie
+            for ch in key.upper():
+                node = node.setdefault(ch, {})
+            node[_END] = float(cf)
+        self._memo = {}
+
+    def with_overrides(self, overrides):
+        """共享前缀树与解析缓存、只换覆盖表的副本"""
+        r = CropResolver.__new__(CropResolver)
+        r._trie, r._memo = self._trie, self._memo
+        r.overrides = dict(overrides or {})
+        return r
+
+    def _match(self, s):
+        best, best_len = None, 0
+        for i in range(len(s)):
+            node, j = self._trie, i
+            while j < len(s):
+                node = node.get(s[j])
+                if node is None:
+                    break
+                j += 1
+                if _END in node and j - i > best_len:
+                    best, best_len = node[_END], j - i
+        return best
+
+    def factor(self, model):
+        """裁切系数；认不出返回 None"""
+        if not model:
+            return None
+        cf = self.overrides.get(model)
+        if cf is not None:
+            return float(cf)
+        m = str(model)
+        if m not in self._memo:
+            self._memo[m] = self._match(m.upper())
+        return self._memo[m]
+
+    def table(self, names):
+        """names[i] 的系数数组（float64，认不出为 NaN），末尾多一格 NaN 对应缺失编码 -1"""
+        import numpy as np
+        return np.array([self._nan(self.factor(n)) for n in names] + [np.nan], dtype=np.float64)
+
+    @staticmethod
+    def _nan(x):
+        return float("nan") if x is None else x
+
+
+DEFAULT_RESOLVER = CropResolver()
+
+
+def crop_resolver(overrides=None):
+    """带用户覆盖表的解析器（共享默认解析器的缓存）"""
+    return DEFAULT_RESOLVER.with_overrides(overrides) if overrides else DEFAULT_RESOLVER
+
+
+def crop_factor(model):
+    """按机身关键字猜裁切系数，认不出返回 None"""
+    return DEFAULT_RESOLVER.factor(model)
+
+
+# ---- 解析镜头名得到焦段范围（mm）----
+_lens_range_cache = {}
+
+def parse_lens_focal_range(lens_name: str):
+    if not lens_name:
+        return None
+    key = lens_name.strip()
+    if key in _lens_range_cache:
+        return _lens_range_cache[key]
+    s = lens_name.replace(" ", "")
+    m = re.search(r'(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*mm', lens_name, re.IGNORECASE)
+    if not m:
+        m = re.search(r'(\d+(?:\.\d+)?)-?(\d+(?:\.\d+)?)mm', s, re.IGNORECASE)
+    if m:
+        v1 = float(m.group(1)); v2 = float(m.group(2))
+        lo, hi = (v1, v2) if v1 <= v2 else (v2, v1)
+        _lens_range_cache[key] = (lo, hi, False)
+        return _lens_range_cache[key]
+    m = re.search(r'(\d+(?:\.\d+)?)\s*mm', lens_name, re.IGNORECASE)
+    if not m:
+        m = re.search(r'(\d+(?:\.\d+)?)mm', s, re.IGNORECASE)
+    if m:
+        v = float(m.group(1))
+        _lens_range_cache[key] = (v, v, True)
+        return _lens_range_cache[key]
+    _lens_range_cache[key] = None
+    return None
+
+
+def lens_tolerance(rng, tol_percent=5.0, tol_abs_mm=2.0):
+    """焦段 (lo, hi, is_prime) 的允许误差（mm）"""
+    lo, hi, is_prime = rng
+    return max(tol_abs_mm, (lo if is_prime else max(lo, hi)) * (tol_percent / 100.0))
+
+
+def in_physical_range(focal_mm, lens_name, tol_percent=5.0, tol_abs_mm=2.0):
+    if focal_mm is None:
+        return True
+    rng = parse_lens_focal_range(lens_name or "")
+    if not rng:
+        return True
+    delta = lens_tolerance(rng, tol_percent, tol_abs_mm)
+    return (rng[0] - delta) <= focal_mm <= (rng[1] + delta)
+
+
+def lens_bounds(names, tol_percent=5.0, tol_abs_mm=2.0):
+    """每个镜头名允许的物理焦距区间 (lo, hi) 数组（含误差）；认不出焦段的为 (-inf, inf)，
+    末尾多一格对应缺失编码 -1"""
+    import numpy as np
+    lo = np.full(len(names) + 1, -np.inf)
+    hi = np.full(len(names) + 1, np.inf)
+    for i, name in enumerate(names):
+        rng = parse_lens_focal_range(name)
+        if rng:
+            delta = lens_tolerance(rng, tol_percent, tol_abs_mm)
+            lo[i], hi[i] = rng[0] - delta, rng[1] + delta
+    return lo, hi
@@ -0,0 +1,208 @@
+import gzip, json, os, platform, time
+import numpy as np
+
+from dataset import HistogramCube, PhotoDataset, sketch_keys
+from resolver import lens_bounds
+
+# ---------------------------
+# 摘要文件：各台机器/各个根目录分别读取后只交换摘要，不必传逐张明细。
+# 内容是按 (机身, 镜头) 组合的细粒度计数表：等效焦距 / 快门 EV / ISO 各一张，
+# 每个条目为 (组合, 物理焦距, 取值) -> 张数。带上物理焦距这一维，合理性筛选与裁切系数覆盖在摘要上仍然精确；
+# 物理焦距的直方图即任一张表按物理焦距的边际和。取值按 RESOLUTION 量化为整数存储（缺失为 null）。
+# 合并 = 名称表取并集、条目按键相加，满足结合律与交换律，各分片任意顺序合并结果相同
+# ---------------------------
+FORMAT = "photo-meta-summary"
+VERSION = 1
+RESOLUTION = {"focal_mm": 0.01, "focal35": 0.01, "shutter": 0.001, "iso": 1.0}   # 量化步长：mm / mm / EV / ISO
+TABLES = ("focal35", "shutter", "iso")
+_MISSING = np.iinfo(np.int64).min   # 量化后的缺失值
+
+
+class SummaryError(ValueError):
+    pass
+
+
+def _quantize(values, res):
+    v = np.asarray(values, dtype=np.float64)
+    out = np.full(len(v), _MISSING, dtype=np.int64)
+    ok = np.isfinite(v)
+    out[ok] = np.round(v[ok] / res).astype(np.int64)
+    return out
+
+
+def _dequantize(keys, res):
+    return np.where(keys == _MISSING, np.nan, keys * res)
+
+
+def _group(pair, fmm, val, count):
+    """相同 (组合, 物理焦距, 取值) 的条目合并；按键升序，结果与输入顺序无关"""
+    if not len(pair):
+        return pair, fmm, val, count
+    order = np.lexsort((val, fmm, pair))
+    pair, fmm, val, count = pair[order], fmm[order], val[order], count[order]
+    start = np.flatnonzero(np.r_[True, (pair[1:] != pair[:-1]) | (fmm[1:] != fmm[:-1]) | (val[1:] != val[:-1])])
+    return pair[start], fmm[start], val[start], np.add.reduceat(count, start)
+
+
+def _to_json(keys):
+    return [None if k == _MISSING else k for k in keys.tolist()]
+
+
+def _from_json(keys):
+    return np.array([_MISSING if k is None else k for k in keys], dtype=np.int64)
+
+
+class PhotoSummary:
+    """摘要：models / lenses 名称表，pm / pl 各组合的机身/镜头编码（-1 缺失），
+    tables[名称] = (组合编号, 物理焦距键, 取值键, 张数) 四个数组；sources 记录各分片的来源"""
+
+    def __init__(self, models, lenses, pm, pl, tables, sources=()):
+        self.models, self.lenses = list(models), list(lenses)
+        self._model_ix = {n: i for i, n in enumerate(self.models)}
+        self._lens_ix = {n: i for i, n in enumerate(self.lenses)}
+        self.pm = np.asarray(pm, dtype=np.int32)
+        self.pl = np.asarray(pl, dtype=np.int32)
+        self.tables = tables
+        self.sources = list(sources)
+        self.version = 0       # 与 PhotoDataset 一致的缓存失效标记；摘要不可变
+
+    def __len__(self):
+        return int(self.tables[TABLES[0]][3].sum())
+
+    # 与 PhotoDataset 相同的选择语义
+    _name_mask = PhotoDataset._name_mask
+    pair_selection = PhotoDataset.pair_selection
+    pair_selection_bits = PhotoDataset.pair_selection_bits
+
+    def pairs(self):
+        return None, self.pm, self.pl
+
+    def name_counts(self):
+        """各机身、各镜头的照片数（同 PhotoDataset.name_counts）"""
+        pair, _, _, count = self.tables[TABLES[0]]
+        per_pair = np.bincount(pair, weights=count, minlength=len(self.pm))
+        return tuple(np.bincount(codes[codes >= 0], weights=per_pair[codes >= 0], minlength=len(names)).astype(np.int64)
+                     for codes, names in ((self.pm, self.models), (self.pl, self.lenses)))
+
+    # ---------- 构造 ----------
+    @classmethod
+    def from_dataset(cls, ds, root=None):
+        """由列式数据集汇总；root 记入来源信息"""
+        inv, pm, pl = ds.pairs()
+        fmm = _quantize(ds.focal_mm, RESOLUTION["focal_mm"])
+        ones = np.ones(len(ds), dtype=np.int64)
+        cols = {"focal35": ds.focal_35mm, "shutter": ds.shutter_stops, "iso": ds.iso}
+        tables = {name: _group(inv.astype(np.int64), fmm, _quantize(cols[name], RESOLUTION[name]), ones)
+                  for name in TABLES}
+        source = {"root": None if root is None else os.fspath(root), "host": platform.node(),
+                  "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "photos": len(ds)}
+        return cls(ds.models, ds.lenses, pm, pl, tables, [source])
+
+    @classmethod
+    def merge(cls, summaries):
+        """合并多个摘要；名称表按字母序重建，结果与合并顺序、分组方式无关"""
+        summaries = list(summaries)
+        if not summaries:
+            raise SummaryError("没有可合并的摘要")
+        models = sorted({n for s in summaries for n in s.models})
+        lenses = sorted({n for s in summaries for n in s.lenses})
+        m_ix = {n: i for i, n in enumerate(models)}
+        l_ix = {n: i for i, n in enumerate(lenses)}
+        width = len(lenses) + 1
+        parts = {name: [] for name in TABLES}
+        for s in summaries:
+            mmap = np.array([m_ix[n] for n in s.models] + [-1], dtype=np.int64)
+            lmap = np.array([l_ix[n] for n in s.lenses] + [-1], dtype=np.int64)
+            key = (mmap[s.pm] + 1) * width + (lmap[s.pl] + 1)    # 组合 -> 全局 (机身, 镜头) 键
+            for name in TABLES:
+                pair, fmm, val, count = s.tables[name]
+                parts[name].append((key[pair], fmm, val, count))
+        tables = {}
+        all_keys = np.unique(np.concatenate([p[0] for name in TABLES for p in parts[name]]))
+        for name in TABLES:
+            pair, fmm, val, count = (np.concatenate(c) for c in zip(*parts[name]))
+            tables[name] = _group(np.searchsorted(all_keys, pair), fmm, val, count)
+        pm = (all_keys // width - 1).astype(np.int32)
+        pl = (all_keys % width - 1).astype(np.int32)
+        return cls(models, lenses, pm, pl, tables, [src for s in summaries for src in s.sources])
+
+    # ---------- 读写 ----------
+    def to_dict(self):
+        return {
+            "format": FORMAT, "version": VERSION, "resolution": RESOLUTION, "sources": self.sources,
+            "photos": len(self), "cameras": self.models, "lenses": self.lenses,
+            "pairs": {"camera": self.pm.tolist(), "lens": self.pl.tolist()},
+            "tables": {name: {"pair": t[0].tolist(), "focal_mm": _to_json(t[1]), "value": _to_json(t[2]),
+                              "count": t[3].tolist()} for name, t in self.tables.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, doc):
+        if not isinstance(doc, dict) or doc.get("format") != FORMAT:
+            raise SummaryError("不是摘要文件")
+        if doc.get("version") != VERSION:
+            raise SummaryError(f"摘要版本 {doc.get('version')} 不受支持（当前 {VERSION}）")
+        if doc.get("resolution") != RESOLUTION:
+            raise SummaryError("摘要的量化步长与当前版本不一致")
+        try:
+            tables = {name: (np.array(t["pair"], dtype=np.int64), _from_json(t["focal_mm"]),
+                             _from_json(t["value"]), np.array(t["count"], dtype=np.int64))
+                      for name, t in ((n, doc["tables"][n]) for n in TABLES)}
+            return cls(doc["cameras"], doc["lenses"], doc["pairs"]["camera"], doc["pairs"]["lens"],
+                       tables, doc.get("sources", []))
+        except (KeyError, TypeError, ValueError) as e:
+            raise SummaryError(f"摘要文件损坏：{e}")
+
+    def save(self, path):
+        """写出 JSON；扩展名为 .gz 时 gzip 压缩"""
+        path = os.fspath(path)
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        path = os.fspath(path)
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError) as e:
+            raise SummaryError(f"无法读取摘要 {path}：{e}")
+        return cls.from_dict(doc)
+
+    # ---------- 直方图 ----------
+    def cube(self, mode_idx, bin_w, overrides=None, sanity=None, sketch=False):
+        """与 report.mode_values + HistogramCube 相同的结果；sanity 为 (容差 %, 容差 mm) 或 None；
+        sketch=True 时为分位数草图（同 report.build_cube）"""
+        name = TABLES[0] if mode_idx in (0, 1) else TABLES[mode_idx - 1]
+        pair, fkey, vkey, count = self.tables[name]
+        fmm = _dequantize(fkey, RESOLUTION["focal_mm"])
+        if mode_idx == 0:
+            vals = _dequantize(vkey, RESOLUTION[name])
+            if overrides:
+                ovr = np.array([np.nan if overrides.get(m) is None else overrides[m] for m in self.models] + [np.nan])
+                cf = ovr[self.pm[pair]]
+                vals = np.where(np.isnan(cf), vals, fmm * cf)
+            vals = np.where(np.isnan(fmm), np.nan, vals)   # 没有物理焦距的照片不计入
+        elif mode_idx == 1:
+            vals = fmm
+        else:
+            vals = _dequantize(vkey, RESOLUTION[name])
+        if mode_idx == 2:
+            bin_w = max(0.01, bin_w)
+        elif mode_idx == 3:
+            bin_w = max(10.0, bin_w)
+        if sketch:
+            vals, bin_w = sketch_keys(2.0 ** -vals if mode_idx == 2 else vals), 1.0
+        keep = None
+        if sanity is not None:
+            lo, hi = lens_bounds(self.lenses, *sanity)
+            code = self.pl[pair]
+            keep = np.isnan(fmm) | ((lo[code] <= fmm) & (fmm <= hi[code]))
+        return HistogramCube.from_counts(pair, len(self.pm), vals, count.astype(np.float64), bin_w, keep)
+
+
+def load_summaries(paths):
+    """读取并合并多个摘要文件"""
+    return PhotoSummary.merge(PhotoSummary.load(p) for p in paths)
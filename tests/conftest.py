@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+from corpus import make_corpus  # noqa: E402
+
+FAKE_EXIFTOOL = ROOT / "benchmarks" / "fake_exiftool.py"
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """60 张合成照片（约 10% 无 EXIF / 损坏），按 年/月/日 分目录"""
+    return make_corpus(tmp_path_factory.mktemp("corpus"), 60, seed=1, quiet=True)
+
+
+@pytest.fixture
+def fake_exiftool():
+    """exiftool 替身的命令（列表）"""
+    return [sys.executable, str(FAKE_EXIFTOOL)]
@@ -0,0 +1,152 @@
+import shutil, threading
+from pathlib import Path
+
+import pytest
+
+import focal_stats_jpg
+import walker
+from checkpoint import ScanCheckpoint
+from corpus import make_corpus
+from exif_cache import ExifCache
+from focal_stats_jpg import gather_rows, iter_gather
+
+
+def copy_photos(src_root, dst, per_dir=None):
+    """把合成照片平铺到 dst（per_dir 给定时每目录这么多张，分到 d00/s0、d00/s1 … 下）"""
+    src = sorted(src_root.rglob("*.jpg")) + sorted(src_root.rglob("*.JPG"))
+    for i, p in enumerate(src):
+        d = dst if per_dir is None else dst / f"d{i // per_dir // 3:02d}" / f"s{i // per_dir % 3}"
+        d.mkdir(parents=True, exist_ok=True)
+        shutil.copy(p, d / f"IMG_{i:04d}.jpg")
+    return dst
+
+
+@pytest.fixture(scope="module")
+def photos(tmp_path_factory):
+    """400 张合成照片（共用的 corpus 只有 60 张）"""
+    return make_corpus(tmp_path_factory.mktemp("photos"), 400, seed=2, quiet=True)
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """记录每次运行解析了哪些文件、列举了哪些目录"""
+    seen = {"parsed": [], "listed": []}
+    parse, scan = focal_stats_jpg.parse_photo, walker._scan_dir
+
+    def counting_parse(path):
+        seen["parsed"].append(str(path))
+        return parse(path)
+
+    def counting_scan(path, *args):
+        seen["listed"].append(path)
+        return scan(path, *args)
+
+    monkeypatch.setattr(focal_stats_jpg, "parse_photo", counting_parse)
+    monkeypatch.setattr(walker, "_scan_dir", counting_scan)
+    return seen
+
+
+def run(folder, ckpt_path, stop_after=None, cache=None):
+    """读一遍；stop_after 给定时本次新处理这么多个文件后停下。返回产出的行"""
+    ckpt = ScanCheckpoint(folder, ckpt_path, rows=cache is None)
+    start = len(ckpt.entries)
+    stop = threading.Event()
+    rows = []
+    for batch, done, _ in iter_gather(folder, use_exiftool=False, cache=cache, jobs=1, batch_size=50,
+                                      checkpoint=ckpt, stop=stop):
+        rows.extend(batch)
+        if stop_after is not None and done - start >= stop_after:
+            stop.set()
+    return rows, start, ckpt
+
+
+def first_photo(folder):
+    """遍历到的第一张（目录按 scandir 顺序，不一定是名称最小的）"""
+    return Path(next(walker.walk_files(folder, {".jpg"}, threads=1))[0])
+
+
+def by_file(rows):
+    return sorted(rows, key=lambda r: r["file"])
+
+
+def test_repeated_interrupts_keep_progress(photos, tmp_path, counted):
+    """没有已处理完的目录（平铺文件夹）时连续中断两次，之前的进度也不丢、不重复解析"""
+    folder = copy_photos(photos, tmp_path / "flat")
+    n = len(list(folder.iterdir()))
+    expect = by_file(gather_rows(folder, use_exiftool=False))
+    counted["parsed"].clear()
+    path = tmp_path / "ck.jsonl"
+
+    _, start, ckpt = run(folder, path, stop_after=100)
+    assert start == 0 and path.exists()
+    _, start, ckpt = run(folder, path, stop_after=100)
+    assert start == 100 and ckpt.resumed
+    _, start, ckpt = run(folder, path, stop_after=100)
+    assert start == 200
+    rows, start, _ = run(folder, path)
+    assert start == 300 and not path.exists()
+
+    assert len(counted["parsed"]) == len(set(counted["parsed"])) == n
+    assert by_file(rows) == expect
+
+
+def test_resume_skips_finished_dirs(photos, tmp_path, counted, monkeypatch):
+    """续读时已处理完的目录不再列举，行取自缓存；结果与完整读取相同"""
+    monkeypatch.setattr(focal_stats_jpg, "WALK_CHUNK", 25)
+    folder = copy_photos(photos, tmp_path / "tree", per_dir=20)
+    expect = by_file(gather_rows(folder, use_exiftool=False))
+    counted["parsed"].clear()
+    path = tmp_path / "ck.jsonl"
+    with ExifCache(tmp_path / "cache.sqlite") as cache:
+        run(folder, path, stop_after=180, cache=cache)
+        finished = ScanCheckpoint(folder, path, rows=False).dirs
+        assert finished and all(d.startswith(str(folder)) for d in finished)
+
+        counted["listed"].clear()
+        parsed = len(counted["parsed"])
+        rows, _, _ = run(folder, path, cache=cache)
+        assert not path.exists()
+        assert not set(counted["listed"]) & finished
+        assert len(set(counted["parsed"])) == len(counted["parsed"]) > parsed   # 只解析了没处理过的
+    assert by_file(rows) == expect
+
+
+
+def test_resume_drops_deleted_files_with_cache(photos, tmp_path, monkeypatch):
+    """读过一遍后删掉一张，中断再续读：已删除的文件不会随已处理完的目录复活，缓存里也清掉了"""
+    monkeypatch.setattr(focal_stats_jpg, "WALK_CHUNK", 25)
+    folder = copy_photos(photos, tmp_path / "tree", per_dir=20)
+    path = tmp_path / "ck.jsonl"
+    deleted = first_photo(folder)
+    with ExifCache(tmp_path / "cache.sqlite") as cache:
+        gather_rows(folder, use_exiftool=False, cache=cache)
+        assert str(deleted) in cache.load(folder)
+        deleted.unlink()
+        expect = by_file(gather_rows(folder, use_exiftool=False))
+
+        run(folder, path, stop_after=120, cache=cache)
+        assert str(deleted.parent) in ScanCheckpoint(folder, path, rows=False).dirs
+        assert str(deleted) not in cache.load(folder)
+        rows, _, _ = run(folder, path, cache=cache)
+        assert str(deleted) not in cache.load(folder)
+    assert str(deleted) not in {r["file"] for r in rows}
+    assert by_file(rows) == expect
+
+
+def test_resume_drops_deleted_files_without_cache(photos, tmp_path, monkeypatch):
+    """断点里记过行的文件被删除后，所在目录处理完时记为作废，之后再续读也不会复用"""
+    monkeypatch.setattr(focal_stats_jpg, "WALK_CHUNK", 25)
+    folder = copy_photos(photos, tmp_path / "tree", per_dir=20)
+    path = tmp_path / "ck.jsonl"
+    deleted = first_photo(folder)
+
+    run(folder, path, stop_after=10)   # 第一块解析完即停：行已记下，目录还没记为处理完
+    assert str(deleted) in ScanCheckpoint(folder, path).entries
+    deleted.unlink()
+    expect = by_file(gather_rows(folder, use_exiftool=False))
+    run(folder, path, stop_after=60)
+    ckpt = ScanCheckpoint(folder, path)
+    assert str(deleted.parent) in ckpt.dirs and str(deleted) not in ckpt.entries
+    rows, _, _ = run(folder, path)
+    assert str(deleted) not in {r["file"] for r in rows}
+    assert by_file(rows) == expect
@@ -0,0 +1,92 @@
+import os, sys
+
+import pytest
+
+from conftest import FAKE_EXIFTOOL
+from exif_native import parse_native
+from exiftool_pool import ExiftoolError, ExiftoolPool, _Worker
+from walker import walk_files
+
+
+def photos(root):
+    return [p for p, _, _ in walk_files(root, {".jpg", ".jpeg"}, threads=1)]
+
+
+def key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+def check_matched(batches, paths):
+    """每个文件恰好出现一次；条目对得上路径，读不出的文件（替身里即 parse_native 为 None）对应 None"""
+    got = [pair for batch in batches for pair in batch]
+    assert sorted(p for p, _ in got) == sorted(paths)
+    for p, it in got:
+        if parse_native(p) is None:
+            assert it is None
+        else:
+            assert key(it["SourceFile"]) == key(p)
+
+
+def test_worker_ready_framing(corpus, fake_exiftool):
+    """每批以 {readyN} 收尾，序号递增；整批都读不出（没有 JSON 输出）时下一批也不会错位"""
+    paths = photos(corpus)
+    w = _Worker(fake_exiftool)
+    try:
+        first = w.run(paths[:5])
+        assert w.seq == 1
+        assert [key(it["SourceFile"]) for it in first] == [key(p) for p in paths[:5] if parse_native(p) is not None]
+        assert w.run([str(corpus / "missing.jpg")]) == []
+        assert w.seq == 2
+        third = w.run(paths[5:10])
+        assert w.seq == 3
+        assert {key(it["SourceFile"]) for it in third} == {key(p) for p in paths[5:10] if parse_native(p) is not None}
+    finally:
+        w.close()
+    assert w.proc.returncode == 0
+
+
+def test_imap_matches_paths(corpus, fake_exiftool):
+    paths = photos(corpus)
+    assert any(parse_native(p) is None for p in paths)   # 语料里要有读不出的文件
+    with ExiftoolPool(procs=2, cmd=fake_exiftool, batch_size=7) as pool:
+        batches = list(pool.imap(paths))
+    assert all(len(b) <= 7 for b in batches)
+    check_matched(batches, paths)
+
+
+def test_imap_reordered_and_normalized(corpus, tmp_path):
+    """exiftool 输出的顺序、路径写法都可能与输入不同：按 normpath 对回"""
+    shuffled = tmp_path / "shuffled_exiftool.py"
+    shuffled.write_text(
+        "import os, sys\n"
+        f"sys.path.insert(0, {str(FAKE_EXIFTOOL.parent)!r})\n"
+        "import fake_exiftool as fe\n"
+        "files, entry = fe._files, fe._entry\n"
+        "fe._files = lambda args: files(args)[::-1]\n"
+        "def _entry(path):\n"
+        "    e = entry(path)\n"
+        "    if e: e['SourceFile'] = os.path.normpath(path).replace(os.sep, '/')\n"
+        "    return e\n"
+        "fe._entry = _entry\n"
+        "fe.main(sys.argv[1:])\n", encoding="utf-8")
+    paths = [os.path.join(os.path.dirname(p), "..", os.path.basename(os.path.dirname(p)), os.path.basename(p))
+             for p in photos(corpus)]
+    with ExiftoolPool(procs=1, cmd=[sys.executable, str(shuffled)], batch_size=16) as pool:
+        batches = list(pool.imap(paths))
+    assert [p for b in batches for p, _ in b] == paths   # 一个进程：批内、批间都保持输入顺序
+    check_matched(batches, paths)
+
+
+def test_worker_crash_restarts(corpus, fake_exiftool):
+    """进程意外退出时 imap 抛 ExiftoolError 并关掉整池；下次 imap 重新启动进程"""
+    paths = photos(corpus)
+    with ExiftoolPool(procs=1, cmd=fake_exiftool, batch_size=8) as pool:
+        check_matched(pool.imap(paths[:8]), paths[:8])
+        dead = pool._workers[0]
+        dead.proc.kill()
+        dead.proc.wait()
+        with pytest.raises(ExiftoolError):
+            list(pool.imap(paths))
+        assert pool._workers == []
+        check_matched(list(pool.imap(paths)), paths)
+        assert pool._workers[0] is not dead
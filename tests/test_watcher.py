@@ -0,0 +1,132 @@
+import threading, time
+
+import pytest
+
+import watcher
+from watcher import FolderWatcher, _WatchLimit
+
+EXTS = {".jpg", ".jpeg"}
+FAST = dict(debounce=0.2, max_delay=5.0, poll_interval=0.05)
+
+
+def write(path, data=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def test_poll_add_modify_delete(tmp_path):
+    old = tmp_path / "2024" / "old.jpg"
+    write(old)
+    with FolderWatcher(tmp_path, EXTS, backend="poll", **FAST) as w:
+        assert w.backend == "poll"
+        assert set(w.known) == {str(old)}
+        assert w.wait(timeout=0.4) is None
+
+        new = tmp_path / "2024" / "05" / "IMG_1.JPG"
+        write(new)
+        write(tmp_path / "notes.txt")   # 扩展名不符，不算
+        ch = w.wait(timeout=5)
+        assert set(ch.changed) == {str(new)} and ch.removed == []
+
+        write(old, b"longer content")
+        ch = w.wait(timeout=5)
+        assert ch.changed == {str(old): w.known[str(old)]} and ch.removed == []
+        assert ch.changed[str(old)][0] == len(b"longer content")
+
+        new.unlink()
+        ch = w.wait(timeout=5)
+        assert ch.changed == {} and ch.removed == [str(new)]
+        assert str(new) not in w.known
+
+
+def test_known_state_differences_come_first(tmp_path):
+    """known 与磁盘不一致的路径作为第一批变化"""
+    keep, edited = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    write(keep)
+    write(edited, b"edited")
+    st = {str(keep): (keep.stat().st_size, keep.stat().st_mtime_ns)}
+    known = dict(st, **{str(edited): (1, 0), str(tmp_path / "gone.jpg"): (1, 0)})
+    with FolderWatcher(tmp_path, EXTS, known=known, backend="poll", **FAST) as w:
+        ch = w.wait(timeout=5)
+    assert set(ch.changed) == {str(edited)} and ch.removed == [str(tmp_path / "gone.jpg")]
+
+
+def test_poll_debounce_coalesces_burst(tmp_path):
+    """一串间隔短于 debounce 的写入合成一批"""
+    paths = [tmp_path / "burst" / f"IMG_{i}.jpg" for i in range(6)]
+
+    def burst():
+        for p in paths:
+            write(p)
+            time.sleep(0.1)
+
+    with FolderWatcher(tmp_path, EXTS, backend="poll", debounce=0.5, max_delay=10.0, poll_interval=0.05) as w:
+        t = threading.Thread(target=burst)
+        t.start()
+        ch = w.wait(timeout=10)
+        t.join()
+        assert set(ch.changed) == {str(p) for p in paths}
+        assert w.wait(timeout=0.8) is None
+
+
+def test_poll_max_delay_caps_wait(tmp_path):
+    """持续有写入时，最多攒 max_delay 秒也会交出一批"""
+    stop = threading.Event()
+
+    def trickle():
+        i = 0
+        while not stop.is_set():
+            write(tmp_path / f"IMG_{i}.jpg")
+            i += 1
+            time.sleep(0.05)
+
+    with FolderWatcher(tmp_path, EXTS, backend="poll", debounce=0.5, max_delay=1.0, poll_interval=0.05) as w:
+        t = threading.Thread(target=trickle)
+        t.start()
+        try:
+            start = time.monotonic()
+            ch = w.wait(timeout=10)
+            assert ch.changed and time.monotonic() - start < 3
+        finally:
+            stop.set()
+            t.join()
+
+
+needs_inotify = pytest.mark.skipif(watcher._libc() is None, reason="本平台没有 inotify")
+
+
+@needs_inotify
+def test_watch_limit_at_start_falls_back_to_poll(tmp_path, monkeypatch):
+    write(tmp_path / "a.jpg")
+
+    def limit(self, path):
+        raise _WatchLimit(28, "inotify 监视数已达上限")
+
+    monkeypatch.setattr(FolderWatcher, "_add_watch", limit)
+    with FolderWatcher(tmp_path, EXTS, **FAST) as w:
+        assert w.backend == "poll" and w._fd is None
+        assert set(w.known) == {str(tmp_path / "a.jpg")}
+        write(tmp_path / "b.jpg")
+        assert set(w.wait(timeout=5).changed) == {str(tmp_path / "b.jpg")}
+    with pytest.raises(OSError):
+        FolderWatcher(tmp_path, EXTS, backend="inotify", **FAST)
+
+
+@needs_inotify
+def test_watch_limit_while_running_switches_to_poll(tmp_path, monkeypatch):
+    """运行中新目录加不上监视（_to_poll）：改用轮询，新目录里的文件和之后的变化都不漏"""
+    write(tmp_path / "a.jpg")
+    with FolderWatcher(tmp_path, EXTS, **FAST) as w:
+        assert w.backend == "inotify"
+
+        def limit(path):
+            raise _WatchLimit(28, "inotify 监视数已达上限")
+
+        monkeypatch.setattr(w, "_add_watch", limit)
+        new = tmp_path / "2024" / "06" / "IMG_1.jpg"
+        write(new)
+        ch = w.wait(timeout=5)
+        assert w.backend == "poll" and w._fd is None
+        assert set(ch.changed) == {str(new)}
+        (tmp_path / "a.jpg").unlink()
+        assert w.wait(timeout=5).removed == [str(tmp_path / "a.jpg")]
@@ -0,0 +1,117 @@
+import os, stat
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+
+# ---------------------------
+# 目录遍历：基于 os.scandir，复用 DirEntry 自带的类型/stat 信息，不创建 Path 对象
+# 子目录的列举分发到线程池（NAS 上列目录本身就是瓶颈，多个请求并发能明显提速）；
+# 提前列举的目录数有上限，内存不随目录树大小增长
+# ---------------------------
+WALK_THREADS = 8
+WALK_LOOKAHEAD = 4   # 每个线程最多提前列举几个目录（在途 + 列完待取）
+
+# 默认跳过的目录：群晖缩略图、系统缩略图、Lightroom 预览/智能预览、回收站
+DEFAULT_EXCLUDES = (
+    "@eaDir", ".thumbnails", "*.lrdata", "#recycle", "$RECYCLE.BIN", ".Trash-*",
+)
+
+
+def _excluded(name, rel, patterns):
+    """按名称或相对路径（/ 分隔）匹配排除规则"""
+    for pat in patterns:
+        if fnmatchcase(name, pat) or fnmatchcase(rel, pat):
+            return True
+    return False
+
+
+def _scan_dir(path, rel, exts, excludes, follow_symlinks):
+    """列一个目录：返回 (文件列表 [(路径, 大小, mtime_ns)], 子目录列表 [(路径, 相对路径, (dev, ino))])"""
+    files, subdirs = [], []
+    try:
+        it = os.scandir(path)
+    except OSError:
+        return files, subdirs
+    with it:
+        for e in it:
+            name = e.name
+            try:
+                if e.is_dir(follow_symlinks=follow_symlinks):
+                    sub_rel = f"{rel}/{name}" if rel else name
+                    if _excluded(name, sub_rel, excludes):
+                        continue
+                    st = e.stat(follow_symlinks=True)
+                    subdirs.append((e.path, sub_rel, (st.st_dev, st.st_ino)))
+                    continue
+                if os.path.splitext(name)[1].lower() not in exts:
+                    continue
+                if _excluded(name, f"{rel}/{name}" if rel else name, excludes):
+                    continue
+                st = e.stat(follow_symlinks=follow_symlinks)
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                files.append((e.path, st.st_size, st.st_mtime_ns))
+    return files, subdirs
+
+
+def walk_files(root, exts, excludes=DEFAULT_EXCLUDES, threads=WALK_THREADS, follow_symlinks=True, skip=()):
+    """递归列出扩展名在 exts（小写、带点）中的普通文件，产出 (路径, 大小, mtime_ns)。
+    顺序与 Path.rglob 相同（先序深度优先，目录内按 scandir 顺序），与线程数无关；
+    跟随符号链接时按 (st_dev, st_ino) 去重，软链接成环也只走一遍；
+    skip 中的子目录（路径写法同产出的路径）整棵跳过，不列举"""
+    root = os.fspath(root)
+    exts = frozenset(exts)
+    excludes = tuple(excludes or ())
+    try:
+        st = os.stat(root)
+    except OSError:
+        return
+    seen = {(st.st_dev, st.st_ino)}
+
+    def visit(path, rel):
+        return _scan_dir(path, rel, exts, excludes, follow_symlinks)
+
+    def fresh(subdirs):
+        out = []
+        for path, rel, key in subdirs:
+            if key not in seen and path not in skip:
+                seen.add(key)
+                out.append((path, rel))
+        return out
+
+    if threads <= 1:
+        stack = [(root, "")]
+        while stack:
+            files, subdirs = visit(*stack.pop())
+            yield from files
+            stack.extend(reversed(fresh(subdirs)))
+        return
+
+    # 栈顶（即将产出的）目录提前提交列举，已提交未取走的合计不超过 limit 个；产出仍按深度优先顺序逐个等待
+    limit = threads * WALK_LOOKAHEAD
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="walk") as pool:
+        stack = [[root, "", None]]   # [路径, 相对路径, 列举的 Future 或 None（还没提交）]
+        outstanding = 0
+
+        def submit_ahead():
+            nonlocal outstanding
+            for item in reversed(stack):
+                if outstanding >= limit:
+                    break
+                if item[2] is None:
+                    item[2] = pool.submit(visit, item[0], item[1])
+                    outstanding += 1
+
+        try:
+            submit_ahead()
+            while stack:
+                fut = stack.pop()[2]   # 栈顶总在提前提交的范围内
+                outstanding -= 1
+                files, subdirs = fut.result()
+                stack.extend([path, rel, None] for path, rel in reversed(fresh(subdirs)))
+                submit_ahead()
+                yield from files
+        finally:   # 消费方提前停下时丢弃还没开始的列举
+            for item in stack:
+                if item[2] is not None:
+                    item[2].cancel()
@@ -0,0 +1,303 @@
+import ctypes, ctypes.util, errno, os, select, stat, struct, sys, time
+from collections import namedtuple
+
+from walker import DEFAULT_EXCLUDES, _excluded, _scan_dir, walk_files
+
+# ---------------------------
+# 文件夹监视：Linux 上用 inotify（ctypes 直接调 libc，无额外依赖），其它平台或监视数超限时退回定时轮询
+# 事件只记下“哪些路径可能变了”，静默 debounce 秒（或累计 max_delay 秒）后统一 stat 一遍，
+# 与已知状态 (大小, mtime_ns) 比较得出 新增/修改 与 删除；连续导入时一批只处理一次
+# ---------------------------
+DEBOUNCE_SECONDS = 1.0    # 最后一个事件之后静默这么久才处理
+MAX_DELAY_SECONDS = 10.0  # 持续有事件时最多攒这么久也要处理一批
+POLL_SECONDS = 2.0        # 轮询间隔
+
+Changes = namedtuple("Changes", "changed removed")   # {路径: (大小, mtime_ns)}, [路径]
+
+# <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct("iIII")
+
+
+class _WatchLimit(OSError):
+    """inotify 监视数达到上限（fs.inotify.max_user_watches）"""
+
+
+def _libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch  # noqa: B018
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FolderWatcher:
+    """监视 root 下扩展名在 exts 中的文件；wait() 阻塞到一批去抖后的变化（Changes）或超时。
+    known 为已知状态 {路径: (大小, mtime_ns)}（如刚读完的缓存内容），与当前状态的差异作为第一批变化；
+    缺省时以启动时的遍历结果为准。backend："auto" / "inotify" / "poll"，实际使用的见 .backend"""
+
+    def __init__(self, root, exts, excludes=DEFAULT_EXCLUDES, known=None, debounce=DEBOUNCE_SECONDS,
+                 max_delay=MAX_DELAY_SECONDS, poll_interval=POLL_SECONDS, backend="auto"):
+        self.root = os.fspath(root)
+        self.exts = frozenset(exts)
+        self.excludes = tuple(excludes or ())
+        self.debounce = max(0.0, float(debounce))
+        self.max_delay = max(self.debounce, float(max_delay))
+        self.poll_interval = max(0.05, float(poll_interval))
+        self.known = {}
+        self._dirty, self._dirty_dirs, self._gone_dirs = set(), set(), set()
+        self._first = self._last = None
+        self._fd = None
+        self._wd_path, self._path_wd = {}, {}
+        self.backend = "poll"
+        if backend != "poll":
+            self._libc = _libc()
+            if self._libc is None and backend == "inotify":
+                raise OSError("本平台不支持 inotify")
+            if self._libc is not None:
+                try:
+                    self._start_inotify()
+                    self.backend = "inotify"
+                except OSError as e:
+                    self._close_fd()
+                    if backend == "inotify":
+                        raise
+                    print(f"[watch] inotify 不可用（{e}），改用轮询。", file=sys.stderr)
+        if self.backend == "poll":
+            found = self._snapshot = self._walk()
+            self._next_poll = time.monotonic() + self.poll_interval
+        else:
+            found = self._found
+            del self._found
+        if known is None:
+            self.known = found
+        else:   # 与已知状态不一致的路径作为第一批变化
+            self.known = dict(known)
+            self._mark(p for p, st in found.items() if self.known.get(p) != st)
+            self._mark(p for p in self.known if p not in found)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._close_fd()
+
+    # ---------- inotify ----------
+    def _start_inotify(self):
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self._fd = fd
+        self._found = {}
+        self._scan(self.root, self._found)
+
+    def _close_fd(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._wd_path, self._path_wd = {}, {}
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def _add_watch(self, path):
+        """给目录加监视；返回 False 表示不必再深入（目录已不存在，或是已监视目录的别名 / 软链接成环）"""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            if e == errno.ENOSPC:
+                raise _WatchLimit(e, "inotify 监视数已达上限（可调大 fs.inotify.max_user_watches）")
+            return False
+        old = self._wd_path.get(wd)
+        if old is not None and old != path:
+            return False   # 同一个 inode 已以别的路径监视
+        self._wd_path[wd] = path
+        self._path_wd[path] = wd
+        return True
+
+    def _scan(self, path, found):
+        """给 path 及其下全部目录加监视（先加监视再列目录，期间新建的文件不会漏），文件写入 found"""
+        stack = [(path, "" if path == self.root else self._rel(path))]
+        while stack:
+            d, rel = stack.pop()
+            if not self._add_watch(d):
+                continue
+            files, subdirs = _scan_dir(d, rel, self.exts, self.excludes, True)
+            found.update((p, (size, mtime)) for p, size, mtime in files)
+            stack.extend((p, r) for p, r, _ in subdirs)
+
+    def _drop_watches(self, prefix):
+        """目录被移走：撤掉它及其子目录的监视（移到树内别处时会作为新目录重新扫描）"""
+        sub = prefix + os.sep
+        for path in [p for p in self._path_wd if p == prefix or p.startswith(sub)]:
+            wd = self._path_wd.pop(path)
+            self._wd_path.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _read_events(self, timeout):
+        try:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+        except InterruptedError:
+            return
+        if not ready:
+            return
+        try:
+            buf = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos + _EVENT.size <= len(buf):
+            wd, mask, _cookie, size = _EVENT.unpack_from(buf, pos)
+            name = os.fsdecode(buf[pos + _EVENT.size:pos + _EVENT.size + size].rstrip(b"\0"))
+            pos += _EVENT.size + size
+            self._on_event(wd, mask, name)
+
+    def _on_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:     # 事件队列溢出：整棵树重新核对
+            self._dirty_dirs.add(self.root)
+            self._mark(list(self.known))
+            return
+        if mask & IN_IGNORED:
+            path = self._wd_path.pop(wd, None)
+            if path is not None and self._path_wd.get(path) == wd:
+                del self._path_wd[path]
+            return
+        parent = self._wd_path.get(wd)
+        if parent is None:
+            return
+        if not name:                 # 被监视的目录自身被删除 / 移走
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                self._gone_dirs.add(parent)
+                self._mark(())
+            return
+        path = os.path.join(parent, name)
+        rel = self._rel(path)
+        if _excluded(name, rel, self.excludes):
+            return
+        if mask & IN_ISDIR:
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                if mask & IN_MOVED_FROM:
+                    self._drop_watches(path)
+                self._gone_dirs.add(path)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                self._dirty_dirs.add(path)
+            self._mark(())
+        elif os.path.splitext(name)[1].lower() in self.exts:
+            self._mark((path,))
+
+    def _to_poll(self, reason):
+        print(f"[watch] {reason}，改用轮询。", file=sys.stderr)
+        self._close_fd()
+        self.backend = "poll"
+        self._dirty_dirs.clear()
+        self._gone_dirs.clear()
+        self._snapshot = {}      # 第一轮轮询把全部文件与已知状态重新核对一遍
+        self._mark(list(self.known))
+        self._next_poll = 0.0
+
+    # ---------- 轮询 ----------
+    def _walk(self):
+        return {p: (size, mtime) for p, size, mtime in walk_files(self.root, self.exts, self.excludes)}
+
+    def _poll(self):
+        """与上一轮的结果比较（而不是与已知状态比较），这样仍在写入的文件停下来后去抖才会到期"""
+        found, old = self._walk(), self._snapshot
+        self._mark([p for p, st in found.items() if old.get(p) != st] + [p for p in old if p not in found])
+        self._snapshot = found
+        self._next_poll = time.monotonic() + self.poll_interval
+
+    # ---------- 去抖 + 核对 ----------
+    def _mark(self, paths):
+        paths = list(paths)
+        self._dirty.update(paths)
+        if paths or self._dirty_dirs or self._gone_dirs:
+            now = time.monotonic()
+            if self._first is None:
+                self._first = now
+            self._last = now
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _flush(self):
+        cands, self._dirty = self._dirty, set()
+        gone, self._gone_dirs = self._gone_dirs, set()
+        dirs, self._dirty_dirs = self._dirty_dirs, set()
+        self._first = self._last = None
+        for d in gone:
+            sub = d + os.sep
+            cands.update(p for p in self.known if p.startswith(sub))
+        found = {}
+        for d in dirs:
+            self._scan(d, found)
+        cands.update(found)
+        changed, removed = {}, []
+        for p in cands:
+            st = found.get(p) or self._stat(p)
+            if st is None:
+                if self.known.pop(p, None) is not None:
+                    removed.append(p)
+            elif self.known.get(p) != st:
+                self.known[p] = changed[p] = st
+        return Changes(changed, removed)
+
+    def wait(self, timeout=None):
+        """阻塞到有一批变化（返回 Changes）或 timeout 秒后（返回 None）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            wake = float("inf")
+            if self._first is not None:
+                due = min(self._last + self.debounce, self._first + self.max_delay)
+                if now >= due:
+                    try:
+                        ch = self._flush()
+                    except _WatchLimit as e:
+                        self._to_poll(e.strerror)
+                        continue
+                    if ch.changed or ch.removed:
+                        return ch
+                    continue
+                wake = due
+            if self.backend == "poll":
+                wake = min(wake, self._next_poll)
+            if deadline is not None:
+                if now >= deadline:
+                    return None
+                wake = min(wake, deadline)
+            delay = None if wake == float("inf") else max(0.0, wake - now)
+            if self.backend == "inotify":
+                self._read_events(delay)
+            else:
+                if delay:
+                    time.sleep(delay)
+                if time.monotonic() >= self._next_poll:
+                    self._poll()